@@ -1,20 +1,65 @@
 # main.py - Versão Final Completa
+import argparse
 import asyncio
+import base64
+import contextvars
+import csv
+import functools
+import itertools
 import pandas as pd
 import logging
 import os
+import queue
+import random
+import signal
+import sqlite3
+import subprocess
+import time
+from collections import deque
+from contextlib import asynccontextmanager, closing, contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
 from playwright.async_api import async_playwright
 from dotenv import load_dotenv
 import json
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+import glob
+import hashlib
+import re
+import unicodedata
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urlparse
 import threading
 import sys
 
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # Sem a biblioteca o cache de sessão fica desativado
+    Fernet = None
+
 
 ENV_PATH = None  # Será definido dinamicamente
 
+# Tkinter é importado apenas quando a interface gráfica é usada (ver carregar_tkinter)
+tk = ttk = messagebox = filedialog = None
+
+def carregar_tkinter():
+    """Importa o Tkinter sob demanda, para execuções em lote sem desktop"""
+    global tk, ttk, messagebox, filedialog
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+
+def abrir_no_sistema(caminho):
+    """Abre o arquivo no programa padrão do sistema (Windows, macOS ou Linux)"""
+    if sys.platform.startswith("win"):
+        os.startfile(caminho)
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", caminho])
+    else:
+        subprocess.Popen(["xdg-open", caminho])
+
 def carregar_env(caminho_env=None):
     """Carrega variáveis de ambiente do arquivo especificado"""
     global ENV_PATH
@@ -23,33 +68,31 @@ def carregar_env(caminho_env=None):
         ENV_PATH = caminho_env
         load_dotenv(dotenv_path=caminho_env)
         logger.info(f"✅ Arquivo .env carregado: {caminho_env}")
-        return True
+        carregado = True
     else:
         # Tentar carregar .env padrão
         load_dotenv()
         logger.warning("⚠️ Usando .env padrão ou variáveis do sistema")
-        return False
+        carregado = False
+    
+    # APP_URL (ex.: portal simulado) vale para qualquer .env carregado
+    CONFIG["url"] = os.getenv('APP_URL', CONFIG["url"])
+    return carregado
 
 # Configurar logging
+LOG_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
 def configurar_logging():
     """Configura o sistema de logging"""
-    log_filename = f'automatizador_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
-    
-    # Criar formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = LOG_FORMATTER
     
     # Configurar logger principal
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.INFO)
     
-    # Handler para arquivo
-    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
     # Handler para console
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
@@ -59,6 +102,15 @@ def configurar_logging():
 
 logger = configurar_logging()
 
+def configurar_log_arquivo(diretorio="."):
+    """Adiciona o arquivo de log da execução no diretório de saída"""
+    log_filename = os.path.join(diretorio, f'automatizador_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+    
+    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
+    file_handler.setFormatter(LOG_FORMATTER)
+    logger.addHandler(file_handler)
+    return log_filename
+
 # Configurações do sistema
 CONFIG = {
     "url": "https://files.jall.com.br",
@@ -88,36 +140,2022 @@ CONFIG = {
     },
     "values": {
         "frequency_id": "90",
-        "subgroup_id": "32",  # Será alterado dinamicamente
+        "subgroup_id": "32",  # Padrão; o plano do formulário usa o tipo de cliente escolhido
         "tipo_pes_id": "1",
         "cargo_id": "55",
         "setor_id": "43",
         "obs_text": "Automatizado pelo RPA",
-        "empresa_input_position": 0  # Será alterado dinamicamente
+        "empresa_input_position": 0  # Padrão; o plano do formulário usa o campo contrato escolhido
     },
     "timeouts": {
         "navigation": 30000,
         "element": 10000,
         "page_load": 3000,
         "retry_delay": 2
+    },
+    "http_direto": {
+        "habilitado": False,  # Reenvia os formulários gravados sem renderizar páginas
+        "endpoints": ["usuarios_incluiAcesso.do", "usuarios_incluiGrupo.do"],
+        "charset_padrao": "iso-8859-1",
+        "marcadores_sucesso": ["sucesso"],
+        "marcadores_erro": ["erro", "já existe", "ja existe"],
+        "max_rejeicoes": 3,  # Rejeições seguidas antes de desativar o envio direto
+        # Chave da planilha -> nome do campo no formulário
+        "campos_formulario": {
+            "loginGestor": "loginGestor",
+            "emailGestor": "emailGestor",
+            "loginGestor2": "loginGestor2",
+            "emailGestor2": "emailGestor2",
+            "nome": "nome",
+            "usuario": "usuario",
+            "email": "email",
+            "filtro_cliente": "filtro_cliente"
+        }
+    },
+    "planilha": {
+        "tamanho_lote": 100,  # Linhas lidas e validadas por vez
+        "tamanho_fila": 200,  # Linhas lidas aguardando um worker livre
+        # Cabeçalho normalizado (minúsculo, sem acento) -> chave interna
+        "colunas": {
+            "login gestor 1": "loginGestor",
+            "email gestor 1": "emailGestor",
+            "login gestor 2": "loginGestor2",
+            "email gestor 2": "emailGestor2",
+            "nome": "nome",
+            "login": "usuario",
+            "usuario": "usuario",
+            "email": "email",
+            "cliente": "filtro_cliente",
+            "filtro cliente": "filtro_cliente"
+        }
+    },
+    "checkpoint": {
+        "habilitado": True  # Diário por linha para retomar execuções interrompidas
+    },
+    "indice": {
+        "habilitado": True,  # Pula logins já cadastrados em execuções anteriores
+        "arquivo": "usuarios_provisionados.txt",
+        "reconciliar": False,  # Reconstrói o índice a partir da listagem do portal
+        "url_listagem": None,  # Ex.: "usuarios.do" (relativo a CONFIG["url"])
+        "seletor_login": "td.login"
+    },
+    "recursos": {
+        "habilitado": True,  # Bloqueia recursos que os formulários .do não precisam
+        "bloquear_tipos": ["image", "stylesheet", "font", "media"],
+        "bloquear_terceiros": True,  # Hosts diferentes de CONFIG["url"]
+        "bloquear_urls": [],  # Regex de URLs sempre bloqueadas
+        "permitir": [r"lupa\.gif"],  # Regex de URLs sempre liberadas (têm prioridade)
+        # Tamanho médio estimado por tipo, para o relatório de economia
+        "tamanho_medio_bytes": {"image": 15000, "stylesheet": 20000, "font": 40000, "media": 100000, "outro": 10000}
+    },
+    "metricas": {
+        "porta": None,  # Porta do endpoint /metrics (None desativa)
+        "host": "127.0.0.1",
+        "janela_vazao_segundos": 300  # Janela do gauge de usuários/minuto
+    },
+    "cache_sessao": {
+        "habilitado": True,  # Reaproveita cookies de logins anteriores (requer o pacote cryptography)
+        "max_estados": 8  # Sessões guardadas por usuário (uma por worker)
+    },
+    "pool": {
+        "habilitado": True,  # Interface: mantém contextos logados entre execuções
+        "tamanho": None,  # Sessões mantidas aquecidas (None usa o número de workers)
+        "rotacao_segundos": 1200,  # Renova a sessão antes de o portal expirá-la
+        "verificacao_segundos": 60  # Intervalo das verificações de saúde das sessões livres
+    },
+    "preenchimento": {
+        "em_lote": True  # Preenche campos e selects em uma única chamada ao navegador
+    },
+    "carga": {
+        "adaptativa": True,  # False mantém a concorrência máxima e a pausa fixa retry_delay
+        "concorrencia_inicial": 1,  # Usuários simultâneos no início; sobe até os workers disponíveis
+        "pausa_inicial_segundos": 2.0,  # Pausa de cada worker entre usuários
+        "pausa_min_segundos": 0.0,
+        "pausa_max_segundos": 30.0,
+        "passo_pausa_segundos": 0.25,  # Redução aditiva da pausa quando o portal está saudável
+        "latencia_alvo_ms": 2000,  # Tempo médio até o primeiro byte das páginas .do
+        "taxa_erro_max": 0.05,  # Fração de respostas .do com erro (5xx ou falha de rede)
+        "fator_reducao": 0.5,  # Redução multiplicativa da concorrência quando o portal degrada
+        "amostras_por_ajuste": 10,  # Respostas observadas entre ajustes
+        # Erros de etapa que contam como falha do portal (rede e timeout); elemento ausente não conta
+        "padroes_sobrecarga": [r"timeout", r"net::err_", r"econnreset"]
+    },
+    "retentativas": {
+        "habilitado": True,  # Repete etapas idempotentes que falharam por erro transitório
+        "max_tentativas_etapa": 3,  # Novas tentativas por etapa e por usuário
+        "max_reenvios": 1,  # Reenvios do formulário após confirmar na listagem que não foi gravado
+        "orcamento_execucao": 50,  # Total de novas tentativas permitidas na execução
+        "atraso_base_segundos": 1.0,  # Backoff exponencial: base * 2^(tentativa - 1), com jitter
+        "atraso_max_segundos": 20.0,
+        # Regex (sem diferenciar maiúsculas) avaliadas na mensagem do erro; permanentes têm prioridade
+        "padroes_permanentes": [r"obrigat[óo]rio", r"j[áa] existe", r"inv[áa]lid"],
+        "padroes_transitorios": [
+            r"timeout", r"net::err_", r"target (page, context or browser )?(has been )?closed",
+            r"frame (was|got) detached", r"execution context was destroyed",
+            r"n[ãa]o encontrad[oa]", r"\b50[234]\b", r"econnreset"
+        ]
+    },
+    "esperas": {
+        "eventos": True,  # False volta às pausas fixas
+        "teto_segundos": 15  # Tempo máximo aguardando um evento antes do fallback
+    },
+    "interface": {
+        "max_linhas_log": 2000,  # Linhas visíveis na área de logs (o arquivo de log guarda tudo)
+        "intervalo_log_ms": 100,  # Período em que a interface descarrega a fila de logs
+        "nivel_log": "INFO",  # Nível mínimo exibido na interface
+        "quadros_por_segundo": 4  # Atualizações por segundo do painel de progresso
+    },
+    "saida": {
+        "diretorio": "."  # Relatórios, checkpoints e índice de usuários
+    },
+    "relatorio": {
+        "amostra_erros": 50  # Erros listados no log e no resumo (todos ficam no resultados_*.jsonl)
+    },
+    "historico": {
+        "habilitado": True,  # Indexa cada relatório em SQLite para o histórico da interface
+        "arquivo": "historico_execucoes.sqlite3",  # Na pasta de saída
+        "itens_por_pagina": 50
+    },
+    "execucao": {
+        "reutilizar_sessao": True,  # Um login por worker para toda a planilha
+        "headless": True,  # False abre a janela do Chromium para depuração
+        "workers": 1,  # Contextos de navegador processando em paralelo
+        "max_concorrencia": 8,
+        "max_redistribuicoes": 2,  # Vezes que uma linha volta à fila após falha de sessão
+        "max_falhas_worker": 3  # Falhas seguidas antes de encerrar o worker
     }
 }
 
-class AutomatizadorGestao:
+# Usuário em processamento na task atual (cada worker é uma task)
+USUARIO_ATUAL = contextvars.ContextVar("usuario_atual", default=None)
+# Linha da planilha (numeração do Excel) do usuário em processamento
+LINHA_ATUAL = contextvars.ContextVar("linha_atual", default=None)
+# Gravador de formulários da sessão do worker (None com o envio direto desligado)
+GRAVADOR_ATUAL = contextvars.ContextVar("gravador_atual", default=None)
+
+class MedidorTempos:
+    """Mede a duração de cada etapa e monta a linha do tempo por usuário"""
+    
+    BALDES_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+    MAX_AMOSTRAS = 1024  # Reservatório por etapa para p50/p95, independente do tamanho da planilha
+    
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.amostras = {}
+        self.histogramas = {}
+        self.linhas_do_tempo = {}
+    
+    @contextmanager
+    def medir(self, etapa):
+        """Cronometra o bloco e registra na etapa e na linha do tempo do usuário atual"""
+        inicio = time.monotonic()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "erro"
+            raise
+        finally:
+            self.registrar(etapa, inicio, time.monotonic() - inicio, status)
+    
+    def registrar(self, etapa, inicio, duracao, status="ok"):
+        # Histograma cumulativo mantido incrementalmente para o /metrics
+        histograma = self.histogramas.setdefault(etapa, {
+            "baldes": [0] * len(self.BALDES_MS),
+            "soma": 0.0,
+            "contagem": 0,
+            "max": 0.0
+        })
+        for i, limite in enumerate(self.BALDES_MS):
+            if duracao * 1000 <= limite:
+                histograma["baldes"][i] += 1
+        histograma["soma"] += duracao
+        histograma["contagem"] += 1
+        histograma["max"] = max(histograma["max"], duracao)
+        
+        # Amostragem de reservatório: toda duração tem a mesma chance de ficar na amostra
+        amostras = self.amostras.setdefault(etapa, [])
+        if len(amostras) < self.MAX_AMOSTRAS:
+            amostras.append(duracao)
+        else:
+            posicao = random.randrange(histograma["contagem"])
+            if posicao < self.MAX_AMOSTRAS:
+                amostras[posicao] = duracao
+        
+        usuario = USUARIO_ATUAL.get()
+        if usuario is not None:
+            self.linhas_do_tempo.setdefault(str(usuario), []).append({
+                "etapa": etapa,
+                "inicio_s": round(inicio - self.inicio, 3),
+                "duracao_ms": round(duracao * 1000, 1),
+                "status": status
+            })
+    
+    def retirar_linha_do_tempo(self, usuario):
+        """Entrega e esquece a linha do tempo do usuário concluído"""
+        return self.linhas_do_tempo.pop(str(usuario), [])
+    
+    @staticmethod
+    def percentil(valores_ordenados, p):
+        indice = max(0, int(round(p / 100 * len(valores_ordenados))) - 1)
+        return valores_ordenados[min(indice, len(valores_ordenados) - 1)]
+    
+    def resumo(self):
+        """p50/p95 (pela amostra), máx, total e histograma (ms) por etapa"""
+        resumo = {}
+        for etapa, acumulado in list(self.histogramas.items()):
+            valores = sorted(d * 1000 for d in self.amostras[etapa])
+            
+            # Baldes cumulativos convertidos em contagem por faixa
+            histograma = {}
+            anterior = 0
+            for limite, contagem in zip(self.BALDES_MS, acumulado["baldes"]):
+                histograma[f"<={limite}"] = contagem - anterior
+                anterior = contagem
+            histograma["+Inf"] = acumulado["contagem"] - anterior
+            
+            resumo[etapa] = {
+                "amostras": acumulado["contagem"],
+                "p50_ms": round(self.percentil(valores, 50), 1),
+                "p95_ms": round(self.percentil(valores, 95), 1),
+                "max_ms": round(acumulado["max"] * 1000, 1),
+                "total_s": round(acumulado["soma"], 2),
+                "histograma_ms": histograma
+            }
+        return resumo
+
+class MotorEsperas:
+    """Substitui pausas fixas por eventos da página, com teto de segurança"""
+    
+    def __init__(self, tempos=None):
+        self.tempos = tempos
+        self.stats = {
+            "eventos": 0,
+            "fallbacks": 0,
+            "tempo_economizado_segundos": 0.0,
+            "tempo_em_fallback_segundos": 0.0,  # Esperas sem evento (até o teto + pausa restante)
+            "por_etapa": {}
+        }
+    
+    async def aguardar(self, nome, acao, condicao, pausa_fixa):
+        """Executa a ação e aguarda o evento que antes era coberto por uma pausa fixa
+        
+        A condição é iniciada antes da ação para que o evento não seja perdido.
+        Se o evento não ocorrer até o teto, cumpre a pausa fixa original.
+        """
+        if not CONFIG["esperas"]["eventos"]:
+            if acao:
+                await acao()
+            await asyncio.sleep(pausa_fixa)
+            return
+        
+        inicio = time.monotonic()
+        tarefa = asyncio.ensure_future(condicao())
+        await asyncio.sleep(0)  # Garante o registro do listener antes da ação
+        
+        try:
+            if acao:
+                await acao()
+        except Exception:
+            tarefa.cancel()
+            raise
+        
+        evento = True
+        try:
+            await asyncio.wait_for(tarefa, timeout=CONFIG["esperas"]["teto_segundos"])
+        except Exception as e:
+            evento = False
+            logger.warning(f"⌛ Espera '{nome}' sem evento, usando pausa fixa: {e}")
+            restante = pausa_fixa - (time.monotonic() - inicio)
+            if restante > 0:
+                await asyncio.sleep(restante)
+        
+        decorrido = time.monotonic() - inicio
+        if self.tempos:
+            self.tempos.registrar(f"espera:{nome}", inicio, decorrido, "ok" if evento else "fallback")
+        
+        etapa = self.stats["por_etapa"].setdefault(nome, {
+            "eventos": 0,
+            "fallbacks": 0,
+            "economizado_segundos": 0.0,
+            "fallback_segundos": 0.0
+        })
+        
+        if evento:
+            self.stats["eventos"] += 1
+            etapa["eventos"] += 1
+            
+            # Evento mais lento que a pausa fixa não conta como economia negativa
+            economizado = max(0.0, pausa_fixa - decorrido)
+            self.stats["tempo_economizado_segundos"] += economizado
+            etapa["economizado_segundos"] += economizado
+        else:
+            self.stats["fallbacks"] += 1
+            etapa["fallbacks"] += 1
+            self.stats["tempo_em_fallback_segundos"] += decorrido
+            etapa["fallback_segundos"] += decorrido
+
+class ErroAposEnvio(Exception):
+    """Falha depois do clique em enviar: o cadastro pode ter sido gravado"""
+
+class PoliticaRetentativa:
+    """Decide se uma etapa que falhou pode ser repetida e quanto esperar
+    
+    Só erros transitórios são repetidos, com backoff exponencial e jitter,
+    até o limite por etapa e o orçamento total da execução. Falhas após o
+    envio do formulário nunca são repetidas às cegas (ver ErroAposEnvio).
+    """
+    
+    def __init__(self):
+        config = CONFIG["retentativas"]
+        self.orcamento = config["orcamento_execucao"]
+        self.permanentes = [re.compile(p, re.IGNORECASE) for p in config["padroes_permanentes"]]
+        self.transitorios = [re.compile(p, re.IGNORECASE) for p in config["padroes_transitorios"]]
+        self.stats = {
+            "retentativas": 0,
+            "recuperadas": 0,
+            "reenvios": 0,
+            "confirmados_na_listagem": 0,
+            "permanentes": 0,
+            "orcamento_esgotado": 0,
+            "por_etapa": {}
+        }
+    
+    def classificar(self, erro):
+        """'transitorio' ou 'permanente' (erros desconhecidos não são repetidos)"""
+        mensagem = f"{type(erro).__name__}: {erro}"
+        if any(p.search(mensagem) for p in self.permanentes):
+            return "permanente"
+        if any(p.search(mensagem) for p in self.transitorios):
+            return "transitorio"
+        return "permanente"
+    
+    def atraso(self, tentativa):
+        """Backoff exponencial com jitter: metade fixa, metade aleatória"""
+        config = CONFIG["retentativas"]
+        teto = min(config["atraso_max_segundos"], config["atraso_base_segundos"] * 2 ** (tentativa - 1))
+        return teto / 2 + random.uniform(0, teto / 2)
+    
+    def consumir_orcamento(self):
+        if self.orcamento <= 0:
+            self.stats["orcamento_esgotado"] += 1
+            if self.stats["orcamento_esgotado"] == 1:
+                logger.warning("⚠️ Orçamento de novas tentativas da execução esgotado")
+            return False
+        self.orcamento -= 1
+        return True
+    
+    def pode_repetir(self, etapa, erro, tentativa):
+        """Registra a falha e indica se a etapa deve ser executada de novo"""
+        if not CONFIG["retentativas"]["habilitado"] or isinstance(erro, ErroAposEnvio):
+            return False
+        
+        if self.classificar(erro) == "permanente":
+            self.stats["permanentes"] += 1
+            return False
+        
+        if tentativa >= CONFIG["retentativas"]["max_tentativas_etapa"] or not self.consumir_orcamento():
+            return False
+        
+        self.stats["retentativas"] += 1
+        self.stats["por_etapa"][etapa] = self.stats["por_etapa"].get(etapa, 0) + 1
+        return True
+    
+    def pode_reenviar(self, reenvios):
+        """Reenvio do formulário completo, já confirmado que não foi gravado"""
+        if not CONFIG["retentativas"]["habilitado"] or reenvios >= CONFIG["retentativas"]["max_reenvios"]:
+            return False
+        if not self.consumir_orcamento():
+            return False
+        self.stats["reenvios"] += 1
+        return True
+
+class ControladorCarga:
+    """Ajusta concorrência e pausa entre usuários pela saúde do portal (AIMD)
+    
+    Observa o tempo até o primeiro byte e os erros das páginas .do. A cada
+    janela de amostras saudável a concorrência sobe uma vaga e a pausa cai
+    um passo; se a latência média ou a taxa de erro passam do alvo, a
+    concorrência é reduzida pelo fator e a pausa dobra.
+    """
+    
+    def __init__(self, maximo=1):
+        config = CONFIG["carga"]
+        self.adaptativa = config["adaptativa"]
+        self.maximo = max(1, maximo)
+        
+        if self.adaptativa:
+            self.limite = max(1, min(self.maximo, config["concorrencia_inicial"]))
+            self.pausa = config["pausa_inicial_segundos"]
+        else:
+            self.limite = self.maximo
+            self.pausa = CONFIG["timeouts"]["retry_delay"]
+        
+        self.em_uso = 0
+        self.aguardando = deque()
+        self.amostras = []
+        self.padroes_sobrecarga = [re.compile(p, re.IGNORECASE) for p in config["padroes_sobrecarga"]]
+        self.stats = {
+            "respostas": 0,
+            "erros": 0,
+            "aumentos": 0,
+            "reducoes": 0,
+            "limite_min": self.limite,
+            "limite_max": self.limite,
+            "ajustes": deque(maxlen=200)
+        }
+    
+    async def adquirir(self):
+        while self.em_uso >= self.limite:
+            futuro = asyncio.get_running_loop().create_future()
+            self.aguardando.append(futuro)
+            await futuro
+        self.em_uso += 1
+    
+    def liberar(self):
+        self.em_uso -= 1
+        self._acordar()
+    
+    def _acordar(self):
+        livres = self.limite - self.em_uso
+        while livres > 0 and self.aguardando:
+            futuro = self.aguardando.popleft()
+            if not futuro.done():
+                futuro.set_result(None)
+                livres -= 1
+    
+    def observar(self, latencia_ms, erro=False):
+        """Registra uma resposta .do (latência None quando não houve resposta)"""
+        self.stats["respostas"] += 1
+        if erro:
+            self.stats["erros"] += 1
+        
+        if not self.adaptativa:
+            return
+        
+        self.amostras.append((latencia_ms, erro))
+        if len(self.amostras) >= CONFIG["carga"]["amostras_por_ajuste"]:
+            self.ajustar()
+    
+    def observar_erro_etapa(self, erro):
+        """Conta a falha de uma etapa apenas se indicar rede ou timeout do portal"""
+        mensagem = f"{type(erro).__name__}: {erro}"
+        if any(p.search(mensagem) for p in self.padroes_sobrecarga):
+            self.observar(None, True)
+    
+    def ajustar(self):
+        config = CONFIG["carga"]
+        latencias = [l for l, _ in self.amostras if l is not None]
+        latencia_media = sum(latencias) / len(latencias) if latencias else 0.0
+        taxa_erro = sum(1 for _, erro in self.amostras if erro) / len(self.amostras)
+        self.amostras = []
+        
+        anterior = (self.limite, self.pausa)
+        if taxa_erro > config["taxa_erro_max"] or latencia_media > config["latencia_alvo_ms"]:
+            self.limite = max(1, int(self.limite * config["fator_reducao"]))
+            self.pausa = min(config["pausa_max_segundos"], max(self.pausa * 2, config["passo_pausa_segundos"]))
+            self.stats["reducoes"] += 1
+            logger.warning(
+                f"🐢 Portal degradado (latência média {latencia_media:.0f} ms, erros {taxa_erro:.0%}): "
+                f"concorrência {self.limite}, pausa {self.pausa:.2f} s"
+            )
+        else:
+            self.limite = min(self.maximo, self.limite + 1)
+            self.pausa = max(config["pausa_min_segundos"], self.pausa - config["passo_pausa_segundos"])
+            self.stats["aumentos"] += 1
+            if (self.limite, self.pausa) != anterior:
+                logger.debug(f"🚀 Concorrência {self.limite}, pausa {self.pausa:.2f} s (latência média {latencia_media:.0f} ms)")
+        
+        self.stats["limite_min"] = min(self.stats["limite_min"], self.limite)
+        self.stats["limite_max"] = max(self.stats["limite_max"], self.limite)
+        self.stats["ajustes"].append({
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+            "latencia_media_ms": round(latencia_media, 1),
+            "taxa_erro": round(taxa_erro, 3),
+            "limite": self.limite,
+            "pausa_segundos": round(self.pausa, 2)
+        })
+        self._acordar()
+
+class RegistroFrames:
+    """Indexa os frames de uma página a partir dos eventos do Playwright"""
+    
+    def __init__(self, page):
+        self.por_url = {}
+        self.aguardando = []
+        
+        for frame in page.frames:
+            self._indexar(frame)
+        
+        page.on("frameattached", self._indexar)
+        page.on("framenavigated", self._indexar)
+        page.on("framedetached", self._remover)
+    
+    def _indexar(self, frame):
+        """Atualiza o índice e resolve quem aguarda um padrão compatível"""
+        self._remover(frame)
+        self.por_url.setdefault(frame.url, []).append(frame)
+        
+        for padrao, futuro in self.aguardando:
+            if padrao in frame.url and not futuro.done():
+                futuro.set_result(frame)
+        self.aguardando = [(p, f) for p, f in self.aguardando if not f.done()]
+    
+    def _remover(self, frame):
+        """Retira do índice um frame que navegou ou foi desanexado"""
+        for url, frames in list(self.por_url.items()):
+            if frame in frames:
+                frames.remove(frame)
+                if not frames:
+                    del self.por_url[url]
+    
+    def buscar(self, padrao):
+        """Retorna imediatamente o frame indexado que casa com o padrão"""
+        for url, frames in self.por_url.items():
+            if padrao in url:
+                for frame in frames:
+                    if not frame.is_detached():
+                        return frame
+        return None
+    
+    async def aguardar(self, padrao, timeout):
+        """Resolve no instante em que um frame com o padrão aparecer"""
+        frame = self.buscar(padrao)
+        if frame:
+            return frame
+        
+        futuro = asyncio.get_running_loop().create_future()
+        self.aguardando.append((padrao, futuro))
+        try:
+            return await asyncio.wait_for(futuro, timeout=timeout)
+        finally:
+            self.aguardando = [(p, f) for p, f in self.aguardando if f is not futuro]
+
+class ExtratorTextoHTML(HTMLParser):
+    """Extrai o texto visível de uma resposta HTML"""
+    
+    def __init__(self):
+        super().__init__()
+        self.partes = []
+        self._ignorar = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._ignorar += 1
+    
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._ignorar:
+            self._ignorar -= 1
+    
+    def handle_data(self, data):
+        if not self._ignorar:
+            self.partes.append(data)
+    
+    @classmethod
+    def extrair(cls, html):
+        extrator = cls()
+        extrator.feed(html)
+        return re.sub(r"\s+", " ", " ".join(extrator.partes)).strip()
+
+class FiltroRecursos:
+    """Bloqueia imagens, CSS, fontes e terceiros via route() do contexto"""
+    
+    def __init__(self):
+        self.stats = {
+            "bloqueados": 0,
+            "permitidos": 0,
+            "bytes_economizados_estimados": 0,
+            "por_tipo": {}
+        }
+    
+    async def instalar(self, context):
+        await context.route("**/*", self._rotear)
+    
+    def deve_bloquear(self, request):
+        """Aplica as regras de CONFIG["recursos"]; a lista 'permitir' tem prioridade"""
+        config = CONFIG["recursos"]
+        url = request.url
+        
+        if any(re.search(padrao, url) for padrao in config["permitir"]):
+            return False
+        if any(re.search(padrao, url) for padrao in config["bloquear_urls"]):
+            return True
+        if request.resource_type in config["bloquear_tipos"]:
+            return True
+        if config["bloquear_terceiros"] and url.startswith("http"):
+            return urlparse(url).hostname != urlparse(CONFIG["url"]).hostname
+        return False
+    
+    async def _rotear(self, route):
+        request = route.request
+        
+        if not self.deve_bloquear(request):
+            self.stats["permitidos"] += 1
+            await route.continue_()
+            return
+        
+        tipo = request.resource_type
+        tamanhos = CONFIG["recursos"]["tamanho_medio_bytes"]
+        self.stats["bloqueados"] += 1
+        self.stats["bytes_economizados_estimados"] += tamanhos.get(tipo, tamanhos["outro"])
+        self.stats["por_tipo"][tipo] = self.stats["por_tipo"].get(tipo, 0) + 1
+        await route.abort("blockedbyclient")
+
+class GravadorFormularios:
+    """Captura os POSTs dos formulários .do feitos pelo navegador"""
+    
+    def __init__(self, page):
+        self.page = page
+        self.posts = []
+        page.on("request", self._capturar)
+    
+    def desligar(self):
+        """Para de capturar (a página pode voltar ao pool de sessões)"""
+        try:
+            self.page.remove_listener("request", self._capturar)
+        except Exception as e:
+            logger.debug(f"Erro ao desligar gravador: {e}")
+    
+    def _capturar(self, request):
+        if request.method != "POST":
+            return
+        if not any(endpoint in request.url for endpoint in CONFIG["http_direto"]["endpoints"]):
+            return
+        
+        self.posts.append({
+            "url": request.url,
+            "corpo": request.post_data_buffer or b"",
+            "content_type": request.headers.get("content-type", "")
+        })
+    
+    def reiniciar(self):
+        self.posts = []
+
+class MotorHTTPDireto:
+    """Reenvia os formulários gravados via HTTP usando a sessão do navegador"""
+    
+    def __init__(self):
+        self.modelo = None
+        self.desativado = False
+        self.rejeicoes_seguidas = 0
+        self.observador = None  # Recebe (latência em ms, erro) de cada POST enviado
+        self.stats = {
+            "envios": 0,
+            "confirmados": 0,
+            "rejeitados": 0,
+            "fallbacks": 0,
+            "tempo_total_segundos": 0.0
+        }
+    
+    @property
+    def pronto(self):
+        return self.modelo is not None and not self.desativado
+    
+    def aprender(self, posts):
+        """Valida e guarda o modelo a partir dos POSTs de um cadastro bem-sucedido"""
+        config = CONFIG["http_direto"]
+        modelo = []
+        
+        for post in posts:
+            content_type = post["content_type"]
+            if "application/x-www-form-urlencoded" not in content_type:
+                logger.warning(f"⚠️ Envio direto desativado: POST com formato inesperado ({content_type})")
+                self.desativado = True
+                return False
+            
+            charset = config["charset_padrao"]
+            encontrado = re.search(r"charset=([\w-]+)", content_type)
+            if encontrado:
+                charset = encontrado.group(1)
+            
+            modelo.append({
+                "url": post["url"],
+                "content_type": content_type,
+                "charset": charset,
+                "campos": parse_qsl(post["corpo"].decode("latin-1"), keep_blank_values=True, encoding=charset)
+            })
+        
+        if not modelo:
+            logger.warning("⚠️ Nenhum POST de formulário gravado, envio direto indisponível")
+            return False
+        
+        nomes_finais = {nome for nome, _ in modelo[-1]["campos"]}
+        obrigatorios = ['nome', 'usuario', 'email', 'filtro_cliente']
+        faltando = [c for c in obrigatorios if config["campos_formulario"][c] not in nomes_finais]
+        if faltando:
+            logger.warning(f"⚠️ Envio direto desativado: campos {faltando} ausentes no formulário gravado")
+            self.desativado = True
+            return False
+        
+        self.modelo = modelo
+        logger.info(f"📼 Formulários gravados para envio direto ({len(modelo)} POSTs)")
+        return True
+    
+    def montar_campos(self, campos, dados):
+        """Substitui no formulário gravado os valores do usuário atual"""
+        valores = {}
+        for chave, nome in CONFIG["http_direto"]["campos_formulario"].items():
+            valor = dados.get(chave)
+            valores[nome] = str(valor).strip() if valor is not None and pd.notna(valor) else ""
+        
+        for chave in ['nome', 'usuario', 'email', 'filtro_cliente']:
+            if not valores[CONFIG["http_direto"]["campos_formulario"][chave]]:
+                raise Exception(f"Campo obrigatório '{chave}' não encontrado ou vazio")
+        
+        return [(nome, valores.get(nome, valor)) for nome, valor in campos]
+    
+    async def enviar(self, context, dados):
+        """Envia os formulários do usuário
+        
+        Retorna True quando o portal confirma o cadastro e None quando o
+        caminho pelo navegador deve ser usado (status HTTP inesperado ou
+        sessão expirada). Rejeição explícita do portal levanta exceção: o
+        usuário fica com erro e não é reenviado pelo navegador. Uma resposta
+        sem confirmação nem erro também levanta exceção, pois o cadastro
+        pode ter ocorrido.
+        """
+        config = CONFIG["http_direto"]
+        inicio = time.monotonic()
+        
+        try:
+            for i, post in enumerate(self.modelo):
+                corpo = urlencode(self.montar_campos(post["campos"], dados), encoding=post["charset"])
+                inicio_post = time.monotonic()
+                try:
+                    resposta = await context.request.post(
+                        post["url"],
+                        data=corpo,
+                        headers={"Content-Type": post["content_type"]},
+                        timeout=CONFIG["timeouts"]["navigation"]
+                    )
+                except Exception:
+                    if self.observador:
+                        self.observador(None, True)
+                    raise
+                self.stats["envios"] += 1
+                if self.observador:
+                    self.observador((time.monotonic() - inicio_post) * 1000, resposta.status >= 500)
+                
+                if not resposta.ok:
+                    logger.warning(f"⚠️ Envio direto recebeu HTTP {resposta.status}, usando navegador")
+                    return self._fallback()
+                
+                html = (await resposta.body()).decode(post["charset"], errors="replace")
+                
+                # Sessão expirada devolve a tela de login
+                if CONFIG["selectors"]["username_field"].lstrip("#") in html:
+                    logger.info("🔄 Sessão expirada no envio direto, usando navegador")
+                    return self._fallback()
+            
+            texto = ExtratorTextoHTML.extrair(html).lower()
+            
+            if any(m in texto for m in config["marcadores_sucesso"]):
+                self.rejeicoes_seguidas = 0
+                self.stats["confirmados"] += 1
+                return True
+            
+            if any(m in texto for m in config["marcadores_erro"]):
+                self.rejeicoes_seguidas += 1
+                self.stats["rejeitados"] += 1
+                if self.rejeicoes_seguidas >= config["max_rejeicoes"]:
+                    logger.warning("⚠️ Envio direto desativado após rejeições seguidas do portal")
+                    self.desativado = True
+                # Reenviar pelo navegador seria um segundo cadastro do mesmo usuário
+                raise Exception(f"Portal rejeitou o cadastro: {texto[:120]}")
+            
+            # Sem confirmação: não reenviar para não duplicar o usuário
+            self.desativado = True
+            raise Exception(f"Envio direto sem confirmação do portal: {texto[:120]}")
+        
+        finally:
+            self.stats["tempo_total_segundos"] += time.monotonic() - inicio
+    
+    def _fallback(self):
+        self.stats["fallbacks"] += 1
+        return None
+
+class LeitorPlanilha:
+    """Lê a planilha em streaming (xlsx via openpyxl read_only, ou CSV)
+    
+    Cada linha é entregue como um dict {cabeçalho: valor}, sem montar
+    DataFrame. Arquivos .xls antigos ainda são lidos pelo pandas.
+    """
+    
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.extensao = os.path.splitext(caminho)[1].lower()
+    
+    def contar_linhas(self):
+        """Estimativa da quantidade de linhas, pelos metadados quando possível
+        
+        Não lê os valores: max_row do xlsx e linhas físicas do CSV também
+        contam linhas em branco ou formatadas e células com quebra de linha.
+        O total exato é conhecido ao fim da leitura (ver alimentar_fila).
+        """
+        if self.extensao in ('.xlsx', '.xlsm'):
+            from openpyxl import load_workbook
+            
+            wb = load_workbook(self.caminho, read_only=True)
+            try:
+                ws = wb.active
+                if ws.max_row is not None:
+                    return max(ws.max_row - 1, 0)
+                # Sem dimensão gravada no arquivo: contar sem carregar valores
+                return max(sum(1 for _ in ws.iter_rows(values_only=True)) - 1, 0)
+            finally:
+                wb.close()
+        
+        if self.extensao == '.csv':
+            with open(self.caminho, 'r', encoding='utf-8-sig', newline='') as f:
+                return max(sum(1 for _ in f) - 1, 0)
+        
+        return len(pd.read_excel(self.caminho))
+    
+    def __iter__(self):
+        if self.extensao in ('.xlsx', '.xlsm'):
+            yield from self._ler_xlsx()
+        elif self.extensao == '.csv':
+            yield from self._ler_csv()
+        else:
+            for registro in pd.read_excel(self.caminho).to_dict('records'):
+                yield registro
+    
+    @staticmethod
+    def _montar_registro(cabecalhos, valores):
+        """Associa valores aos cabeçalhos; retorna None para linhas em branco"""
+        registro = {}
+        vazio = True
+        for cabecalho, valor in zip(cabecalhos, valores):
+            if isinstance(valor, str):
+                valor = valor if valor.strip() else None
+            if valor is not None:
+                vazio = False
+            registro[cabecalho] = valor
+        return None if vazio else registro
+    
+    @staticmethod
+    def _normalizar_cabecalhos(linha):
+        return [
+            str(valor).strip() if valor is not None and str(valor).strip() else f"coluna_{i + 1}"
+            for i, valor in enumerate(linha)
+        ]
+    
+    def _ler_xlsx(self):
+        from openpyxl import load_workbook
+        
+        wb = load_workbook(self.caminho, read_only=True, data_only=True)
+        try:
+            linhas = wb.active.iter_rows(values_only=True)
+            cabecalhos = self._normalizar_cabecalhos(next(linhas, ()))
+            
+            for valores in linhas:
+                registro = self._montar_registro(cabecalhos, valores)
+                if registro:
+                    yield registro
+        finally:
+            wb.close()
+    
+    def _ler_csv(self):
+        with open(self.caminho, 'r', encoding='utf-8-sig', newline='') as f:
+            amostra = f.read(4096)
+            f.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+            except csv.Error:
+                dialeto = csv.excel
+            
+            linhas = csv.reader(f, dialeto)
+            cabecalhos = self._normalizar_cabecalhos(next(linhas, []))
+            
+            for valores in linhas:
+                registro = self._montar_registro(cabecalhos, valores)
+                if registro:
+                    yield registro
+
+class ValidadorPlanilha:
+    """Normaliza cabeçalhos e valida as linhas em lote antes de qualquer navegador"""
+    
+    OBRIGATORIOS = ['nome', 'usuario', 'email', 'filtro_cliente']
+    CAMPOS_EMAIL = ['email', 'emailGestor', 'emailGestor2']
+    REGEX_EMAIL = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+    
+    def __init__(self):
+        self.logins_vistos = set()
+    
+    @staticmethod
+    def normalizar_cabecalho(texto):
+        """'E-mail' -> 'email', 'Login gestor 1' -> 'login gestor 1'"""
+        texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+        texto = re.sub(r"[\s_]+", " ", texto.lower()).strip()
+        return texto.replace("-", "")
+    
+    @staticmethod
+    def normalizar_valor(valor):
+        """12345.0 (número lido do Excel) -> '12345', sem o '.0' no login"""
+        if isinstance(valor, float) and valor.is_integer():
+            return str(int(valor))
+        return valor
+    
+    def mapear_colunas(self, colunas):
+        """Nome original da coluna -> chave interna usada pelo automatizador"""
+        mapa_config = CONFIG["planilha"]["colunas"]
+        mapa = {}
+        for coluna in colunas:
+            if coluna in mapa_config.values():
+                mapa[coluna] = coluna
+            else:
+                chave = mapa_config.get(self.normalizar_cabecalho(coluna))
+                if chave:
+                    mapa[coluna] = chave
+        return mapa
+    
+    def validar_lote(self, registros):
+        """Valida um lote de linhas com operações vetorizadas do pandas
+        
+        Retorna uma lista alinhada com a entrada contendo, para cada linha,
+        (registro_normalizado, erros).
+        """
+        df = pd.DataFrame.from_records(registros)
+        df = df.rename(columns=self.mapear_colunas(df.columns))
+        df = df.loc[:, ~df.columns.duplicated()]
+        
+        for coluna in set(self.OBRIGATORIOS + self.CAMPOS_EMAIL + list(CONFIG["planilha"]["colunas"].values())):
+            if coluna not in df.columns:
+                df[coluna] = pd.NA
+            texto = df[coluna].map(self.normalizar_valor, na_action='ignore').astype("string").str.strip()
+            df[coluna] = texto.mask(texto == "")
+        
+        erros = [[] for _ in range(len(df))]
+        
+        def marcar(mascara, mensagem):
+            for i in mascara.to_numpy().nonzero()[0]:
+                erros[i].append(mensagem)
+        
+        for coluna in self.OBRIGATORIOS:
+            marcar(df[coluna].isna(), f"Campo obrigatório '{coluna}' vazio")
+        
+        for coluna in self.CAMPOS_EMAIL:
+            invalido = df[coluna].notna() & ~df[coluna].str.fullmatch(self.REGEX_EMAIL).fillna(False)
+            marcar(invalido, f"E-mail inválido em '{coluna}'")
+        
+        logins = df['usuario'].str.lower()
+        marcar(logins.notna() & logins.duplicated(keep='first'), "Login duplicado na planilha")
+        marcar(logins.notna() & logins.isin(self.logins_vistos), "Login duplicado na planilha")
+        self.logins_vistos.update(logins.dropna())
+        
+        normalizados = df.astype(object).where(df.notna(), None).to_dict('records')
+        return list(zip(normalizados, erros))
+
+class DiarioExecucao:
+    """Diário durável (SQLite) com o estado de cada linha da planilha
+    
+    Estados: em_andamento, concluido, falhou e pendente (devolvida ou
+    cancelada); linha ausente do diário ainda não foi processada. Cada
+    mudança é gravada com commit síncrono, fora do event loop, então uma
+    nova execução da mesma planilha sabe exatamente quais linhas já foram
+    concluídas. O estado é consultado no disco, sem manter as linhas da
+    planilha em memória.
+    """
+    
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS linhas (
+        chave TEXT PRIMARY KEY,
+        usuario TEXT,
+        estado TEXT NOT NULL,
+        erro TEXT,
+        timestamp TEXT
+    )
+    """
+    
+    def __init__(self, arquivo_planilha, diretorio="."):
+        caminho_absoluto = os.path.abspath(arquivo_planilha)
+        sufixo = hashlib.sha1(caminho_absoluto.encode('utf-8')).hexdigest()[:12]
+        nome_base = os.path.splitext(os.path.basename(arquivo_planilha))[0]
+        
+        self.caminho = os.path.join(diretorio, f"checkpoint_{nome_base}_{sufixo}.sqlite3")
+        self.lock = threading.Lock()
+        self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode = WAL")
+        self.conexao.execute("PRAGMA synchronous = FULL")
+        self.conexao.execute(self.ESQUEMA)
+        
+        total = self.conexao.execute("SELECT COUNT(*) FROM linhas").fetchone()[0]
+        logger.info(f"📒 Checkpoint carregado: {total} linhas conhecidas")
+    
+    @staticmethod
+    def chave_linha(linha):
+        """Hash estável do conteúdo da linha"""
+        valores = {str(k): ("" if v is None or pd.isna(v) else str(v).strip()) for k, v in dict(linha).items()}
+        return hashlib.sha1(json.dumps(valores, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def estado(self, chave):
+        with self.lock:
+            linha = self.conexao.execute("SELECT estado FROM linhas WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+    
+    def registrar(self, chave, usuario, estado, erro=None):
+        """Grava o novo estado da linha de forma durável"""
+        with self.lock, self.conexao:
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO linhas VALUES (?, ?, ?, ?, ?)",
+                (chave, str(usuario), estado, str(erro) if erro else None,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+    
+    def fechar(self):
+        with self.lock:
+            self.conexao.close()
+
+class GravadorResultados:
+    """Relatório em fluxo: um registro JSONL por usuário concluído
+    
+    Os registros entram em uma fila e uma thread própria grava em lotes,
+    fora do event loop. O resumo final é calculado relendo o arquivo, então
+    a memória não cresce com o tamanho da planilha.
+    """
+    
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.fila = queue.SimpleQueue()
+        self.registros = 0
+        self.thread = threading.Thread(target=self._gravar, name="gravador-resultados", daemon=True)
+        self.thread.start()
+    
+    def registrar(self, registro):
+        self.registros += 1
+        self.fila.put(registro)
+    
+    def _gravar(self):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            while True:
+                lote = [self.fila.get()]
+                while True:
+                    try:
+                        lote.append(self.fila.get_nowait())
+                    except queue.Empty:
+                        break
+                
+                arquivo.writelines(
+                    json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+                    for registro in lote if registro is not None
+                )
+                arquivo.flush()
+                
+                if None in lote:
+                    return
+    
+    def fechar(self):
+        """Grava o que está na fila e encerra a thread"""
+        if self.thread.is_alive():
+            self.fila.put(None)
+            self.thread.join()
+    
+    def resumir(self, max_amostra):
+        """Contagens por status e tipo de erro, tentativas e amostra de erros"""
+        resumo = {
+            "arquivo": self.caminho,
+            "registros": 0,
+            "por_status": {},
+            "por_classe_erro": {},
+            "por_tipo_erro": {},
+            "tentativas_total": 0,
+            "tentativas_max": 0,
+            "usuarios_com_novas_tentativas": 0,
+            "duracao_media_ms": None,
+            "duracao_max_ms": None,
+            "amostra_erros": [],
+            "erros_fora_da_amostra": 0
+        }
+        duracao_total = 0.0
+        duracoes = 0
+        
+        if not os.path.exists(self.caminho):
+            return resumo
+        
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for texto in f:
+                try:
+                    registro = json.loads(texto)
+                except ValueError:
+                    continue
+                
+                resumo["registros"] += 1
+                status = registro.get("status")
+                resumo["por_status"][status] = resumo["por_status"].get(status, 0) + 1
+                
+                tentativas = registro.get("tentativas", 0)
+                resumo["tentativas_total"] += tentativas
+                resumo["tentativas_max"] = max(resumo["tentativas_max"], tentativas)
+                if tentativas > 1:
+                    resumo["usuarios_com_novas_tentativas"] += 1
+                
+                if registro.get("duracao_ms") is not None:
+                    duracao_total += registro["duracao_ms"]
+                    duracoes += 1
+                    resumo["duracao_max_ms"] = max(resumo["duracao_max_ms"] or 0, registro["duracao_ms"])
+                
+                if status != "erro":
+                    continue
+                
+                for chave, campo in (("por_classe_erro", "classe_erro"), ("por_tipo_erro", "tipo_erro")):
+                    valor = registro.get(campo)
+                    resumo[chave][valor] = resumo[chave].get(valor, 0) + 1
+                
+                if len(resumo["amostra_erros"]) < max_amostra:
+                    resumo["amostra_erros"].append({
+                        campo: registro.get(campo)
+                        for campo in ("usuario", "linha_planilha", "erro", "classe_erro", "timestamp")
+                    })
+                else:
+                    resumo["erros_fora_da_amostra"] += 1
+        
+        if duracoes:
+            resumo["duracao_media_ms"] = round(duracao_total / duracoes, 1)
+        return resumo
+
+class IndiceUsuarios:
+    """Índice local persistente dos logins já cadastrados com sucesso
+    
+    O arquivo guarda um login por linha (append-only). Na primeira vez é
+    montado a partir dos relatórios e checkpoints existentes.
+    """
+    
+    def __init__(self, caminho, diretorio="."):
+        self.caminho = caminho
+        self.diretorio = diretorio
+        self.logins = set()
+        self.lock = threading.Lock()  # Gravações chegam de threads diferentes
+        
+        if os.path.exists(self.caminho):
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                self.logins = {linha.strip() for linha in f if linha.strip()}
+        else:
+            self.reconstruir()
+        
+        logger.info(f"🗂️ Índice de usuários: {len(self.logins)} logins já cadastrados")
+    
+    @staticmethod
+    def normalizar(login):
+        return str(login).strip().lower()
+    
+    def __contains__(self, login):
+        return self.normalizar(login) in self.logins
+    
+    def logins_do_historico(self):
+        """Logins concluídos nos relatórios e checkpoints anteriores"""
+        logins = set()
+        
+        for arquivo in glob.glob(os.path.join(self.diretorio, "resultados_*.jsonl")):
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                for texto in f:
+                    try:
+                        registro = json.loads(texto)
+                    except ValueError:
+                        continue
+                    if registro.get("status") == "sucesso" and registro.get("usuario"):
+                        logins.add(self.normalizar(registro["usuario"]))
+        
+        for arquivo in glob.glob(os.path.join(self.diretorio, "checkpoint_*.sqlite3")):
+            try:
+                with closing(sqlite3.connect(arquivo)) as conexao:
+                    logins.update(
+                        self.normalizar(usuario)
+                        for (usuario,) in conexao.execute("SELECT usuario FROM linhas WHERE estado = 'concluido'")
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Checkpoint ignorado no índice ({os.path.basename(arquivo)}): {e}")
+        
+        return logins
+    
+    def reconstruir(self, logins_extras=()):
+        """Regrava o índice a partir do histórico local (e opcionalmente do portal)"""
+        self.logins = self.logins_do_historico() | {self.normalizar(l) for l in logins_extras}
+        self.logins.discard("")
+        
+        with open(self.caminho, 'w', encoding='utf-8') as f:
+            for login in sorted(self.logins):
+                f.write(login + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def adicionar(self, login):
+        """Inclui um login recém-cadastrado de forma durável (chamado fora do event loop)"""
+        login = self.normalizar(login)
+        with self.lock:
+            if login in self.logins:
+                return
+            
+            self.logins.add(login)
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                f.write(login + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+class HistoricoExecucoes:
+    """Índice SQLite das execuções e dos resultados por usuário
+    
+    Cada relatório é indexado assim que é gravado; na criação do banco os
+    relatórios já existentes na pasta são importados uma única vez. As
+    consultas filtram por data, tipo de cliente, login e tipo de erro.
+    """
+    
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS execucoes (
+        id INTEGER PRIMARY KEY,
+        relatorio TEXT UNIQUE NOT NULL,
+        resultados TEXT,
+        inicio TEXT NOT NULL,
+        tipo_cliente TEXT,
+        total INTEGER,
+        sucessos INTEGER,
+        erros INTEGER,
+        rejeitados INTEGER,
+        cancelado INTEGER,
+        tempo_execucao_segundos REAL,
+        usuarios_por_minuto REAL
+    );
+    CREATE INDEX IF NOT EXISTS execucoes_inicio ON execucoes (inicio);
+    CREATE INDEX IF NOT EXISTS execucoes_tipo_cliente ON execucoes (tipo_cliente, inicio);
+    CREATE TABLE IF NOT EXISTS resultados (
+        execucao_id INTEGER NOT NULL REFERENCES execucoes (id) ON DELETE CASCADE,
+        login TEXT NOT NULL,
+        status TEXT,
+        tipo_erro TEXT,
+        classe_erro TEXT,
+        erro TEXT,
+        linha_planilha INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS resultados_execucao ON resultados (execucao_id);
+    CREATE INDEX IF NOT EXISTS resultados_login ON resultados (login, execucao_id);
+    CREATE INDEX IF NOT EXISTS resultados_tipo_erro ON resultados (tipo_erro, execucao_id);
+    """
+    
+    def __init__(self, caminho, diretorio="."):
+        self.caminho = caminho
+        novo = not os.path.exists(caminho)
+        with closing(self.conectar()) as conexao:
+            conexao.executescript(self.ESQUEMA)
+        if novo:
+            self.importar_relatorios(diretorio)
+    
+    def conectar(self):
+        # Conexão curta por operação: gravação no laço da execução, leitura na interface
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        conexao.execute("PRAGMA foreign_keys = ON")
+        return conexao
+    
+    def importar_relatorios(self, diretorio):
+        """Indexa relatórios gravados antes da existência do banco"""
+        importados = 0
+        for arquivo in sorted(glob.glob(os.path.join(diretorio, "relatorio_*.json"))):
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    importados += self.registrar(arquivo, json.load(f))
+            except Exception as e:
+                logger.warning(f"⚠️ Relatório ignorado no histórico ({os.path.basename(arquivo)}): {e}")
+        if importados:
+            logger.info(f"🗃️ Histórico criado com {importados} relatórios existentes")
+    
+    @staticmethod
+    def linhas_resultados(relatorio):
+        """(login, status, tipo_erro, classe_erro, erro, linha) de cada usuário do relatório"""
+        arquivo = (relatorio.get("resultados") or {}).get("arquivo")
+        if arquivo and os.path.exists(arquivo):
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                for texto in f:
+                    try:
+                        registro = json.loads(texto)
+                    except ValueError:
+                        continue
+                    yield (
+                        IndiceUsuarios.normalizar(registro.get("usuario", "")),
+                        registro.get("status"),
+                        registro.get("tipo_erro"),
+                        registro.get("classe_erro"),
+                        registro.get("erro"),
+                        registro.get("linha_planilha")
+                    )
+            return
+        
+        # Relatórios anteriores ao relatório em fluxo trazem apenas a lista de erros
+        for erro in relatorio.get("usuarios_erro", []):
+            yield (IndiceUsuarios.normalizar(erro.get("usuario", "")), "erro", None, None, erro.get("erro"), None)
+    
+    def registrar(self, arquivo, relatorio):
+        """Indexa um relatório (ignorado se já indexado); retorna 1 se incluído"""
+        inicio = relatorio.get("inicio_execucao")
+        if inicio:
+            inicio = str(inicio)[:19]
+        else:
+            inicio = datetime.fromtimestamp(os.path.getmtime(arquivo)).strftime("%Y-%m-%d %H:%M:%S")
+        
+        with closing(self.conectar()) as conexao, conexao:
+            cursor = conexao.execute(
+                """INSERT OR IGNORE INTO execucoes (
+                    relatorio, resultados, inicio, tipo_cliente, total, sucessos, erros,
+                    rejeitados, cancelado, tempo_execucao_segundos, usuarios_por_minuto
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    os.path.abspath(arquivo),
+                    (relatorio.get("resultados") or {}).get("arquivo"),
+                    inicio,
+                    relatorio.get("tipo_cliente"),
+                    relatorio.get("total", 0),
+                    relatorio.get("sucessos", 0),
+                    relatorio.get("erros", 0),
+                    relatorio.get("rejeitados", 0),
+                    int(bool(relatorio.get("cancelado"))),
+                    relatorio.get("tempo_execucao_segundos"),
+                    relatorio.get("usuarios_por_minuto")
+                )
+            )
+            if not cursor.rowcount:
+                return 0
+            
+            execucao_id = cursor.lastrowid
+            conexao.executemany(
+                "INSERT INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((execucao_id, *linha) for linha in self.linhas_resultados(relatorio))
+            )
+        return 1
+    
+    @staticmethod
+    def filtros(data_inicio=None, data_fim=None, tipo_cliente=None, usuario=None, tipo_erro=None):
+        """Cláusula WHERE e parâmetros (datas no formato AAAA-MM-DD)"""
+        condicoes = []
+        parametros = []
+        if data_inicio:
+            condicoes.append("e.inicio >= ?")
+            parametros.append(data_inicio)
+        if data_fim:
+            condicoes.append("e.inicio < date(?, '+1 day')")
+            parametros.append(data_fim)
+        if tipo_cliente:
+            condicoes.append("e.tipo_cliente = ?")
+            parametros.append(tipo_cliente)
+        if usuario:
+            condicoes.append("EXISTS (SELECT 1 FROM resultados r WHERE r.execucao_id = e.id AND r.login = ?)")
+            parametros.append(IndiceUsuarios.normalizar(usuario))
+        if tipo_erro:
+            condicoes.append("EXISTS (SELECT 1 FROM resultados r WHERE r.execucao_id = e.id AND r.tipo_erro = ?)")
+            parametros.append(tipo_erro)
+        return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), parametros
+    
+    def buscar(self, pagina=0, por_pagina=50, **filtros):
+        """Página de execuções (mais recentes primeiro) e o total que atende aos filtros"""
+        where, parametros = self.filtros(**filtros)
+        with closing(self.conectar()) as conexao:
+            total = conexao.execute(f"SELECT COUNT(*) FROM execucoes e{where}", parametros).fetchone()[0]
+            linhas = conexao.execute(
+                f"""SELECT e.inicio, e.tipo_cliente, e.total, e.sucessos, e.erros, e.usuarios_por_minuto,
+                           e.cancelado, e.relatorio
+                    FROM execucoes e{where}
+                    ORDER BY e.inicio DESC
+                    LIMIT ? OFFSET ?""",
+                [*parametros, por_pagina, pagina * por_pagina]
+            ).fetchall()
+        return linhas, total
+    
+    def agregado(self, periodo="dia", **filtros):
+        """Vazão e taxa de erro por dia ou mês, entre execuções"""
+        tamanho = 7 if periodo == "mes" else 10
+        where, parametros = self.filtros(**filtros)
+        with closing(self.conectar()) as conexao:
+            linhas = conexao.execute(
+                f"""SELECT substr(e.inicio, 1, {tamanho}) AS periodo,
+                           COUNT(*),
+                           SUM(e.sucessos),
+                           SUM(e.erros),
+                           SUM(e.sucessos + e.erros) / NULLIF(SUM(e.tempo_execucao_segundos) / 60.0, 0),
+                           100.0 * SUM(e.erros) / NULLIF(SUM(e.sucessos + e.erros), 0)
+                    FROM execucoes e{where}
+                    GROUP BY periodo
+                    ORDER BY periodo DESC""",
+                parametros
+            ).fetchall()
+        return linhas
+    
+    def tipos_erro(self):
+        with closing(self.conectar()) as conexao:
+            return [l[0] for l in conexao.execute(
+                "SELECT DISTINCT tipo_erro FROM resultados WHERE tipo_erro IS NOT NULL ORDER BY tipo_erro"
+            )]
+
+class ExportadorMetricas:
+    """Endpoint local /metrics (formato texto Prometheus/OpenMetrics)
+    
+    Roda em thread própria e só lê os contadores do automatizador.
+    """
+    
+    PREFIXO = "rpa_gestao"
+    
+    def __init__(self, automatizador, porta, host="127.0.0.1"):
+        self.automatizador = automatizador
+        exportador = self
+        
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = exportador.renderizar().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+            
+            def log_message(self, formato, *args):
+                pass
+        
+        self.servidor = ThreadingHTTPServer((host, porta), Manipulador)
+        self.thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+    
+    def iniciar(self):
+        self.thread.start()
+        host, porta = self.servidor.server_address[:2]
+        logger.info(f"📈 Métricas disponíveis em http://{host}:{porta}/metrics")
+    
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+    
+    def _metrica(self, linhas, nome, tipo, ajuda, valor):
+        nome = f"{self.PREFIXO}_{nome}"
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        linhas.append(f"{nome} {valor}")
+    
+    def renderizar(self):
+        stats = self.automatizador.stats
+        linhas = []
+        
+        self._metrica(linhas, "usuarios_processados_total", "counter",
+                      "Usuários processados (sucesso ou erro)", stats["sucessos"] + stats["erros"])
+        self._metrica(linhas, "usuarios_sucesso_total", "counter", "Usuários cadastrados com sucesso", stats["sucessos"])
+        self._metrica(linhas, "usuarios_erro_total", "counter", "Usuários com erro", stats["erros"])
+        self._metrica(linhas, "usuarios_total", "gauge", "Linhas da planilha", stats["total"])
+        self._metrica(linhas, "usuarios_por_minuto", "gauge", "Vazão na janela recente",
+                      f"{self.automatizador.usuarios_por_minuto():.3f}")
+        self._metrica(linhas, "workers_em_andamento", "gauge", "Usuários sendo processados agora", stats["em_andamento"])
+        self._metrica(linhas, "lancamentos_navegador_total", "counter", "Navegadores iniciados", stats["lancamentos_navegador"])
+        self._metrica(linhas, "logins_total", "counter", "Logins realizados no portal", stats["logins"])
+        self._metrica(linhas, "concorrencia_limite", "gauge", "Usuários simultâneos permitidos pelo controlador de carga",
+                      self.automatizador.controlador.limite)
+        self._metrica(linhas, "pausa_entre_usuarios_segundos", "gauge", "Pausa atual de cada worker entre usuários",
+                      f"{self.automatizador.controlador.pausa:.3f}")
+        self._metrica(linhas, "retentativas_total", "counter", "Etapas repetidas após erro transitório",
+                      self.automatizador.retentativas.stats["retentativas"])
+        
+        nome = f"{self.PREFIXO}_etapa_duracao_segundos"
+        linhas.append(f"# HELP {nome} Duração de cada etapa do processamento")
+        linhas.append(f"# TYPE {nome} histogram")
+        for etapa, histograma in list(self.automatizador.tempos.histogramas.items()):
+            rotulo = etapa.replace("\\", "\\\\").replace('"', '\\"')
+            for limite, contagem in zip(MedidorTempos.BALDES_MS, list(histograma["baldes"])):
+                linhas.append(f'{nome}_bucket{{etapa="{rotulo}",le="{limite / 1000:g}"}} {contagem}')
+            linhas.append(f'{nome}_bucket{{etapa="{rotulo}",le="+Inf"}} {histograma["contagem"]}')
+            linhas.append(f'{nome}_sum{{etapa="{rotulo}"}} {histograma["soma"]:.6f}')
+            linhas.append(f'{nome}_count{{etapa="{rotulo}"}} {histograma["contagem"]}')
+        
+        return "\n".join(linhas) + "\n"
+
+class ExecucaoCancelada(Exception):
+    """Cancelamento pedido pelo usuário, atendido em um ponto seguro"""
+
+class ControleExecucao:
+    """Cancelar, pausar e retomar a execução a partir de outra thread
+    
+    Os sinais são só marcados aqui; a execução os atende nos pontos seguros
+    (entre usuários e entre etapas antes do envio do formulário).
+    """
+    
+    INTERVALO_VERIFICACAO = 0.2
+    
+    def __init__(self):
+        self._cancelado = threading.Event()
+        self._liberado = threading.Event()
+        self._liberado.set()
+    
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+    
+    @property
+    def pausado(self):
+        return not self._liberado.is_set() and not self.cancelado
+    
+    def cancelar(self):
+        self._cancelado.set()
+        self._liberado.set()
+    
+    def pausar(self):
+        self._liberado.clear()
+    
+    def retomar(self):
+        self._liberado.set()
+    
+    async def ponto_seguro(self, pausavel=True):
+        """Aguarda enquanto pausado e levanta ExecucaoCancelada se cancelado"""
+        if pausavel and not self._liberado.is_set():
+            logger.info("⏸️ Execução pausada")
+            while not self._liberado.is_set():
+                await asyncio.sleep(self.INTERVALO_VERIFICACAO)
+            if not self.cancelado:
+                logger.info("▶️ Execução retomada")
+        
+        if self.cancelado:
+            raise ExecucaoCancelada("Execução cancelada pelo usuário")
+    
+    async def dormir(self, segundos):
+        """Pausa que termina antes se a execução for cancelada"""
+        limite = time.monotonic() + segundos
+        while not self.cancelado:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return
+            await asyncio.sleep(min(restante, self.INTERVALO_VERIFICACAO))
+
+class CanalProgresso:
+    """Último retrato do progresso: o automatizador publica, a interface lê
+    
+    Guarda só o valor mais recente, então nenhum lado espera pelo outro.
+    """
+    
     def __init__(self):
+        self._trava = threading.Lock()
+        self._retrato = None
+    
+    def publicar(self, retrato):
+        with self._trava:
+            self._retrato = retrato
+    
+    def ler(self):
+        with self._trava:
+            return self._retrato
+
+class LacoAssincrono:
+    """Event loop em thread própria que sobrevive entre execuções da interface
+    
+    Objetos do Playwright ficam presos ao loop que os criou; manter o loop
+    vivo permite reaproveitar o navegador e as sessões do pool.
+    """
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+    
+    def executar(self, coro):
+        """Executa a corotina no loop e bloqueia a thread chamadora até o fim"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+    
+    def parar(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+class CacheSessao:
+    """Estados de sessão (storage_state) cifrados em disco, por APP_USERNAME
+    
+    A chave Fernet é derivada de APP_PASSWORD; com outra senha o arquivo
+    não abre e é descartado. Cada contexto recebe um estado diferente,
+    pois o portal guarda o andamento do formulário na sessão.
+    """
+    
+    ITERACOES_KDF = 200_000
+    
+    def __init__(self, usuario, senha, diretorio="."):
+        identificador = hashlib.sha256(f"{CONFIG['url']}|{usuario}".encode("utf-8")).digest()
+        self.caminho = os.path.join(diretorio, f"sessao_{identificador.hex()[:16]}.bin")
+        
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=identificador[:16], iterations=self.ITERACOES_KDF)
+        self.fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(senha.encode("utf-8"))))
+        
+        self.disponiveis = self._carregar()
+        self.ativos = {}
+        self.stats = {"carregados": len(self.disponiveis), "restaurados": 0, "obsoletos": 0, "salvos": 0}
+    
+    @classmethod
+    def criar(cls, diretorio="."):
+        """Cache para as credenciais atuais, ou None se indisponível"""
+        if not CONFIG["cache_sessao"]["habilitado"]:
+            return None
+        if Fernet is None:
+            logger.info("ℹ️ Cache de sessão desativado: instale o pacote 'cryptography' para ativá-lo")
+            return None
+        
+        senha = os.getenv('APP_PASSWORD')
+        if not senha:
+            return None
+        return cls(os.getenv('APP_USERNAME', 'rpa.gestaoac'), senha, diretorio)
+    
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return []
+        try:
+            with open(self.caminho, 'rb') as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except (InvalidToken, ValueError) as e:
+            logger.warning(f"⚠️ Cache de sessão ilegível (senha alterada?), descartado: {type(e).__name__}")
+            os.remove(self.caminho)
+            return []
+    
+    def retirar(self):
+        """Estado salvo ainda não usado nesta execução (ou None)"""
+        return self.disponiveis.pop() if self.disponiveis else None
+    
+    def registrar(self, context, estado):
+        """Guarda o estado de um contexto autenticado e regrava o arquivo"""
+        self.ativos[context] = estado
+        self.salvar()
+    
+    def soltar(self, context):
+        self.ativos.pop(context, None)
+    
+    def salvar(self):
+        estados = (list(self.ativos.values()) + self.disponiveis)[:CONFIG["cache_sessao"]["max_estados"]]
+        dados = self.fernet.encrypt(json.dumps(estados).encode("utf-8"))
+        
+        temporario = self.caminho + ".tmp"
+        with open(temporario, 'wb') as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        self.stats["salvos"] += 1
+
+class SessaoAquecida:
+    """Contexto autenticado mantido pelo pool"""
+    
+    def __init__(self, context, page, frame_menu, dono):
+        self.context = context
+        self.page = page
+        self.frame_menu = frame_menu
+        self.dono = dono  # Automatizador cujos observadores estão instalados no contexto
+        self.criada_em = time.monotonic()
+
+class PoolSessoes:
+    """Mantém contextos do Chromium já logados, prontos para os workers
+    
+    As sessões livres passam por verificação de saúde periódica e são
+    renovadas antes de o portal expirá-las. O navegador e as sessões
+    continuam abertos entre execuções enquanto o loop estiver vivo.
+    """
+    
+    def __init__(self):
+        self.playwright = None
+        self.browser = None
+        self.headless = None
+        self.credenciais = None
+        self.automatizador = None
+        self.cache_sessao = None
+        self.tamanho = 1
+        self.livres = deque()
+        self.emprestadas = {}
+        self.trava = asyncio.Lock()  # Empréstimo e manutenção não disputam as sessões livres
+        self.manutencao = None
+        self.stats = {
+            "sessoes_criadas": 0,
+            "emprestimos": 0,
+            "prontas": 0,
+            "frias": 0,
+            "rotacionadas": 0,
+            "descartadas": 0
+        }
+    
+    async def preparar(self, automatizador, workers, headless):
+        """Garante o navegador (no modo pedido) e K sessões logadas para a execução"""
+        self.automatizador = automatizador
+        self.tamanho = CONFIG["pool"]["tamanho"] or workers
+        
+        # Troca de modo do navegador ou de credenciais invalida o que está aberto
+        credenciais = (CONFIG["url"], os.getenv('APP_USERNAME'), os.getenv('APP_PASSWORD'))
+        if self.browser and (
+            not self.browser.is_connected()
+            or self.headless != headless
+            or self.credenciais != credenciais
+        ):
+            logger.info("🔥 Pool: configuração alterada, reiniciando o navegador")
+            await self.encerrar()
+        
+        if self.browser is None:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+            self.browser = await automatizador.abrir_navegador(self.playwright, headless)
+            self.headless = headless
+            self.credenciais = credenciais
+            self.cache_sessao = CacheSessao.criar(CONFIG["saida"]["diretorio"])
+        
+        # O cache acompanha o pool: os estados das sessões vivas não podem ir para outro contexto
+        automatizador.cache_sessao = self.cache_sessao
+        
+        prontas = len(self.livres)
+        await self.completar()
+        logger.info(f"🔥 Pool: {len(self.livres)} sessões logadas ({prontas} já aquecidas)")
+        
+        if self.manutencao is None or self.manutencao.done():
+            self.manutencao = asyncio.ensure_future(self.manter())
+    
+    async def criar_sessao(self):
+        context, page = await self.automatizador.abrir_sessao(self.browser)
+        try:
+            frame_menu = await self.automatizador.entrar(page)
+        except Exception:
+            await self.automatizador.fechar_sessao(context)
+            raise
+        self.stats["sessoes_criadas"] += 1
+        return SessaoAquecida(context, page, frame_menu, self.automatizador)
+    
+    async def completar(self):
+        """Cria em paralelo as sessões que faltam para chegar ao tamanho do pool"""
+        faltam = self.tamanho - len(self.livres) - len(self.emprestadas)
+        if faltam <= 0:
+            return
+        
+        resultados = await asyncio.gather(*[self.criar_sessao() for _ in range(faltam)], return_exceptions=True)
+        for resultado in resultados:
+            if isinstance(resultado, SessaoAquecida):
+                self.livres.append(resultado)
+            else:
+                logger.warning(f"⚠️ Pool: falha ao aquecer sessão: {resultado}")
+    
+    def vencida(self, sessao):
+        return time.monotonic() - sessao.criada_em > CONFIG["pool"]["rotacao_segundos"]
+    
+    async def saudavel(self, sessao):
+        """Verificação local e barata: página aberta e menu com o link de acesso"""
+        if self.vencida(sessao):
+            self.stats["rotacionadas"] += 1
+            return False
+        try:
+            if sessao.page.is_closed() or sessao.frame_menu.is_detached():
+                return False
+            return await sessao.frame_menu.locator(CONFIG["selectors"]["access_link"]).count() > 0
+        except Exception:
+            return False
+    
+    async def emprestar(self, automatizador):
+        """Entrega uma sessão logada, aquecida se houver, ou cria uma na hora"""
+        self.automatizador = automatizador
+        self.stats["emprestimos"] += 1
+        
+        sessao = None
+        async with self.trava:
+            while self.livres:
+                candidata = self.livres.popleft()
+                if await self.saudavel(candidata):
+                    sessao = candidata
+                    self.stats["prontas"] += 1
+                    break
+                await self.descartar(candidata)
+        
+        if sessao is None:
+            self.stats["frias"] += 1
+            sessao = await self.criar_sessao()
+        
+        self.emprestadas[sessao.context] = sessao
+        return sessao
+    
+    async def devolver(self, context, frame_menu):
+        """Recebe a sessão de volta ao fim do worker"""
+        sessao = self.emprestadas.pop(context, None)
+        if sessao is None:
+            return
+        
+        sessao.frame_menu = frame_menu or sessao.frame_menu
+        if len(self.livres) >= self.tamanho or self.vencida(sessao):
+            await self.descartar(sessao)
+        else:
+            self.livres.append(sessao)
+    
+    def esquecer(self, context):
+        """Sessão fechada pelo worker após falha"""
+        if self.emprestadas.pop(context, None):
+            self.stats["descartadas"] += 1
+    
+    async def descartar(self, sessao):
+        self.stats["descartadas"] += 1
+        if self.cache_sessao:
+            self.cache_sessao.soltar(sessao.context)
+        await sessao.dono.fechar_sessao(sessao.context)
+    
+    async def manter(self):
+        """Verifica as sessões livres e renova as vencidas ou expiradas
+        
+        Cada sessão é verificada sem sair da fila de livres e sob a mesma
+        trava do empréstimo: um worker que chega durante a verificação
+        espera por ela em vez de abrir uma sessão fria.
+        """
+        while True:
+            await asyncio.sleep(CONFIG["pool"]["verificacao_segundos"])
+            try:
+                for sessao in list(self.livres):
+                    async with self.trava:
+                        if sessao not in self.livres:
+                            continue  # Emprestada desde o início da verificação
+                        if await self.saudavel(sessao) and await sessao.dono.sessao_ativa_no_portal(sessao.context):
+                            continue
+                        self.livres.remove(sessao)
+                    
+                    logger.info("🔥 Pool: renovando sessão vencida ou expirada")
+                    await self.descartar(sessao)
+                
+                await self.completar()
+            except Exception as e:
+                logger.warning(f"⚠️ Pool: erro na manutenção das sessões: {e}")
+    
+    async def encerrar(self):
+        """Fecha sessões, navegador e Playwright"""
+        if self.manutencao:
+            self.manutencao.cancel()
+            self.manutencao = None
+        
+        while self.livres:
+            await self.descartar(self.livres.popleft())
+        self.emprestadas.clear()
+        
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar navegador do pool: {e}")
+            self.browser = None
+        self.cache_sessao = None
+        
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+# Tipo de cliente -> subgrupo no portal
+TIPOS_CLIENTE = {
+    "Cliente ADM": "32",
+    "Rastreio/TMK": "113",
+    "Rastreio/Consulta": "133"
+}
+
+@dataclass(frozen=True)
+class PlanoFormulario:
+    """Seletores, valores e ordem dos campos do cadastro, imutável
+    
+    Montado uma vez por tipo de cliente e campo contrato e compartilhado
+    por todos os workers. Guarda seletores e não locators, pois estes
+    ficam presos ao frame de cada página.
+    """
+    
+    subgrupo: str
+    posicao_empresa: int
+    frequencia: str
+    obs: str
+    link_acesso: str
+    seletor_frequencia: str
+    seletor_enviar: str
+    seletor_subgrupo: str
+    seletor_obs: str
+    seletor_lupa: str
+    seletor_empresa: str
+    campos_opcionais: tuple  # (chave da planilha, seletor)
+    campos_obrigatorios: tuple  # (chave da planilha, seletor)
+    selects: tuple  # (seletor, valor)
+
+@functools.lru_cache(maxsize=None)
+def compilar_plano(subgrupo, posicao_empresa):
+    """Plano do formulário para o subgrupo e a posição do contrato (em cache)"""
+    seletores = CONFIG["selectors"]
+    valores = CONFIG["values"]
+    
+    return PlanoFormulario(
+        subgrupo=subgrupo,
+        posicao_empresa=posicao_empresa,
+        frequencia=valores["frequency_id"],
+        obs=valores["obs_text"],
+        link_acesso=seletores["access_link"],
+        seletor_frequencia=seletores["frequency_select"],
+        seletor_enviar=seletores["submit_button"],
+        seletor_subgrupo=seletores["subgroup_select"],
+        seletor_obs=seletores["obs"],
+        seletor_lupa=seletores["lupa_button"],
+        seletor_empresa=seletores["empresa_input"],
+        campos_opcionais=(
+            ('loginGestor', seletores["login_gestor"]),
+            ('emailGestor', seletores["email_gestor"]),
+            ('loginGestor2', seletores["login_gestor2"]),
+            ('emailGestor2', seletores["email_gestor2"])
+        ),
+        campos_obrigatorios=(
+            ('nome', seletores["nome"]),
+            ('usuario', seletores["usuario"]),
+            ('email', seletores["email"]),
+            ('filtro_cliente', seletores["filtro_cliente"])
+        ),
+        selects=(
+            (seletores["tipo_pes_select"], valores["tipo_pes_id"]),
+            (seletores["cargo_select"], valores["cargo_id"]),
+            (seletores["setor_select"], valores["setor_id"])
+        )
+    )
+
+def plano_formulario(tipo_cliente, campo_contrato):
+    """Plano do formulário para o tipo de cliente e o campo contrato escolhidos"""
+    return compilar_plano(TIPOS_CLIENTE.get(tipo_cliente, "32"), int(campo_contrato) - 1)
+
+# Preenche todos os campos em uma ida ao navegador e devolve a conferência por campo
+SCRIPT_PREENCHIMENTO_LOTE = """
+(campos) => campos.map(([seletor, valor]) => {
+    const el = document.querySelector(seletor);
+    if (!el) {
+        return { seletor, ok: false, motivo: "ausente" };
+    }
+    if (el.tagName === "SELECT" && !Array.from(el.options).some(o => o.value === valor)) {
+        return { seletor, ok: false, motivo: "opção inexistente" };
+    }
+    el.value = valor;
+    el.dispatchEvent(new Event("input", { bubbles: true }));
+    el.dispatchEvent(new Event("change", { bubbles: true }));
+    return { seletor, ok: el.value === valor, motivo: el.value === valor ? null : "valor não aplicado" };
+})
+"""
+
+class AutomatizadorGestao:
+    def __init__(self, plano=None, pool=None, canal=None, controle=None):
+        self.pool = pool
+        self.canal = canal
+        self.controle = controle or ControleExecucao()
+        self.plano = plano or compilar_plano(CONFIG["values"]["subgroup_id"], CONFIG["values"]["empresa_input_position"])
         self.stats = {
             "total": 0,
             "sucessos": 0,
             "erros": 0,
-            "usuarios_erro": [],
             "inicio_execucao": None,
-            "fim_execucao": None
+            "fim_execucao": None,
+            "workers": 1,
+            "em_andamento": 0,
+            "lancamentos_navegador": 0,
+            "logins": 0,
+            "modo_navegador": None,
+            "ja_concluidos": 0,
+            "ja_cadastrados": 0,
+            "rejeitados": 0,
+            "cancelado": False,
+            "tipo_cliente": next((nome for nome, subgrupo in TIPOS_CLIENTE.items() if subgrupo == self.plano.subgrupo), None)
+        }
+        self.tempos = MedidorTempos()
+        self.esperas = MotorEsperas(self.tempos)
+        self.retentativas = PoliticaRetentativa()
+        self.novas_tentativas = {}
+        self.resultados = None
+        self.registros_frames = {}
+        self.motor_http = MotorHTTPDireto()
+        self.controlador = ControladorCarga()
+        self.motor_http.observador = lambda latencia, erro: self.controlador.observar(latencia, erro)
+        self.filtro_recursos = FiltroRecursos()
+        self.diario = None
+        self.indice = None
+        self.conclusoes = deque(maxlen=10000)
+        self.cache_sessao = None
+        self.contextos_restaurados = set()
+        self.preenchimento = {
+            "usuarios_em_lote": 0,
+            "campos_em_lote": 0,
+            "campos_corrigidos": 0,
+            "fallbacks": 0,
+            "idas_ao_navegador": 0,
+            "idas_evitadas": 0
         }
+        self.latencias_frames = {}
 
     async def encontrar_frame(self, page, url_pattern, max_tentativas=15, timeout=1.0):
         """Helper robusto para encontrar frames"""
         logger.debug(f"Procurando frame com padrão: {url_pattern}")
+        inicio = time.monotonic()
         
+        registro = self.registros_frames.get(page)
+        with self.tempos.medir(f"encontrar_frame:{url_pattern}"):
+            if registro:
+                frame = await self.aguardar_frame_registrado(registro, url_pattern, max_tentativas * timeout)
+            else:
+                frame = await self.procurar_frame_por_varredura(page, url_pattern, max_tentativas, timeout)
+        
+        latencia_ms = (time.monotonic() - inicio) * 1000
+        self.registrar_latencia_frame(url_pattern, latencia_ms)
+        logger.debug(f"Frame '{url_pattern}' resolvido em {latencia_ms:.0f} ms")
+        return frame
+
+    async def aguardar_frame_registrado(self, registro, url_pattern, timeout):
+        """Aguarda o frame pelo registro orientado a eventos"""
+        try:
+            return await registro.aguardar(url_pattern, timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Frame com padrão '{url_pattern}' não encontrado após {timeout:.1f} segundos")
+
+    def registrar_latencia_frame(self, url_pattern, latencia_ms):
+        """Acumula a latência de cada busca de frame por padrão"""
+        dados = self.latencias_frames.setdefault(url_pattern, {"buscas": 0, "total_ms": 0.0, "max_ms": 0.0})
+        dados["buscas"] += 1
+        dados["total_ms"] += latencia_ms
+        dados["max_ms"] = max(dados["max_ms"], latencia_ms)
+
+    async def procurar_frame_por_varredura(self, page, url_pattern, max_tentativas, timeout):
+        """Varre page.frames periodicamente (páginas sem registro de frames)"""
         for tentativa in range(max_tentativas):
             try:
                 frames = page.frames
@@ -141,10 +2179,13 @@ class AutomatizadorGestao:
 
     async def aguardar_elemento(self, frame_ou_page, seletor, timeout=15000):
         """Aguarda elemento aparecer na página de forma robusta"""
+        inicio = time.monotonic()
         try:
             await frame_ou_page.wait_for_selector(seletor, timeout=timeout, state='visible')
+            self.tempos.registrar("aguardar_elemento", inicio, time.monotonic() - inicio)
             return True
         except Exception as e:
+            self.tempos.registrar("aguardar_elemento", inicio, time.monotonic() - inicio, "timeout")
             logger.warning(f"Timeout aguardando elemento {seletor}: {e}")
             return False
 
@@ -172,16 +2213,104 @@ class AutomatizadorGestao:
             # Preencher e submeter login
             await frame.fill(CONFIG["selectors"]["username_field"], username)
             await frame.fill(CONFIG["selectors"]["password_field"], password)
-            await frame.click(CONFIG["selectors"]["login_button"])
             
-            # Aguardar login ser processado
-            await page.wait_for_timeout(CONFIG["timeouts"]["page_load"])
+            # Aguardar login ser processado (menu com o link de acesso)
+            await self.esperas.aguardar(
+                "login",
+                lambda: frame.click(CONFIG["selectors"]["login_button"]),
+                lambda: frame.wait_for_selector(CONFIG["selectors"]["access_link"], state='attached'),
+                CONFIG["timeouts"]["page_load"] / 1000
+            )
+            
+            self.stats["logins"] += 1
+            logger.info("✅ Login realizado com sucesso")
+            await self.salvar_estado_sessao(page.context)
+            return frame
+            
+        except Exception as e:
+            logger.error(f"❌ Erro no login: {e}")
+            raise
+
+    async def sessao_ativa_no_portal(self, context):
+        """Consulta o menu.do com os cookies do contexto (também mantém a sessão ativa)"""
+        try:
+            resposta = await context.request.get(
+                f"{CONFIG['url'].rstrip('/')}/{CONFIG['selectors']['login_frame_pattern']}",
+                timeout=CONFIG["timeouts"]["navigation"]
+            )
+            corpo = (await resposta.body()).decode("latin-1", errors="replace")
+            return resposta.ok and CONFIG["selectors"]["username_field"].lstrip("#") not in corpo
+        except Exception:
+            return False
+
+    async def entrar(self, page):
+        """Abre o menu reaproveitando a sessão salva em cache; senão faz o login"""
+        context = page.context
+        if context in self.contextos_restaurados:
+            self.contextos_restaurados.discard(context)
+            
+            if await self.sessao_ativa_no_portal(context):
+                try:
+                    await page.goto(CONFIG["url"], wait_until='domcontentloaded', timeout=CONFIG["timeouts"]["navigation"])
+                    frame = await self.encontrar_frame(page, CONFIG["selectors"]["login_frame_pattern"])
+                    if await self.aguardar_elemento(frame, CONFIG["selectors"]["access_link"]):
+                        logger.info("🍪 Sessão restaurada do cache, login dispensado")
+                        self.cache_sessao.stats["restaurados"] += 1
+                        self.cache_sessao.registrar(context, await context.storage_state())
+                        return frame
+                except Exception as e:
+                    logger.debug(f"Falha ao abrir o menu com a sessão em cache: {e}")
+            
+            logger.info("🍪 Sessão em cache expirada, realizando login")
+            self.cache_sessao.stats["obsoletos"] += 1
+            await context.clear_cookies()
+        
+        return await self.fazer_login(page)
+
+    async def salvar_estado_sessao(self, context):
+        """Atualiza o cache com os cookies do contexto recém-autenticado"""
+        if not self.cache_sessao:
+            return
+        try:
+            self.cache_sessao.registrar(context, await context.storage_state())
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível salvar a sessão em cache: {e}")
+
+    async def sessao_expirada(self, frame):
+        """Verifica se o frame do menu voltou para a tela de login"""
+        try:
+            return await frame.locator(CONFIG["selectors"]["username_field"]).count() > 0
+        except Exception as e:
+            logger.debug(f"Não foi possível verificar a sessão: {e}")
+            return False
+
+    async def voltar_ao_menu(self, page):
+        """Retorna ao frame do menu.do reaproveitando a sessão já autenticada"""
+        try:
+            logger.debug("↩️ Retornando ao menu...")
+            
+            # Se o menu ainda está carregado com o link de acesso, reutilizar direto
+            for f in page.frames:
+                if CONFIG["selectors"]["login_frame_pattern"] in f.url:
+                    if await f.locator(CONFIG["selectors"]["access_link"]).count() > 0:
+                        return f
+                    break
+            
+            # Recarregar o frameset mantendo os cookies da sessão
+            await page.goto(CONFIG["url"], wait_until='domcontentloaded', timeout=CONFIG["timeouts"]["navigation"])
+            frame = await self.encontrar_frame(page, CONFIG["selectors"]["login_frame_pattern"])
+            
+            if await self.sessao_expirada(frame):
+                logger.info("🔄 Sessão expirada, realizando novo login...")
+                return await self.fazer_login(page)
+            
+            if not await self.aguardar_elemento(frame, CONFIG["selectors"]["access_link"]):
+                raise Exception("Link de incluir acesso não encontrado no menu")
             
-            logger.info("✅ Login realizado com sucesso")
             return frame
             
         except Exception as e:
-            logger.error(f"❌ Erro no login: {e}")
+            logger.error(f"❌ Erro ao retornar ao menu: {e}")
             raise
 
     async def navegar_para_incluir_acesso(self, page, frame):
@@ -189,18 +2318,32 @@ class AutomatizadorGestao:
         try:
             logger.debug("🧭 Navegando para incluir acesso...")
             
-            # Clicar no link de acesso
-            await frame.click(CONFIG["selectors"]["access_link"])
-            await page.wait_for_timeout(CONFIG["timeouts"]["page_load"])
+            # Clicar no link de acesso e aguardar o frame navegar
+            await self.esperas.aguardar(
+                "navegacao_acesso",
+                lambda: frame.click(self.plano.link_acesso),
+                lambda: page.wait_for_event(
+                    "framenavigated",
+                    predicate=lambda f: "usuarios_incluiAcesso.do" in f.url
+                ),
+                CONFIG["timeouts"]["page_load"] / 1000
+            )
             
             # Encontrar novo frame
             target_frame = await self.encontrar_frame(page, "usuarios_incluiAcesso.do")
             
             # Aguardar e configurar frequência
-            if await self.aguardar_elemento(target_frame, CONFIG["selectors"]["frequency_select"]):
-                await target_frame.select_option(CONFIG["selectors"]["frequency_select"], CONFIG["values"]["frequency_id"])
-                await target_frame.click(CONFIG["selectors"]["submit_button"])
-                await asyncio.sleep(CONFIG["timeouts"]["retry_delay"])
+            if await self.aguardar_elemento(target_frame, self.plano.seletor_frequencia):
+                await target_frame.select_option(self.plano.seletor_frequencia, self.plano.frequencia)
+                await self.esperas.aguardar(
+                    "envio_frequencia",
+                    lambda: target_frame.click(self.plano.seletor_enviar),
+                    lambda: page.wait_for_event(
+                        "framenavigated",
+                        predicate=lambda f: "usuarios_incluiGrupo.do" in f.url
+                    ),
+                    CONFIG["timeouts"]["retry_delay"]
+                )
             else:
                 raise Exception("Campo de frequência não encontrado")
             
@@ -220,8 +2363,8 @@ class AutomatizadorGestao:
             target_frame = await self.encontrar_frame(page, "usuarios_incluiGrupo.do")
             
             # Aguardar e configurar subgrupo
-            if await self.aguardar_elemento(target_frame, CONFIG["selectors"]["subgroup_select"]):
-                await target_frame.select_option(CONFIG["selectors"]["subgroup_select"], CONFIG["values"]["subgroup_id"])
+            if await self.aguardar_elemento(target_frame, self.plano.seletor_subgrupo):
+                await target_frame.select_option(self.plano.seletor_subgrupo, self.plano.subgrupo)
             else:
                 raise Exception("Campo de subgrupo não encontrado")
             
@@ -232,44 +2375,96 @@ class AutomatizadorGestao:
             logger.error(f"❌ Erro na configuração do grupo: {e}")
             raise
 
-    async def preencher_dados_usuario(self, frame, dados):
-        """Preenche os dados do usuário no formulário"""
+    def campos_do_usuario(self, dados):
+        """(seletor, valor) dos campos de texto, na ordem do plano, incluindo observações"""
+        campos = []
+        
+        # Campos opcionais de gestores
+        for campo, seletor in self.plano.campos_opcionais:
+            if campo in dados and pd.notna(dados[campo]) and str(dados[campo]).strip():
+                campos.append((seletor, str(dados[campo]).strip()))
+        
+        # Campos obrigatórios
+        for campo, seletor in self.plano.campos_obrigatorios:
+            if campo not in dados or pd.isna(dados[campo]):
+                raise Exception(f"Campo obrigatório '{campo}' não encontrado ou vazio")
+            
+            valor = str(dados[campo]).strip()
+            if not valor:
+                raise Exception(f"Campo obrigatório '{campo}' está vazio")
+            
+            campos.append((seletor, valor))
+        
+        # Observações
+        campos.append((self.plano.seletor_obs, self.plano.obs))
+        return campos
+
+    async def preencher_em_lote(self, frame, dados):
+        """Preenche campos e selects em uma única chamada ao navegador
+        
+        Campos que o script não conseguiu conferir são refeitos pelo caminho
+        campo a campo; se a chamada falhar, o formulário inteiro é refeito.
+        """
         try:
             usuario = dados.get('usuario', 'N/A')
-            logger.debug(f"📝 Preenchendo dados do usuário: {usuario}")
+            logger.debug(f"📝 Preenchendo dados do usuário em lote: {usuario}")
             
-            # Campos opcionais de gestores
-            campos_opcionais = {
-                'loginGestor': CONFIG["selectors"]["login_gestor"],
-                'emailGestor': CONFIG["selectors"]["email_gestor"],
-                'loginGestor2': CONFIG["selectors"]["login_gestor2"],
-                'emailGestor2': CONFIG["selectors"]["email_gestor2"]
-            }
+            campos = self.campos_do_usuario(dados)
+            selects = list(self.plano.selects)
             
-            for campo, seletor in campos_opcionais.items():
-                if campo in dados and pd.notna(dados[campo]) and str(dados[campo]).strip():
-                    await frame.fill(seletor, str(dados[campo]).strip())
+            # Caminho campo a campo: um fill por campo, espera + seleção por select
+            idas_campo_a_campo = len(campos) + 2 * len(selects)
             
-            # Campos obrigatórios
-            campos_obrigatorios = {
-                'nome': CONFIG["selectors"]["nome"],
-                'usuario': CONFIG["selectors"]["usuario"], 
-                'email': CONFIG["selectors"]["email"],
-                'filtro_cliente': CONFIG["selectors"]["filtro_cliente"]
-            }
+            try:
+                resultados = await frame.evaluate(SCRIPT_PREENCHIMENTO_LOTE, [list(c) for c in campos + selects])
+            except Exception as e:
+                logger.warning(f"⚠️ Preenchimento em lote falhou ({e}), usando campo a campo")
+                self.preenchimento["fallbacks"] += 1
+                self.preenchimento["idas_ao_navegador"] += 1 + idas_campo_a_campo
+                await self.preencher_dados_usuario(frame, dados)
+                await self.configurar_selects(frame)
+                return
             
-            for campo, seletor in campos_obrigatorios.items():
-                if campo not in dados or pd.isna(dados[campo]):
-                    raise Exception(f"Campo obrigatório '{campo}' não encontrado ou vazio")
+            idas = 1
+            seletores_select = {seletor for seletor, _ in selects}
+            valores = dict(campos + selects)
+            for resultado in resultados:
+                if resultado["ok"]:
+                    continue
                 
-                valor = str(dados[campo]).strip()
-                if not valor:
-                    raise Exception(f"Campo obrigatório '{campo}' está vazio")
+                seletor = resultado["seletor"]
+                logger.debug(f"Campo {seletor} não conferido no lote ({resultado['motivo']}), refazendo")
+                self.preenchimento["campos_corrigidos"] += 1
                 
-                await frame.fill(seletor, valor)
+                if seletor in seletores_select:
+                    idas += 2
+                    if await self.aguardar_elemento(frame, seletor, timeout=5000):
+                        await frame.select_option(seletor, valores[seletor])
+                    else:
+                        logger.warning(f"Select {seletor} não encontrado")
+                else:
+                    idas += 1
+                    await frame.fill(seletor, valores[seletor])
+            
+            self.preenchimento["usuarios_em_lote"] += 1
+            self.preenchimento["campos_em_lote"] += len(resultados)
+            self.preenchimento["idas_ao_navegador"] += idas
+            self.preenchimento["idas_evitadas"] += max(0, idas_campo_a_campo - idas)
+            
+            logger.debug("✅ Dados do usuário preenchidos")
+            
+        except Exception as e:
+            logger.error(f"❌ Erro no preenchimento: {e}")
+            raise
+
+    async def preencher_dados_usuario(self, frame, dados):
+        """Preenche os dados do usuário no formulário"""
+        try:
+            usuario = dados.get('usuario', 'N/A')
+            logger.debug(f"📝 Preenchendo dados do usuário: {usuario}")
             
-            # Observações
-            await frame.fill(CONFIG["selectors"]["obs"], CONFIG["values"]["obs_text"])
+            for seletor, valor in self.campos_do_usuario(dados):
+                await frame.fill(seletor, valor)
             
             logger.debug("✅ Dados do usuário preenchidos")
             
@@ -282,13 +2477,7 @@ class AutomatizadorGestao:
         try:
             logger.debug("⚙️ Configurando campos select...")
             
-            selects_config = [
-                (CONFIG["selectors"]["tipo_pes_select"], CONFIG["values"]["tipo_pes_id"]),
-                (CONFIG["selectors"]["cargo_select"], CONFIG["values"]["cargo_id"]),
-                (CONFIG["selectors"]["setor_select"], CONFIG["values"]["setor_id"])
-            ]
-            
-            for seletor, valor in selects_config:
+            for seletor, valor in self.plano.selects:
                 if await self.aguardar_elemento(frame, seletor, timeout=5000):
                     await frame.select_option(seletor, valor)
                 else:
@@ -300,31 +2489,41 @@ class AutomatizadorGestao:
             logger.error(f"❌ Erro na configuração dos selects: {e}")
             raise
 
-    async def finalizar_cadastro(self, frame):
+    async def finalizar_cadastro(self, page, frame):
         """Finaliza o processo de cadastro"""
         try:
             logger.debug("🏁 Finalizando cadastro...")
             
             # Clicar na lupa
-            if await self.aguardar_elemento(frame, CONFIG["selectors"]["lupa_button"]):
-                await frame.click(CONFIG["selectors"]["lupa_button"])
-                await asyncio.sleep(1)
+            if await self.aguardar_elemento(frame, self.plano.seletor_lupa):
+                await self.esperas.aguardar(
+                    "lupa",
+                    lambda: frame.click(self.plano.seletor_lupa),
+                    lambda: frame.wait_for_selector(self.plano.seletor_empresa, state='attached'),
+                    1
+                )
             else:
                 raise Exception("Botão lupa não encontrado")
             
-            # Aguardar e selecionar empresa
-            if await self.aguardar_elemento(frame, CONFIG["selectors"]["empresa_input"]):
-                inputs = frame.locator(CONFIG["selectors"]["empresa_input"])
+            # Aguardar e selecionar empresa (check e não click: a etapa pode ser repetida)
+            if await self.aguardar_elemento(frame, self.plano.seletor_empresa):
+                inputs = frame.locator(self.plano.seletor_empresa)
                 count = await inputs.count()
                 
-                posicao = CONFIG["values"]["empresa_input_position"]
+                posicao = self.plano.posicao_empresa
                 if posicao < count:
-                    await inputs.nth(posicao).click()
+                    await inputs.nth(posicao).check()
                 else:
                     logger.warning(f"Posição {posicao} não existe, usando posição 0")
-                    await inputs.nth(0).click()
+                    await inputs.nth(0).check()
             
-            await asyncio.sleep(1)
+            # Aguardar a função de seleção da página estar disponível
+            await self.esperas.aguardar(
+                "selecao_empresa",
+                None,
+                lambda: frame.wait_for_function("typeof checkAll === 'function'"),
+                1
+            )
             
             # Executar checkAll
             try:
@@ -333,153 +2532,964 @@ class AutomatizadorGestao:
                 logger.warning(f"Erro ao executar checkAll: {e}")
             
             # Submeter formulário
-            if await self.aguardar_elemento(frame, CONFIG["selectors"]["submit_button"]):
-                await frame.click(CONFIG["selectors"]["submit_button"])
-                await asyncio.sleep(2)  # Aguardar processamento
+            if await self.aguardar_elemento(frame, self.plano.seletor_enviar):
+                # Aguardar a resposta do POST do formulário
+                try:
+                    await self.esperas.aguardar(
+                        "envio_cadastro",
+                        lambda: frame.click(self.plano.seletor_enviar),
+                        lambda: page.wait_for_event(
+                            "response",
+                            predicate=lambda r: r.request.method == "POST" and ".do" in r.url
+                        ),
+                        2
+                    )
+                except Exception as e:
+                    # A partir daqui o portal pode ter gravado o usuário
+                    raise ErroAposEnvio(f"Falha ao enviar o cadastro: {e}") from e
             else:
                 raise Exception("Botão submit não encontrado")
             
-            logger.debug("✅ Cadastro finalizado")
+            logger.debug("✅ Cadastro finalizado")
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na finalização: {e}")
+            raise
+
+    async def executar_etapa(self, etapa, acao, preparar=None):
+        """Executa uma etapa idempotente, repetindo-a em erros transitórios
+        
+        preparar (opcional) recoloca a página no ponto de partida da etapa.
+        """
+        tentativa = 0
+        while True:
+            try:
+                with self.tempos.medir(etapa):
+                    resultado = await acao()
+                if tentativa:
+                    self.retentativas.stats["recuperadas"] += 1
+                return resultado
+            
+            except Exception as e:
+                # Timeouts e falhas de rede também indicam portal sobrecarregado
+                self.controlador.observar_erro_etapa(e)
+                
+                if not self.retentativas.pode_repetir(etapa, e, tentativa):
+                    raise
+                
+                tentativa += 1
+                self.contar_nova_tentativa()
+                atraso = self.retentativas.atraso(tentativa)
+                logger.warning(f"🔁 Etapa {etapa} falhou ({e}); tentativa {tentativa + 1} em {atraso:.1f} s")
+                await self.controle.dormir(atraso)  # Cancelar não espera o fim do backoff
+                await self.controle.ponto_seguro(pausavel=False)
+                
+                if preparar:
+                    await preparar()
+
+    async def verificar_cadastro(self, page, usuario):
+        """Consulta a listagem do portal para saber se o login foi gravado
+        
+        Retorna None quando não é possível verificar (listagem não configurada
+        ou indisponível); nesse caso o formulário não deve ser reenviado.
+        """
+        url_listagem = CONFIG["indice"]["url_listagem"]
+        if not url_listagem:
+            return None
+        
+        pagina = None
+        try:
+            pagina = await page.context.new_page()
+            await pagina.goto(
+                f"{CONFIG['url'].rstrip('/')}/{url_listagem.lstrip('/')}",
+                wait_until='domcontentloaded',
+                timeout=CONFIG["timeouts"]["navigation"]
+            )
+            logins = await pagina.locator(CONFIG["indice"]["seletor_login"]).all_inner_texts()
+            return IndiceUsuarios.normalizar(usuario) in {IndiceUsuarios.normalizar(l) for l in logins}
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível verificar o cadastro de {usuario}: {e}")
+            return None
+        
+        finally:
+            if pagina:
+                try:
+                    await pagina.close()
+                except Exception:
+                    pass
+
+    async def cadastrar_pelo_formulario(self, page, dados, frame_inicial):
+        """Percorre o formulário do menu até o envio, repetindo etapas com segurança"""
+        frame_menu = frame_inicial
+        gravador = GRAVADOR_ATUAL.get()
+        
+        # Só os POSTs da tentativa que concluir servem de modelo para o envio direto
+        if gravador:
+            gravador.reiniciar()
+        
+        async def reabrir_menu():
+            nonlocal frame_menu
+            if gravador:
+                gravador.reiniciar()
+            frame_menu = await self.voltar_ao_menu(page)
+        
+        # Cancelamento é atendido entre as etapas, nunca depois do envio
+        await self.controle.ponto_seguro(pausavel=False)
+        
+        # 1. Navegar para incluir acesso (repetição recomeça pelo menu)
+        await self.executar_etapa(
+            "navegar_para_incluir_acesso",
+            lambda: self.navegar_para_incluir_acesso(page, frame_menu),
+            preparar=reabrir_menu
+        )
+        
+        # 2. Configurar grupo
+        await self.controle.ponto_seguro(pausavel=False)
+        frame_grupo = await self.executar_etapa("configurar_grupo", lambda: self.configurar_grupo(page))
+        
+        await self.controle.ponto_seguro(pausavel=False)
+        
+        if CONFIG["preenchimento"]["em_lote"]:
+            # 3 e 4. Dados do usuário e selects em uma única chamada
+            await self.executar_etapa("preencher_em_lote", lambda: self.preencher_em_lote(frame_grupo, dados))
+        else:
+            # 3. Preencher dados do usuário
+            await self.executar_etapa("preencher_dados_usuario", lambda: self.preencher_dados_usuario(frame_grupo, dados))
+            
+            # 4. Configurar selects
+            await self.executar_etapa("configurar_selects", lambda: self.configurar_selects(frame_grupo))
+        
+        await self.controle.ponto_seguro(pausavel=False)
+        
+        # 5. Finalizar cadastro (repetível apenas até o clique em enviar)
+        await self.executar_etapa("finalizar_cadastro", lambda: self.finalizar_cadastro(page, frame_grupo))
+
+    async def processar_usuario(self, page, dados, frame_inicial):
+        """Processa um único usuário completo"""
+        usuario = dados.get('usuario', 'USUÁRIO_DESCONHECIDO')
+        USUARIO_ATUAL.set(usuario)
+        
+        try:
+            logger.info(f"🚀 Processando usuário: {usuario}")
+            
+            reenvios = 0
+            frame_menu = frame_inicial
+            with self.tempos.medir("usuario_total"):
+                while True:
+                    try:
+                        await self.cadastrar_pelo_formulario(page, dados, frame_menu)
+                        break
+                    
+                    except ErroAposEnvio as e:
+                        # Nunca reenviar sem antes confirmar que o cadastro não foi gravado
+                        cadastrado = await self.verificar_cadastro(page, usuario)
+                        if cadastrado:
+                            logger.info(f"🔎 Envio de {usuario} falhou, mas o login consta na listagem do portal")
+                            self.retentativas.stats["confirmados_na_listagem"] += 1
+                            break
+                        
+                        if cadastrado is None or not self.retentativas.pode_reenviar(reenvios):
+                            raise
+                        
+                        reenvios += 1
+                        self.contar_nova_tentativa()
+                        atraso = self.retentativas.atraso(reenvios)
+                        logger.warning(f"🔁 {usuario} não consta na listagem; reenviando o formulário em {atraso:.1f} s")
+                        await self.controle.dormir(atraso)
+                        await self.controle.ponto_seguro(pausavel=False)
+                        frame_menu = await self.voltar_ao_menu(page)
+            
+            await self.registrar_sucesso_usuario(usuario)
+            return True
+        
+        except ExecucaoCancelada:
+            logger.info(f"⏹️ Cadastro de {usuario} interrompido antes do envio")
+            raise
+            
+        except Exception as e:
+            self.registrar_erro_usuario(usuario, e)
+            return False
+
+    async def processar_usuario_http(self, context, dados):
+        """Processa um usuário pelo envio direto dos formulários gravados
+        
+        Retorna None quando o usuário deve seguir pelo navegador.
+        """
+        usuario = dados.get('usuario', 'USUÁRIO_DESCONHECIDO')
+        USUARIO_ATUAL.set(usuario)
+        
+        try:
+            logger.info(f"⚡ Processando usuário via envio direto: {usuario}")
+            
+            with self.tempos.medir("envio_http_direto"):
+                resultado = await self.motor_http.enviar(context, dados)
+            if resultado is None:
+                return None
+            
+            await self.registrar_sucesso_usuario(usuario)
+            return True
+            
+        except Exception as e:
+            self.registrar_erro_usuario(usuario, e)
+            return False
+
+    async def registrar_sucesso_usuario(self, usuario):
+        """Registra um usuário cadastrado com sucesso (fsync do índice em thread)"""
+        logger.info(f"✅ Usuário {usuario} processado com sucesso!")
+        self.stats["sucessos"] += 1
+        self.conclusoes.append(time.monotonic())
+        self.gravar_resultado(usuario, "sucesso")
+        if self.indice:
+            await asyncio.to_thread(self.indice.adicionar, usuario)
+
+    def registrar_erro_usuario(self, usuario, e):
+        """Registra a falha no processamento de um usuário"""
+        logger.error(f"❌ Erro ao processar {usuario}: {e}")
+        self.stats["erros"] += 1
+        self.conclusoes.append(time.monotonic())
+        self.gravar_resultado(usuario, "erro", e)
+
+    def contar_nova_tentativa(self):
+        """Nova tentativa (etapa, reenvio ou redistribuição) do usuário atual"""
+        usuario = USUARIO_ATUAL.get()
+        if usuario is not None:
+            self.novas_tentativas[str(usuario)] = self.novas_tentativas.get(str(usuario), 0) + 1
+
+    def gravar_resultado(self, usuario, status, erro=None, linha_planilha=None, **extras):
+        """Envia o registro do usuário concluído ao relatório em fluxo"""
+        usuario = str(usuario)
+        etapas = self.tempos.retirar_linha_do_tempo(usuario)
+        tentativas = 1 + self.novas_tentativas.pop(usuario, 0)
+        if not self.resultados:
+            return
+        
+        registro = {
+            "usuario": usuario,
+            "linha_planilha": linha_planilha or LINHA_ATUAL.get(),
+            "status": status,
+            "tentativas": tentativas,
+            "duracao_ms": None,
+            "etapas": etapas,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if etapas:
+            # Do início da primeira etapa ao fim da última (etapas aninhadas não somam)
+            inicio = min(e["inicio_s"] for e in etapas)
+            fim = max(e["inicio_s"] + e["duracao_ms"] / 1000 for e in etapas)
+            registro["duracao_ms"] = round((fim - inicio) * 1000, 1)
+        if erro is not None:
+            registro["erro"] = str(erro)
+            registro["tipo_erro"] = type(erro).__name__
+            registro["classe_erro"] = self.retentativas.classificar(erro)
+        registro.update(extras)
+        
+        self.resultados.registrar(registro)
+
+    async def gerar_relatorio(self):
+        """Gera relatório final de execução"""
+        tempo_execucao = None
+        if self.stats["inicio_execucao"] and self.stats["fim_execucao"]:
+            tempo_execucao = (self.stats["fim_execucao"] - self.stats["inicio_execucao"]).total_seconds()
+        
+        logger.info("=" * 60)
+        logger.info("📊 RELATÓRIO FINAL DE EXECUÇÃO")
+        logger.info("=" * 60)
+        logger.info(f"📈 Total de usuários: {self.stats['total']}")
+        logger.info(f"✅ Sucessos: {self.stats['sucessos']}")
+        logger.info(f"❌ Erros: {self.stats['erros']}")
+        
+        if self.stats['ja_concluidos']:
+            logger.info(f"⏭️ Já concluídos anteriormente: {self.stats['ja_concluidos']}")
+        
+        if self.stats['rejeitados']:
+            logger.info(f"🚫 Rejeitados na validação: {self.stats['rejeitados']}")
+        
+        if self.stats['ja_cadastrados']:
+            logger.info(f"🗂️ Já cadastrados (índice local): {self.stats['ja_cadastrados']}")
+        
+        if self.stats['cancelado']:
+            nao_processadas = max(0, self.stats['total'] - self.stats['sucessos'] - self.stats['erros']
+                                  - self.stats['ja_concluidos'] - self.stats['rejeitados'] - self.stats['ja_cadastrados'])
+            logger.info(f"⏹️ Execução cancelada: {nao_processadas} linhas não processadas (retomáveis pelo checkpoint)")
+        
+        processados = (
+            self.stats['total'] - self.stats['ja_concluidos']
+            - self.stats['rejeitados'] - self.stats['ja_cadastrados']
+        )
+        if self.stats['cancelado']:
+            processados = self.stats['sucessos'] + self.stats['erros']
+        if processados > 0:
+            taxa_sucesso = (self.stats['sucessos'] / processados * 100)
+            logger.info(f"📊 Taxa de sucesso: {taxa_sucesso:.1f}%")
+        
+        if tempo_execucao:
+            logger.info(f"⏱️ Tempo de execução: {tempo_execucao:.1f} segundos")
+        
+        usuarios_por_minuto = None
+        if tempo_execucao and processados > 0:
+            usuarios_por_minuto = (self.stats['sucessos'] + self.stats['erros']) / (tempo_execucao / 60)
+            logger.info(f"🚄 Vazão: {usuarios_por_minuto:.1f} usuários/minuto (navegador {self.stats['modo_navegador']})")
+        
+        esperas = self.esperas.stats
+        logger.info(
+            f"⚡ Esperas por evento: {esperas['eventos']} "
+            f"(economia: {esperas['tempo_economizado_segundos']:.1f} segundos; "
+            f"fallbacks: {esperas['fallbacks']}, {esperas['tempo_em_fallback_segundos']:.1f} segundos)"
+        )
+        
+        preenchimento = self.preenchimento
+        if preenchimento["usuarios_em_lote"] or preenchimento["fallbacks"]:
+            logger.info(
+                f"📝 Preenchimento em lote: {preenchimento['usuarios_em_lote']} usuários, "
+                f"{preenchimento['idas_evitadas']} idas ao navegador evitadas "
+                f"(campos refeitos: {preenchimento['campos_corrigidos']}, fallbacks: {preenchimento['fallbacks']})"
+            )
+        
+        if self.cache_sessao and (self.cache_sessao.stats["restaurados"] or self.cache_sessao.stats["obsoletos"]):
+            cache = self.cache_sessao.stats
+            logger.info(f"🍪 Sessões restauradas do cache: {cache['restaurados']} (expiradas: {cache['obsoletos']})")
+        
+        if self.pool:
+            pool = self.pool.stats
+            logger.info(
+                f"🔥 Pool de sessões: {pool['prontas']}/{pool['emprestimos']} entregues já logadas "
+                f"({pool['sessoes_criadas']} criadas, {pool['rotacionadas']} renovadas no total)"
+            )
+        
+        carga = self.controlador.stats
+        if carga["respostas"]:
+            logger.info(
+                f"🎚️ Controle de carga: concorrência final {self.controlador.limite} "
+                f"(faixa {carga['limite_min']}-{carga['limite_max']}), pausa final {self.controlador.pausa:.2f} s, "
+                f"{carga['erros']}/{carga['respostas']} respostas .do com erro"
+            )
+        
+        retentativas = self.retentativas.stats
+        if retentativas["retentativas"] or retentativas["reenvios"] or retentativas["confirmados_na_listagem"]:
+            logger.info(
+                f"🔁 Novas tentativas: {retentativas['retentativas']} "
+                f"(recuperadas: {retentativas['recuperadas']}, reenvios: {retentativas['reenvios']}, "
+                f"confirmados na listagem: {retentativas['confirmados_na_listagem']}, "
+                f"orçamento restante: {self.retentativas.orcamento})"
+            )
+        
+        resultados = None
+        if self.resultados:
+            await asyncio.to_thread(self.resultados.fechar)
+            resultados = await asyncio.to_thread(self.resultados.resumir, CONFIG["relatorio"]["amostra_erros"])
+            
+            if resultados["amostra_erros"]:
+                logger.info(f"\n❌ Usuários com erro ({resultados['por_status'].get('erro', 0)}):")
+                for erro in resultados["amostra_erros"]:
+                    logger.info(f"  • {erro['usuario']}: {erro['erro']}")
+                if resultados["erros_fora_da_amostra"]:
+                    logger.info(f"  … e mais {resultados['erros_fora_da_amostra']} (ver {resultados['arquivo']})")
+        
+        if self.latencias_frames:
+            logger.info("🖼️ Latência na busca de frames:")
+            for padrao, dados in self.latencias_frames.items():
+                media = dados["total_ms"] / dados["buscas"]
+                logger.info(f"  • {padrao}: {dados['buscas']} buscas, média {media:.0f} ms, máx {dados['max_ms']:.0f} ms")
+        
+        recursos = self.filtro_recursos.stats
+        usuarios_processados = self.stats['sucessos'] + self.stats['erros']
+        if recursos["bloqueados"] and usuarios_processados:
+            logger.info(
+                f"🚫 Recursos bloqueados: {recursos['bloqueados']} requisições "
+                f"(~{recursos['bytes_economizados_estimados'] / 1024:.0f} KB); por usuário: "
+                f"{recursos['bloqueados'] / usuarios_processados:.1f} requisições, "
+                f"~{recursos['bytes_economizados_estimados'] / usuarios_processados / 1024:.0f} KB"
+            )
+        
+        tempos_por_etapa = self.tempos.resumo()
+        if tempos_por_etapa:
+            logger.info("⏱️ Tempo por etapa (p50 / p95 / máx):")
+            for etapa, dados in sorted(tempos_por_etapa.items(), key=lambda item: -item[1]["total_s"]):
+                logger.info(
+                    f"  • {etapa}: {dados['p50_ms']:.0f} / {dados['p95_ms']:.0f} / {dados['max_ms']:.0f} ms "
+                    f"({dados['amostras']}x, total {dados['total_s']:.1f} s)"
+                )
+        
+        # Salvar resumo em JSON (mesmo carimbo do resultados_*.jsonl)
+        relatorio_arquivo = os.path.join(
+            CONFIG["saida"]["diretorio"],
+            f"relatorio_{self.carimbo_relatorio()}.json"
+        )
+        relatorio = {
+            **self.stats,
+            "tempo_execucao_segundos": tempo_execucao,
+            "usuarios_por_minuto": usuarios_por_minuto,
+            "esperas": self.esperas.stats,
+            "preenchimento_lote": preenchimento,
+            "pool_sessoes": dict(self.pool.stats) if self.pool else None,
+            "cache_sessao": dict(self.cache_sessao.stats) if self.cache_sessao else None,
+            "controle_carga": {
+                **carga,
+                "ajustes": list(carga["ajustes"]),
+                "limite_final": self.controlador.limite,
+                "pausa_final_segundos": self.controlador.pausa
+            },
+            "retentativas": {**retentativas, "orcamento_restante": self.retentativas.orcamento},
+            "latencia_frames": self.latencias_frames,
+            "tempos_por_etapa": tempos_por_etapa,
+            "resultados": resultados,
+            "http_direto": self.motor_http.stats,
+            "recursos_bloqueados": {
+                **recursos,
+                "requisicoes_por_usuario": recursos["bloqueados"] / usuarios_processados if usuarios_processados else None,
+                "bytes_por_usuario_estimados": recursos["bytes_economizados_estimados"] / usuarios_processados if usuarios_processados else None
+            }
+        }
+        
+        try:
+            with open(relatorio_arquivo, 'w', encoding='utf-8') as f:
+                json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+            
+            logger.info(f"💾 Relatório salvo em: {relatorio_arquivo}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar relatório: {e}")
+            return
+        
+        if CONFIG["historico"]["habilitado"]:
+            try:
+                await asyncio.to_thread(self.indexar_relatorio, relatorio_arquivo, relatorio)
+            except Exception as e:
+                logger.warning(f"⚠️ Relatório não indexado no histórico: {e}")
+
+    def indexar_relatorio(self, relatorio_arquivo, relatorio):
+        """Inclui o relatório recém-gravado no histórico SQLite"""
+        diretorio = CONFIG["saida"]["diretorio"]
+        historico = HistoricoExecucoes(os.path.join(diretorio, CONFIG["historico"]["arquivo"]), diretorio)
+        historico.registrar(relatorio_arquivo, relatorio)
+
+    async def registrar_estado_linha(self, linha, estado, erro=None):
+        """Atualiza o checkpoint da linha, se habilitado (commit em thread, sem travar os workers)"""
+        if self.diario:
+            await asyncio.to_thread(
+                self.diario.registrar,
+                DiarioExecucao.chave_linha(linha),
+                linha.get('usuario', 'N/A'),
+                estado,
+                erro
+            )
+
+    async def registrar_erro_critico(self, idx, linha, e):
+        """Registra um erro que impediu o processamento da linha"""
+        logger.error(f"💥 Erro crítico no usuário {idx + 1}: {e}")
+        await self.registrar_estado_linha(linha, "falhou", e)
+        self.stats["erros"] += 1
+        self.conclusoes.append(time.monotonic())
+        self.gravar_resultado(linha.get('usuario', f'Linha_{idx + 1}'), "erro", e, linha_planilha=idx + 2, critico=True)
+
+    async def abrir_navegador(self, p, headless):
+        """Inicia o Chromium com as opções padrão"""
+        browser = await p.chromium.launch(
+            headless=headless,
+            args=['--no-sandbox', '--disable-dev-shm-usage']
+        )
+        self.stats["lancamentos_navegador"] += 1
+        return browser
+
+    @asynccontextmanager
+    async def ocupar_vaga(self):
+        """Ocupa uma vaga do controlador de carga e contabiliza o usuário em andamento"""
+        await self.controlador.adquirir()
+        self.stats["em_andamento"] += 1
+        try:
+            yield
+        finally:
+            self.stats["em_andamento"] -= 1
+            self.controlador.liberar()
+
+    def observar_resposta(self, response):
+        """Alimenta o controlador com o tempo até o primeiro byte das páginas .do"""
+        if not urlparse(response.url).path.endswith(".do"):
+            return
+        try:
+            latencia = response.request.timing.get("responseStart", -1)
+        except Exception:
+            latencia = -1
+        self.controlador.observar(latencia if latencia >= 0 else None, response.status >= 500)
+
+    def observar_falha(self, request):
+        """Falhas de rede em páginas .do (recursos bloqueados não contam)"""
+        if urlparse(request.url).path.endswith(".do"):
+            self.controlador.observar(None, True)
+
+    def usuarios_por_minuto(self):
+        """Vazão na janela recente (CONFIG["metricas"]["janela_vazao_segundos"])"""
+        janela = CONFIG["metricas"]["janela_vazao_segundos"]
+        agora = time.monotonic()
+        recentes = sum(1 for t in list(self.conclusoes) if agora - t <= janela)
+        decorrido = min(janela, agora - self.tempos.inicio)
+        return recentes / (decorrido / 60) if decorrido > 0 else 0.0
+
+    async def abrir_sessao(self, browser):
+        """Cria um contexto isolado com uma página pronta para login"""
+        estado = self.cache_sessao.retirar() if self.cache_sessao else None
+        context = await browser.new_context(storage_state=estado) if estado else await browser.new_context()
+        if estado:
+            self.contextos_restaurados.add(context)
+        await self.instalar_observadores(context)
+        
+        page = await context.new_page()
+        self.registros_frames[page] = RegistroFrames(page)
+        return context, page
+
+    async def instalar_observadores(self, context):
+        """Filtro de recursos e controle de carga deste automatizador no contexto"""
+        if CONFIG["recursos"]["habilitado"]:
+            await self.filtro_recursos.instalar(context)
+        
+        context.on("response", self.observar_resposta)
+        context.on("requestfailed", self.observar_falha)
+
+    async def remover_observadores(self, context):
+        try:
+            if CONFIG["recursos"]["habilitado"]:
+                await context.unroute("**/*", self.filtro_recursos._rotear)
+            context.remove_listener("response", self.observar_resposta)
+            context.remove_listener("requestfailed", self.observar_falha)
+        except Exception as e:
+            logger.debug(f"Erro ao remover observadores do contexto: {e}")
+
+    async def obter_sessao(self, browser):
+        """Contexto, página e frame do menu (None se ainda sem login)
+        
+        Com o pool, a sessão já vem logada e passa a reportar a esta execução.
+        """
+        if not self.pool:
+            context, page = await self.abrir_sessao(browser)
+            return context, page, None
+        
+        sessao = await self.pool.emprestar(self)
+        if sessao.dono is not self:
+            await sessao.dono.remover_observadores(sessao.context)
+            await self.instalar_observadores(sessao.context)
+            self.registros_frames[sessao.page] = sessao.dono.registros_frames.pop(sessao.page, None) or RegistroFrames(sessao.page)
+            sessao.dono = self
+        return sessao.context, sessao.page, sessao.frame_menu
+
+    async def devolver_sessao(self, context, frame_menu):
+        """Fim do worker: a sessão volta ao pool ou é fechada"""
+        if self.pool:
+            await self.pool.devolver(context, frame_menu)
+        else:
+            await self.fechar_sessao(context)
+
+    async def descartar_sessao(self, context):
+        """Sessão com falha ou de uso único: fechar sem devolver ao pool"""
+        if self.pool:
+            self.pool.esquecer(context)
+        if self.cache_sessao:
+            self.cache_sessao.soltar(context)
+        await self.fechar_sessao(context)
+
+    async def fechar_sessao(self, context):
+        """Fecha o contexto ignorando erros de navegador já encerrado"""
+        if context:
+            self.contextos_restaurados.discard(context)
+            for page in context.pages:
+                self.registros_frames.pop(page, None)
+            try:
+                await context.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar contexto: {e}")
+
+    async def proxima_linha(self, fila, fila_retorno):
+        """Próxima linha a processar; linhas devolvidas por falha têm prioridade
+        
+        Retorna None quando a planilha terminou e não há linhas devolvidas.
+        """
+        if not fila_retorno.empty():
+            return fila_retorno.get_nowait()
+        
+        item = await fila.get()
+        if item is None:
+            # Repassar o fim da leitura aos demais workers
+            fila.put_nowait(None)
+            if not fila_retorno.empty():
+                return fila_retorno.get_nowait()
+        return item
+
+    async def executar_worker(self, worker_id, browser, fila, fila_retorno):
+        """Consome linhas da fila usando um contexto e um login próprios"""
+        reutilizar = CONFIG["execucao"]["reutilizar_sessao"]
+        max_redistribuicoes = CONFIG["execucao"]["max_redistribuicoes"]
+        max_falhas_worker = CONFIG["execucao"]["max_falhas_worker"]
+        
+        context = None
+        page = None
+        gravador = None
+        frame_menu = None
+        no_menu = False
+        falhas_seguidas = 0
+        
+        try:
+            while True:
+                try:
+                    await self.controle.ponto_seguro()
+                except ExecucaoCancelada:
+                    break
+                
+                item = await self.proxima_linha(fila, fila_retorno)
+                if item is None:
+                    break
+                if self.controle.cancelado:
+                    break
+                idx, linha, tentativas = item
+                USUARIO_ATUAL.set(linha.get('usuario'))
+                LINHA_ATUAL.set(idx + 2)
+                
+                logger.info(f"\n{'='*50}")
+                logger.info(f"👤 [W{worker_id}] Usuário {idx + 1}/{self.stats['total']}: {linha.get('usuario', 'N/A')}")
+                logger.info(f"{'='*50}")
+                
+                if self.indice and linha.get('usuario') in self.indice:
+                    logger.info(f"⏭️ Login {linha.get('usuario')} já cadastrado anteriormente, ignorado")
+                    self.stats["ja_cadastrados"] += 1
+                    await self.registrar_estado_linha(linha, "concluido")
+                    self.gravar_resultado(linha.get('usuario'), "ja_cadastrado", tentativas=0)
+                    continue
+                
+                try:
+                    await self.registrar_estado_linha(linha, "em_andamento")
+                    
+                    async with self.ocupar_vaga():
+                        if context is None:
+                            context, page, frame_menu = await self.obter_sessao(browser)
+                            gravador = GravadorFormularios(page) if CONFIG["http_direto"]["habilitado"] else None
+                            GRAVADOR_ATUAL.set(gravador)
+                            no_menu = False
+                        
+                        # Login apenas quando a sessão é nova
+                        if frame_menu is None:
+                            with self.tempos.medir("login"):
+                                frame_menu = await self.entrar(page)
+                            no_menu = True
+                        
+                        resultado = None
+                        if self.motor_http.pronto:
+                            resultado = await self.processar_usuario_http(context, linha)
+                        
+                        if resultado is None:
+                            if not no_menu:
+                                with self.tempos.medir("voltar_ao_menu"):
+                                    frame_menu = await self.voltar_ao_menu(page)
+                            
+                            resultado = await self.processar_usuario(page, linha, frame_menu)
+                            no_menu = False
+                            
+                            # Primeiro cadastro pelo navegador vira modelo do envio direto
+                            if resultado and gravador and self.motor_http.modelo is None and not self.motor_http.desativado:
+                                self.motor_http.aprender(gravador.posts)
+                    
+                    await self.registrar_estado_linha(linha, "concluido" if resultado else "falhou")
+                    falhas_seguidas = 0
+                    
+                    if not reutilizar:
+                        if gravador:
+                            gravador.desligar()
+                        await self.descartar_sessao(context)
+                        context = None
+                    
+                    # Pausa entre usuários, ajustada pelo controlador de carga
+                    await self.controle.dormir(self.controlador.pausa)
+                
+                except ExecucaoCancelada:
+                    # Formulário não enviado: a linha fica pendente para a próxima execução
+                    await self.registrar_estado_linha(linha, "pendente")
+                    self.gravar_resultado(linha.get('usuario'), "cancelado")
+                    break
+                    
+                except Exception as e:
+                    falhas_seguidas += 1
+                    
+                    # Sessão pode ter ficado inutilizável; descartar e recomeçar
+                    if gravador:
+                        gravador.desligar()
+                    await self.descartar_sessao(context)
+                    context = None
+                    
+                    if tentativas < max_redistribuicoes:
+                        logger.warning(f"🔁 [W{worker_id}] Falha na sessão ({e}), linha {idx + 1} devolvida à fila")
+                        await self.registrar_estado_linha(linha, "pendente")
+                        self.contar_nova_tentativa()
+                        fila_retorno.put_nowait((idx, linha, tentativas + 1))
+                    else:
+                        await self.registrar_erro_critico(idx, linha, e)
+                    
+                    if falhas_seguidas >= max_falhas_worker:
+                        logger.error(f"🛑 [W{worker_id}] Encerrado após {falhas_seguidas} falhas seguidas")
+                        break
+        
+        finally:
+            if context:
+                if gravador:
+                    gravador.desligar()
+                await self.devolver_sessao(context, frame_menu)
+
+    async def alimentar_fila(self, leitor, fila):
+        """Lê a planilha em lotes fora do event loop e enfileira as linhas"""
+        iterador = iter(leitor)
+        validador = ValidadorPlanilha()
+        tamanho_lote = CONFIG["planilha"]["tamanho_lote"]
+        idx = 0
+        
+        def ler_lote():
+            lote = list(itertools.islice(iterador, tamanho_lote))
+            if not lote:
+                return []
+            # Consulta ao checkpoint também fora do event loop
+            return [
+                (linha, erros, None if erros or not self.diario else self.diario.estado(DiarioExecucao.chave_linha(linha)))
+                for linha, erros in validador.validar_lote(lote)
+            ]
+        
+        try:
+            while True:
+                lote = await asyncio.to_thread(ler_lote)
+                if not lote:
+                    break
+                
+                for linha, erros, estado in lote:
+                    if erros:
+                        self.registrar_linha_rejeitada(idx, linha, erros)
+                        idx += 1
+                        continue
+                    
+                    if estado == "concluido":
+                        self.stats["ja_concluidos"] += 1
+                        idx += 1
+                        continue
+                    if estado == "em_andamento":
+                        logger.warning(f"⚠️ Linha {idx + 1} ({linha.get('usuario', 'N/A')}) foi interrompida na execução anterior, será reprocessada")
+                    
+                    await fila.put((idx, linha, 0))
+                    idx += 1
+        
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler a planilha (linha {idx + 2}): {e}")
+        
+        else:
+            # Contagem real substitui a estimativa dos metadados
+            self.stats["total"] = idx
+        
+        await fila.put(None)
+        
+        if self.stats["ja_concluidos"]:
+            logger.info(f"⏭️ {self.stats['ja_concluidos']} linhas já concluídas em execuções anteriores")
+        
+        if self.stats["rejeitados"]:
+            logger.warning(f"🚫 {self.stats['rejeitados']} linhas rejeitadas na validação da planilha")
+
+    def registrar_linha_rejeitada(self, idx, linha, erros):
+        """Registra uma linha inválida, descartada antes de abrir o navegador"""
+        usuario = linha.get('usuario') or f'Linha_{idx + 1}'
+        logger.warning(f"🚫 Linha {idx + 2} ({usuario}) rejeitada: {'; '.join(erros)}")
+        self.stats["rejeitados"] += 1
+        self.gravar_resultado(
+            usuario, "rejeitado",
+            linha_planilha=idx + 2,  # Linha 1 é o cabeçalho
+            tentativas=0,
+            erros=erros
+        )
+
+    async def reconciliar_indice(self, browser):
+        """Reconstrói o índice de logins a partir da listagem de usuários do portal"""
+        url_listagem = CONFIG["indice"]["url_listagem"]
+        if not url_listagem:
+            logger.warning("⚠️ Reconciliação ignorada: CONFIG['indice']['url_listagem'] não configurada")
+            return
+        
+        context = None
+        try:
+            logger.info("🔎 Reconciliando índice com a listagem do portal...")
+            context, page = await self.abrir_sessao(browser)
+            await self.entrar(page)
+            
+            await page.goto(
+                f"{CONFIG['url'].rstrip('/')}/{url_listagem.lstrip('/')}",
+                wait_until='domcontentloaded',
+                timeout=CONFIG["timeouts"]["navigation"]
+            )
+            logins = await page.locator(CONFIG["indice"]["seletor_login"]).all_inner_texts()
+            
+            self.indice.reconstruir(logins)
+            logger.info(f"✅ Índice reconciliado: {len(logins)} logins no portal, {len(self.indice.logins)} no total")
             
         except Exception as e:
-            logger.error(f"❌ Erro na finalização: {e}")
-            raise
+            logger.error(f"❌ Erro na reconciliação do índice: {e}")
+        
+        finally:
+            await self.fechar_sessao(context)
 
-    async def processar_usuario(self, page, dados, frame_inicial):
-        """Processa um único usuário completo"""
-        usuario = dados.get('usuario', 'USUÁRIO_DESCONHECIDO')
+    async def processar_com_workers(self, p, leitor, workers, headless):
+        """Distribui as linhas entre N contextos isolados do mesmo navegador"""
+        fila = asyncio.Queue(maxsize=CONFIG["planilha"]["tamanho_fila"])
+        fila_retorno = asyncio.Queue()
         
+        workers = max(1, min(workers, self.stats["total"] or 1))
+        self.controlador = ControladorCarga(min(workers, CONFIG["execucao"]["max_concorrencia"]))
+        self.stats["workers"] = workers
+        logger.info(f"👷 Iniciando {workers} worker(s)")
+        
+        browser = None
+        leitura = asyncio.create_task(self.alimentar_fila(leitor, fila))
         try:
-            logger.info(f"🚀 Processando usuário: {usuario}")
-            
-            # 1. Navegar para incluir acesso
-            frame_acesso = await self.navegar_para_incluir_acesso(page, frame_inicial)
-            
-            # 2. Configurar grupo
-            frame_grupo = await self.configurar_grupo(page)
+            browser = self.pool.browser if self.pool else await self.abrir_navegador(p, headless)
             
-            # 3. Preencher dados do usuário
-            await self.preencher_dados_usuario(frame_grupo, dados)
+            if self.indice and CONFIG["indice"]["reconciliar"]:
+                await self.reconciliar_indice(browser)
             
-            # 4. Configurar selects
-            await self.configurar_selects(frame_grupo)
+            await asyncio.gather(*[
+                self.executar_worker(n + 1, browser, fila, fila_retorno)
+                for n in range(workers)
+            ])
             
-            # 5. Finalizar cadastro
-            await self.finalizar_cadastro(frame_grupo)
+            if self.controle.cancelado:
+                self.stats["cancelado"] = True
+                return
             
-            logger.info(f"✅ Usuário {usuario} processado com sucesso!")
-            self.stats["sucessos"] += 1
-            return True
+            # Linhas que sobraram porque todos os workers foram encerrados
+            erro = Exception("Nenhum worker disponível para processar a linha")
+            while not fila_retorno.empty():
+                idx, linha, _ = fila_retorno.get_nowait()
+                await self.registrar_erro_critico(idx, linha, erro)
+            while True:
+                item = await fila.get()
+                if item is None:
+                    break
+                idx, linha, _ = item
+                await self.registrar_erro_critico(idx, linha, erro)
             
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar {usuario}: {e}")
-            self.stats["erros"] += 1
-            self.stats["usuarios_erro"].append({
-                "usuario": usuario,
-                "erro": str(e),
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            return False
+            await leitura
+        
+        finally:
+            if not leitura.done():
+                leitura.cancel()
+            if browser and not self.pool:
+                await browser.close()
 
-    async def gerar_relatorio(self):
-        """Gera relatório final de execução"""
-        tempo_execucao = None
-        if self.stats["inicio_execucao"] and self.stats["fim_execucao"]:
-            tempo_execucao = (self.stats["fim_execucao"] - self.stats["inicio_execucao"]).total_seconds()
+    def retrato_progresso(self):
+        """Contadores, vazão, ETA e latência média por etapa para o painel"""
+        stats = self.stats
+        concluidos = (
+            stats["sucessos"] + stats["erros"] + stats["ja_concluidos"]
+            + stats["ja_cadastrados"] + stats["rejeitados"]
+        )
+        vazao = self.usuarios_por_minuto()
+        restantes = max(0, stats["total"] - concluidos)
         
-        logger.info("=" * 60)
-        logger.info("📊 RELATÓRIO FINAL DE EXECUÇÃO")
-        logger.info("=" * 60)
-        logger.info(f"📈 Total de usuários: {self.stats['total']}")
-        logger.info(f"✅ Sucessos: {self.stats['sucessos']}")
-        logger.info(f"❌ Erros: {self.stats['erros']}")
+        latencias = {
+            etapa: histograma["soma"] / histograma["contagem"] * 1000
+            for etapa, histograma in list(self.tempos.histogramas.items())
+            if histograma["contagem"] and not etapa.startswith("espera:")
+        }
         
-        if self.stats['total'] > 0:
-            taxa_sucesso = (self.stats['sucessos'] / self.stats['total'] * 100)
-            logger.info(f"📊 Taxa de sucesso: {taxa_sucesso:.1f}%")
+        return {
+            "total": stats["total"],
+            "concluidos": concluidos,
+            "sucessos": stats["sucessos"],
+            "erros": stats["erros"],
+            "em_andamento": stats["em_andamento"],
+            "usuarios_por_minuto": vazao,
+            "eta_segundos": restantes / vazao * 60 if vazao > 0 and restantes else None,
+            "latencia_media_ms": latencias,
+            "finalizado": stats["fim_execucao"] is not None
+        }
+
+    async def publicar_progresso(self):
+        """Publica o retrato no canal em ritmo fixo, independente dos eventos"""
+        intervalo = 1 / CONFIG["interface"]["quadros_por_segundo"]
+        while True:
+            self.canal.publicar(self.retrato_progresso())
+            await asyncio.sleep(intervalo)
+
+    def carimbo_relatorio(self):
+        """Data/hora do início da execução, usada nos nomes dos arquivos de saída"""
+        return (self.stats["inicio_execucao"] or datetime.now()).strftime('%Y%m%d_%H%M%S')
+
+    async def executar(self, arquivo_excel, workers=None, headless=None):
+        """Método principal de execução"""
+        self.stats["inicio_execucao"] = datetime.now()
         
-        if tempo_execucao:
-            logger.info(f"⏱️ Tempo de execução: {tempo_execucao:.1f} segundos")
+        publicador = asyncio.ensure_future(self.publicar_progresso()) if self.canal else None
         
-        if self.stats["usuarios_erro"]:
-            logger.info(f"\n❌ Usuários com erro ({len(self.stats['usuarios_erro'])}):")
-            for erro in self.stats["usuarios_erro"]:
-                logger.info(f"  • {erro['usuario']}: {erro['erro']}")
+        exportador = None
+        if CONFIG["metricas"]["porta"]:
+            try:
+                exportador = ExportadorMetricas(self, CONFIG["metricas"]["porta"], CONFIG["metricas"]["host"])
+                exportador.iniciar()
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível iniciar o endpoint de métricas: {e}")
+                exportador = None
         
-        # Salvar relatório em JSON
-        relatorio_arquivo = f"relatorio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         try:
-            with open(relatorio_arquivo, 'w', encoding='utf-8') as f:
-                json.dump({
-                    **self.stats,
-                    "tempo_execucao_segundos": tempo_execucao
-                }, f, ensure_ascii=False, indent=2, default=str)
-            
-            logger.info(f"💾 Relatório salvo em: {relatorio_arquivo}")
-        except Exception as e:
-            logger.error(f"❌ Erro ao salvar relatório: {e}")
+            await self.executar_planilha(arquivo_excel, workers, headless)
+        finally:
+            if self.resultados:
+                self.resultados.fechar()
+            if exportador:
+                exportador.parar()
+            if publicador:
+                publicador.cancel()
+                self.canal.publicar(self.retrato_progresso())
 
-    async def executar(self, arquivo_excel):
-        """Método principal de execução"""
-        self.stats["inicio_execucao"] = datetime.now()
+    async def executar_planilha(self, arquivo_excel, workers, headless):
+        """Carrega a planilha, processa os usuários e gera o relatório"""
+        # Modo do navegador vale só para esta execução (CONFIG fica como padrão)
+        if headless is None:
+            headless = CONFIG["execucao"]["headless"]
+        self.stats["modo_navegador"] = "headless" if headless else "headed"
         
         try:
             # Validar arquivo
             if not os.path.exists(arquivo_excel):
                 raise FileNotFoundError(f"Arquivo não encontrado: {arquivo_excel}")
             
-            # Carregar dados
+            # Abrir planilha em streaming
             logger.info(f"📂 Carregando dados: {os.path.basename(arquivo_excel)}")
+            leitor = LeitorPlanilha(arquivo_excel)
             try:
-                df = pd.read_excel(arquivo_excel)
+                total = await asyncio.to_thread(leitor.contar_linhas)
             except Exception as e:
                 raise Exception(f"Erro ao ler arquivo Excel: {e}")
             
-            if df.empty:
+            if total == 0:
                 raise Exception("Arquivo Excel está vazio")
             
-            self.stats["total"] = len(df)
-            logger.info(f"📋 {len(df)} usuários carregados para processamento")
+            self.stats["total"] = total
+            logger.info(f"📋 {total} usuários encontrados para processamento (estimativa dos metadados)")
+            
+            if CONFIG["checkpoint"]["habilitado"]:
+                self.diario = DiarioExecucao(arquivo_excel, CONFIG["saida"]["diretorio"])
+            
+            self.resultados = GravadorResultados(os.path.join(
+                CONFIG["saida"]["diretorio"],
+                f"resultados_{self.carimbo_relatorio()}.jsonl"
+            ))
+            
+            if CONFIG["indice"]["habilitado"]:
+                self.indice = IndiceUsuarios(
+                    os.path.join(CONFIG["saida"]["diretorio"], CONFIG["indice"]["arquivo"]),
+                    CONFIG["saida"]["diretorio"]
+                )
             
             # Processar usuários
-            async with async_playwright() as p:
-                for idx, linha in df.iterrows():
-                    logger.info(f"\n{'='*50}")
-                    logger.info(f"👤 Usuário {idx + 1}/{len(df)}: {linha.get('usuario', 'N/A')}")
-                    logger.info(f"{'='*50}")
-                    
-                    browser = None
-                    try:
-                        # Configurar browser
-                        browser = await p.chromium.launch(
-                            headless=False,
-                            args=['--no-sandbox', '--disable-dev-shm-usage']
-                        )
-                        
-                        context = await browser.new_context()
-                        page = await context.new_page()
-                        
-                        # Fazer login
-                        frame_inicial = await self.fazer_login(page)
-                        
-                        # Processar usuário
-                        await self.processar_usuario(page, linha, frame_inicial)
-                        
-                        # Pausa entre usuários
-                        await asyncio.sleep(CONFIG["timeouts"]["retry_delay"])
-                        
-                    except Exception as e:
-                        logger.error(f"💥 Erro crítico no usuário {idx + 1}: {e}")
-                        self.stats["erros"] += 1
-                        self.stats["usuarios_erro"].append({
-                            "usuario": linha.get('usuario', f'Linha_{idx + 1}'),
-                            "erro": f"Erro crítico: {str(e)}",
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                    
-                    finally:
-                        if browser:
-                            await browser.close()
+            workers = workers or CONFIG["execucao"]["workers"]
+            try:
+                if self.pool:
+                    await self.pool.preparar(self, min(workers, total), headless)
+                    await self.processar_com_workers(None, leitor, workers, headless)
+                else:
+                    self.cache_sessao = CacheSessao.criar(CONFIG["saida"]["diretorio"])
+                    async with async_playwright() as p:
+                        await self.processar_com_workers(p, leitor, workers, headless)
+            finally:
+                if self.diario:
+                    self.diario.fechar()
             
             self.stats["fim_execucao"] = datetime.now()
             await self.gerar_relatorio()
@@ -491,7 +3501,7 @@ class AutomatizadorGestao:
             raise
 
 class InterfaceAutomatizador:
-    def __init__(self):
+    def __init__(self, workers=None, headless=None):
         self.root = tk.Tk()
         self.root.title("🤖 Automatizador Gestão de Acessos (Clientes) v2.0")
         self.root.geometry("600x1080")  # Aumentar altura
@@ -509,10 +3519,28 @@ class InterfaceAutomatizador:
         # Variáveis
         self.tipo_cliente_var = tk.StringVar(value="Cliente ADM")
         self.campo_contrato_var = tk.StringVar(value="1")
+        self.workers_var = tk.IntVar(value=workers or CONFIG["execucao"]["workers"])
+        self.mostrar_navegador_var = tk.BooleanVar(
+            value=not (CONFIG["execucao"]["headless"] if headless is None else headless)
+        )
         self.arquivo_excel = r"C:\Users\gustavo.ribeiro\Desktop\Python\Automatizador gestão de acessos\usuarios.xlsx"
         self.arquivo_env = None  # NOVA VARIÁVEL
         self.executando = False
         
+        # Loop e pool de sessões persistentes entre execuções
+        self.laco = None
+        self.pool = None
+        
+        # Progresso publicado pela execução e desenhado em ritmo fixo
+        self.canal_progresso = CanalProgresso()
+        self.ultimo_retrato = None
+        
+        # Sinais de pausa/cancelamento da execução em andamento
+        self.controle = None
+        self.thread_execucao = None
+        self.fechando = False
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+        
         self.criar_interface()
 
     # ========== NOVA FUNÇÃO ==========
@@ -635,6 +3663,9 @@ class InterfaceAutomatizador:
         # Seção controles
         self.criar_secao_controles(main_frame)
         
+        # Seção progresso
+        self.criar_secao_progresso(main_frame)
+        
         # Seção logs
         self.criar_secao_logs(main_frame)
         
@@ -712,13 +3743,8 @@ class InterfaceAutomatizador:
             font=("Arial", 11, "bold")
         ).pack(anchor=tk.W, pady=(0, 8))
         
-        tipos_cliente = [
-            ("Cliente ADM", "Cliente ADM"),
-            ("Rastreio/TMK", "Rastreio/TMK"),
-            ("Rastreio/Consulta", "Rastreio/Consulta")
-        ]
-        
-        for texto, valor in tipos_cliente:
+        for texto in TIPOS_CLIENTE:
+            valor = texto
             ttk.Radiobutton(
                 tipo_frame,
                 text=texto,
@@ -752,6 +3778,35 @@ class InterfaceAutomatizador:
                 variable=self.campo_contrato_var,
                 value=valor
             ).pack(anchor=tk.W, pady=2)
+        
+        # Separador
+        ttk.Separator(config_frame, orient='horizontal').pack(fill=tk.X, pady=(10, 15))
+        
+        # Workers paralelos
+        workers_frame = ttk.Frame(config_frame)
+        workers_frame.pack(fill=tk.X)
+        
+        ttk.Label(
+            workers_frame,
+            text="👷 Workers Paralelos:",
+            font=("Arial", 11, "bold")
+        ).pack(anchor=tk.W, pady=(0, 8))
+        
+        ttk.Spinbox(
+            workers_frame,
+            from_=1,
+            to=CONFIG["execucao"]["max_concorrencia"],
+            textvariable=self.workers_var,
+            width=5,
+            state="readonly"
+        ).pack(anchor=tk.W)
+        
+        # Modo do navegador
+        ttk.Checkbutton(
+            config_frame,
+            text="👁️ Mostrar navegador (depuração)",
+            variable=self.mostrar_navegador_var
+        ).pack(anchor=tk.W, pady=(15, 0))
     
     def criar_secao_controles(self, parent):
         """Cria a seção de controles"""
@@ -775,13 +3830,33 @@ class InterfaceAutomatizador:
         )
         self.btn_principal.pack(fill=tk.X, pady=(0, 10), ipady=8)
         
+        # Pausar/retomar e cancelar a execução em andamento
+        execucao_frame = ttk.Frame(controles_frame)
+        execucao_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.btn_pausar = ttk.Button(
+            execucao_frame,
+            text="⏸️ Pausar",
+            command=self.alternar_pausa,
+            state="disabled"
+        )
+        self.btn_pausar.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
+        
+        self.btn_cancelar = ttk.Button(
+            execucao_frame,
+            text="⏹️ Cancelar",
+            command=self.cancelar_processamento,
+            state="disabled"
+        )
+        self.btn_cancelar.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(5, 0))
+        
         # Frame para botões secundários
         botoes_sec_frame = ttk.Frame(controles_frame)
         botoes_sec_frame.pack(fill=tk.X)
         
         ttk.Button(
             botoes_sec_frame,
-            text="📊 Ver Últimos Relatórios",
+            text="📊 Histórico de Relatórios",
             command=self.ver_relatorios
         ).pack(side=tk.LEFT, padx=(0, 10))
         
@@ -797,6 +3872,64 @@ class InterfaceAutomatizador:
             command=self.mostrar_ajuda
         ).pack(side=tk.RIGHT)
     
+    def criar_secao_progresso(self, parent):
+        """Cria o painel de progresso da execução"""
+        progresso_frame = ttk.LabelFrame(parent, text="📈 Progresso", padding="10")
+        progresso_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        self.barra_progresso = ttk.Progressbar(progresso_frame, mode="determinate", maximum=1)
+        self.barra_progresso.pack(fill=tk.X, pady=(0, 8))
+        
+        self.progresso_linhas_var = tk.StringVar(value="Aguardando execução")
+        self.progresso_resultados_var = tk.StringVar(value="")
+        self.progresso_vazao_var = tk.StringVar(value="")
+        self.progresso_latencia_var = tk.StringVar(value="")
+        
+        for variavel in (
+            self.progresso_linhas_var,
+            self.progresso_resultados_var,
+            self.progresso_vazao_var,
+            self.progresso_latencia_var
+        ):
+            ttk.Label(progresso_frame, textvariable=variavel, wraplength=520).pack(anchor=tk.W)
+        
+        self.root.after(int(1000 / CONFIG["interface"]["quadros_por_segundo"]), self.atualizar_progresso)
+    
+    def atualizar_progresso(self):
+        """Desenha o retrato mais recente do canal (chamado em ritmo fixo)"""
+        retrato = self.canal_progresso.ler()
+        
+        if retrato is not None and retrato is not self.ultimo_retrato:
+            self.ultimo_retrato = retrato
+            total = retrato["total"]
+            concluidos = retrato["concluidos"]
+            
+            self.barra_progresso.config(maximum=max(total, 1), value=concluidos)
+            percentual = concluidos / total * 100 if total else 0
+            self.progresso_linhas_var.set(f"📋 Linhas: {concluidos}/{total} ({percentual:.0f}%)")
+            self.progresso_resultados_var.set(
+                f"✅ Sucessos: {retrato['sucessos']}   ❌ Erros: {retrato['erros']}   "
+                f"⏳ Em andamento: {retrato['em_andamento']}"
+            )
+            
+            if retrato["finalizado"]:
+                eta = "concluído"
+            elif retrato["eta_segundos"] is not None:
+                minutos, segundos = divmod(int(retrato["eta_segundos"]), 60)
+                horas, minutos = divmod(minutos, 60)
+                eta = f"{horas:02d}:{minutos:02d}:{segundos:02d}"
+            else:
+                eta = "calculando..."
+            self.progresso_vazao_var.set(f"🚄 {retrato['usuarios_por_minuto']:.1f} usuários/min   ⏱️ ETA: {eta}")
+            
+            latencias = sorted(retrato["latencia_media_ms"].items(), key=lambda item: -item[1])
+            self.progresso_latencia_var.set(
+                "⏱️ Média por etapa: " + ", ".join(f"{etapa} {ms:.0f} ms" for etapa, ms in latencias)
+                if latencias else ""
+            )
+        
+        self.root.after(int(1000 / CONFIG["interface"]["quadros_por_segundo"]), self.atualizar_progresso)
+    
     def criar_secao_logs(self, parent):
         """Cria a seção de logs"""
         logs_frame = ttk.LabelFrame(parent, text="📋 Logs de Execução", padding="10")
@@ -840,6 +3973,19 @@ class InterfaceAutomatizador:
             text="💾 Salvar Logs",
             command=self.salvar_logs
         ).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Filtro de nível dos logs exibidos
+        self.nivel_log_var = tk.StringVar(value=CONFIG["interface"]["nivel_log"])
+        nivel_combo = ttk.Combobox(
+            controles_logs_frame,
+            textvariable=self.nivel_log_var,
+            values=["INFO", "WARNING", "ERROR"],
+            state="readonly",
+            width=10
+        )
+        nivel_combo.pack(side=tk.RIGHT)
+        nivel_combo.bind("<<ComboboxSelected>>", self.alterar_nivel_log)
+        ttk.Label(controles_logs_frame, text="Nível:").pack(side=tk.RIGHT, padx=(0, 5))
     
     def configurar_logs_interface(self):
         """Configura o logging para aparecer na interface"""
@@ -850,16 +3996,22 @@ class InterfaceAutomatizador:
             datefmt='%H:%M:%S'
         ))
         
+        self.gui_handler.setLevel(self.nivel_log_var.get())
+        
         # Adicionar handler ao logger principal
         logger.addHandler(self.gui_handler)
     
+    def alterar_nivel_log(self, event=None):
+        """Aplica o nível mínimo escolhido aos logs da interface"""
+        self.gui_handler.setLevel(self.nivel_log_var.get())
+    
     def atualizar_status_arquivo(self):
         """Atualiza o status do arquivo Excel"""
         try:
             if os.path.exists(self.arquivo_excel):
-                df = pd.read_excel(self.arquivo_excel)
+                total = LeitorPlanilha(self.arquivo_excel).contar_linhas()
                 self.status_label.config(
-                    text=f"✅ {len(df)} usuários encontrados",
+                    text=f"✅ {total} usuários encontrados",
                     foreground="green"
                 )
             else:
@@ -879,6 +4031,7 @@ class InterfaceAutomatizador:
             title="Selecionar arquivo Excel",
             filetypes=[
                 ("Arquivos Excel", "*.xlsx *.xls"),
+                ("Arquivos CSV", "*.csv"),
                 ("Todos os arquivos", "*.*")
             ],
             initialdir=os.path.dirname(self.arquivo_excel)
@@ -921,28 +4074,43 @@ class InterfaceAutomatizador:
         
         if resposta:
             self.executando = True
+            self.controle = ControleExecucao()
             self.btn_principal.config(
                 text="⏳ EXECUTANDO...",
                 state="disabled",
                 bg="#ff9800"
             )
+            self.btn_pausar.config(text="⏸️ Pausar", state="normal")
+            self.btn_cancelar.config(state="normal")
             
             # Executar em thread separada
-            thread = threading.Thread(target=self.executar_automatizador)
-            thread.daemon = True
-            thread.start()
+            self.thread_execucao = threading.Thread(target=self.executar_automatizador)
+            self.thread_execucao.daemon = True
+            self.thread_execucao.start()
     
     def executar_automatizador(self):
         """Executa o automatizador em thread separada"""
         try:
-            # Atualizar configurações baseadas na interface
-            self.atualizar_configuracoes()
+            # Plano do formulário conforme as configurações da interface
+            plano = self.atualizar_configuracoes()
             
             # Criar e executar automatizador
-            automatizador = AutomatizadorGestao()
+            if CONFIG["pool"]["habilitado"] and self.laco is None:
+                self.laco = LacoAssincrono()
+                self.pool = PoolSessoes()
+            automatizador = AutomatizadorGestao(plano, pool=self.pool, canal=self.canal_progresso, controle=self.controle)
             
-            # Executar com asyncio
-            asyncio.run(automatizador.executar(self.arquivo_excel))
+            execucao = automatizador.executar(
+                self.arquivo_excel,
+                workers=self.workers_var.get(),
+                headless=not self.mostrar_navegador_var.get()
+            )
+            
+            # Com o pool, o loop persistente mantém navegador e sessões para a próxima execução
+            if self.laco:
+                self.laco.executar(execucao)
+            else:
+                asyncio.run(execucao)
             
             # Notificar conclusão
             self.root.after(0, self.execucao_concluida, True)
@@ -952,21 +4120,42 @@ class InterfaceAutomatizador:
             self.root.after(0, self.execucao_concluida, False, str(e))
     
     def atualizar_configuracoes(self):
-        """Atualiza as configurações baseadas na interface"""
+        """Monta o plano do formulário a partir das configurações da interface"""
         tipo_cliente = self.tipo_cliente_var.get()
         campo_contrato = self.campo_contrato_var.get()
         
-        # Mapear tipos de cliente para subgrupo_id
-        mapeamento_subgrupo = {
-            "Cliente ADM": "32",
-            "Rastreio/TMK": "113", 
-            "Rastreio/Consulta": "133"
-        }
+        plano = plano_formulario(tipo_cliente, campo_contrato)
         
-        CONFIG["values"]["subgroup_id"] = mapeamento_subgrupo.get(tipo_cliente, "32")
-        CONFIG["values"]["empresa_input_position"] = int(campo_contrato) - 1
+        logger.info(f"Configurações atualizadas - Tipo: {tipo_cliente}, Campo: {campo_contrato}, Workers: {self.workers_var.get()}")
+        return plano
+    
+    def alternar_pausa(self):
+        """Pausa após o usuário atual ou retoma com as mesmas sessões"""
+        if not self.controle:
+            return
+        
+        if self.controle.pausado:
+            self.controle.retomar()
+            self.btn_pausar.config(text="⏸️ Pausar")
+        else:
+            self.controle.pausar()
+            self.btn_pausar.config(text="▶️ Retomar")
+            logger.info("⏸️ Pausa solicitada; os usuários em andamento serão concluídos")
+    
+    def cancelar_processamento(self):
+        """Interrompe a execução no próximo ponto seguro, mantendo o relatório"""
+        if not self.controle or self.controle.cancelado:
+            return
         
-        logger.info(f"Configurações atualizadas - Tipo: {tipo_cliente}, Campo: {campo_contrato}")
+        if messagebox.askyesno(
+            "Cancelar Execução",
+            "Cancelar o processamento?\n\nUsuários ainda não enviados ficam pendentes "
+            "e o relatório será gerado normalmente."
+        ):
+            self.controle.cancelar()
+            self.btn_pausar.config(state="disabled")
+            self.btn_cancelar.config(state="disabled")
+            logger.info("⏹️ Cancelamento solicitado; encerrando no próximo ponto seguro...")
     
     def execucao_concluida(self, sucesso, erro=None):
         """Callback chamado quando a execução termina"""
@@ -976,8 +4165,16 @@ class InterfaceAutomatizador:
             state="normal",
             bg="#4CAF50"
         )
+        self.btn_pausar.config(text="⏸️ Pausar", state="disabled")
+        self.btn_cancelar.config(state="disabled")
+        
+        if self.fechando:
+            # A janela será fechada por aguardar_execucao_para_fechar
+            return
         
-        if sucesso:
+        if sucesso and self.controle and self.controle.cancelado:
+            messagebox.showinfo("Cancelado", "Processamento cancelado. O relatório parcial foi salvo.")
+        elif sucesso:
             messagebox.showinfo("Sucesso", "Processamento concluído! Verifique os logs para detalhes.")
         else:
             messagebox.showerror("Erro", f"Erro durante a execução:\n\n{erro}")
@@ -1012,54 +4209,15 @@ class InterfaceAutomatizador:
             messagebox.showerror("Erro", f"Erro ao salvar logs:\n{e}")
     
     def ver_relatorios(self):
-        """Abre diálogo para visualizar relatórios"""
+        """Abre o histórico de execuções indexado em SQLite"""
+        diretorio = CONFIG["saida"]["diretorio"]
         try:
-            arquivos_relatorio = [f for f in os.listdir('.') if f.startswith('relatorio_') and f.endswith('.json')]
-            
-            if not arquivos_relatorio:
-                messagebox.showinfo("Info", "Nenhum relatório encontrado.")
-                return
-            
-            # Ordenar por data (mais recente primeiro)
-            arquivos_relatorio.sort(reverse=True)
-            
-            # Criar janela de relatórios
-            janela_relatorio = tk.Toplevel(self.root)
-            janela_relatorio.title("📊 Relatórios de Execução")
-            janela_relatorio.geometry("600x400")
-            
-            # Lista de relatórios
-            frame_lista = ttk.Frame(janela_relatorio)
-            frame_lista.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-            
-            ttk.Label(frame_lista, text="Relatórios Disponíveis:", font=("Arial", 12, "bold")).pack(anchor=tk.W, pady=(0, 10))
-            
-            listbox = tk.Listbox(frame_lista, font=("Consolas", 10))
-            listbox.pack(fill=tk.BOTH, expand=True)
-            
-            for arquivo in arquivos_relatorio[:10]:  # Mostrar apenas os 10 mais recentes
-                listbox.insert(tk.END, arquivo)
-            
-            # Botão para abrir relatório
-            ttk.Button(
-                frame_lista,
-                text="📂 Abrir Relatório Selecionado",
-                command=lambda: self.abrir_relatorio(arquivos_relatorio[listbox.curselection()[0]] if listbox.curselection() else None)
-            ).pack(pady=(10, 0))
-            
+            historico = HistoricoExecucoes(os.path.join(diretorio, CONFIG["historico"]["arquivo"]), diretorio)
         except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao listar relatórios:\n{e}")
-    
-    def abrir_relatorio(self, arquivo):
-        """Abre um relatório específico"""
-        if not arquivo:
-            messagebox.showwarning("Aviso", "Selecione um relatório!")
+            messagebox.showerror("Erro", f"Erro ao abrir o histórico de relatórios:\n{e}")
             return
         
-        try:
-            os.startfile(arquivo)
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao abrir relatório:\n{e}")
+        JanelaHistorico(self.root, historico)
     
     def testar_conexao(self):
         """Testa a conexão com o sistema"""
@@ -1104,8 +4262,10 @@ class InterfaceAutomatizador:
    • E-mail - E-mail do usuário  
    • Cliente - Nome/código do cliente
 
-3. IMPORTANTE: Todas as 8 colunas são obrigatórias e devem estar
-   nesta ordem exata na planilha Excel.
+3. IMPORTANTE: As colunas são identificadas pelo cabeçalho.
+   Nome, Login, E-mail e Cliente são obrigatórias; linhas com
+   campos vazios, e-mail inválido ou login repetido são rejeitadas
+   antes do processamento e listadas no relatório.
 
 4. Configure o tipo de cliente e campo contrato
 5. Clique em "INICIAR PROCESSAMENTO"
@@ -1123,6 +4283,13 @@ APP_PASSWORD=sua_senha
 📊 RELATÓRIOS:
 Após cada execução, um relatório detalhado é gerado
 automaticamente com estatísticas e logs de erro.
+O arquivo resultados_<data>.jsonl traz uma linha por usuário
+(status, tempos, tipo de erro e tentativas), gravada durante
+o processamento.
+O botão "Histórico de Relatórios" consulta todas as execuções
+(índice historico_execucoes.sqlite3 na pasta de saída), com
+filtros por data, tipo de cliente, login e tipo de erro, e uma
+visão agregada de vazão e taxa de erro por dia ou mês.
 
 🔧 SUPORTE:
 Em caso de problemas, verifique:
@@ -1152,36 +4319,423 @@ By. Gustavo Antonelli
         texto_ajuda.insert(tk.END, ajuda_texto)
         texto_ajuda.config(state=tk.DISABLED)
     
+    def fechar(self):
+        """Cancela a execução em andamento e fecha a janela quando ela terminar"""
+        if self.executando:
+            if self.fechando:
+                return
+            if not messagebox.askyesno("Sair", "Há um processamento em andamento. Cancelar e sair?"):
+                return
+            
+            # Workers param no próximo ponto seguro e o relatório parcial é gerado antes de fechar
+            self.fechando = True
+            self.controle.cancelar()
+            self.btn_pausar.config(state="disabled")
+            self.btn_cancelar.config(state="disabled")
+            logger.info("⏹️ Encerrando: aguardando o fim da execução e o relatório parcial...")
+            self.aguardar_execucao_para_fechar()
+            return
+        
+        self.encerrar_janela()
+    
+    def aguardar_execucao_para_fechar(self):
+        if self.thread_execucao and self.thread_execucao.is_alive():
+            self.root.after(200, self.aguardar_execucao_para_fechar)
+            return
+        self.encerrar_janela()
+    
+    def encerrar_janela(self):
+        """Encerra o pool de sessões e destrói a janela (nenhuma execução ativa)"""
+        logger.removeHandler(self.gui_handler)
+        if self.laco:
+            try:
+                self.laco.executar(self.pool.encerrar())
+            except Exception as e:
+                logger.debug(f"Erro ao encerrar pool de sessões: {e}")
+            self.laco.parar()
+        self.root.destroy()
+
     def executar(self):
         """Executa a interface"""
         self.root.mainloop()
 
+class JanelaHistorico:
+    """Histórico de execuções com filtros, paginação e visão agregada"""
+    
+    COLUNAS = (
+        ("inicio", "Início", 140),
+        ("tipo", "Tipo de cliente", 120),
+        ("total", "Total", 60),
+        ("sucessos", "Sucessos", 70),
+        ("erros", "Erros", 60),
+        ("vazao", "Usuários/min", 90),
+        ("situacao", "Situação", 80)
+    )
+    
+    def __init__(self, root, historico):
+        self.historico = historico
+        self.pagina = 0
+        self.total = 0
+        self.por_pagina = CONFIG["historico"]["itens_por_pagina"]
+        self.relatorios = {}
+        
+        self.janela = tk.Toplevel(root)
+        self.janela.title("📊 Histórico de Execuções")
+        self.janela.geometry("820x520")
+        
+        frame = ttk.Frame(self.janela, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.criar_filtros(frame)
+        
+        tabela_frame = ttk.Frame(frame)
+        tabela_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        
+        self.tabela = ttk.Treeview(tabela_frame, columns=[c[0] for c in self.COLUNAS], show="headings")
+        for coluna, titulo, largura in self.COLUNAS:
+            self.tabela.heading(coluna, text=titulo)
+            self.tabela.column(coluna, width=largura, anchor=tk.W if coluna in ("inicio", "tipo") else tk.E)
+        barra = ttk.Scrollbar(tabela_frame, orient=tk.VERTICAL, command=self.tabela.yview)
+        self.tabela.configure(yscrollcommand=barra.set)
+        self.tabela.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        barra.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tabela.bind("<Double-1>", lambda event: self.abrir_relatorio())
+        
+        rodape = ttk.Frame(frame)
+        rodape.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Button(rodape, text="◀ Anterior", command=lambda: self.mudar_pagina(-1)).pack(side=tk.LEFT)
+        self.pagina_label = ttk.Label(rodape, text="")
+        self.pagina_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(rodape, text="Próxima ▶", command=lambda: self.mudar_pagina(1)).pack(side=tk.LEFT)
+        
+        ttk.Button(rodape, text="📈 Visão Agregada", command=self.mostrar_agregado).pack(side=tk.RIGHT)
+        ttk.Button(rodape, text="📂 Abrir Relatório", command=self.abrir_relatorio).pack(side=tk.RIGHT, padx=(0, 10))
+        
+        self.buscar()
+    
+    def criar_filtros(self, parent):
+        filtros_frame = ttk.LabelFrame(parent, text="🔎 Filtros", padding="10")
+        filtros_frame.pack(fill=tk.X)
+        
+        self.data_inicio_var = tk.StringVar()
+        self.data_fim_var = tk.StringVar()
+        self.tipo_cliente_var = tk.StringVar()
+        self.usuario_var = tk.StringVar()
+        self.tipo_erro_var = tk.StringVar()
+        
+        campos = (
+            ("De (AAAA-MM-DD):", ttk.Entry(filtros_frame, textvariable=self.data_inicio_var, width=12)),
+            ("Até:", ttk.Entry(filtros_frame, textvariable=self.data_fim_var, width=12)),
+            ("Tipo:", ttk.Combobox(
+                filtros_frame, textvariable=self.tipo_cliente_var,
+                values=["", *TIPOS_CLIENTE], state="readonly", width=16
+            )),
+            ("Login:", ttk.Entry(filtros_frame, textvariable=self.usuario_var, width=14)),
+            ("Erro:", ttk.Combobox(
+                filtros_frame, textvariable=self.tipo_erro_var,
+                values=["", *self.historico.tipos_erro()], state="readonly", width=16
+            ))
+        )
+        for coluna, (rotulo, campo) in enumerate(campos):
+            ttk.Label(filtros_frame, text=rotulo).grid(row=0, column=coluna * 2, sticky=tk.W, padx=(0 if coluna == 0 else 8, 4))
+            campo.grid(row=0, column=coluna * 2 + 1, sticky=tk.W)
+        
+        ttk.Button(filtros_frame, text="Filtrar", command=self.filtrar).grid(row=0, column=len(campos) * 2, padx=(10, 0))
+    
+    def filtros(self):
+        """Filtros da tela; levanta ValueError se uma data for inválida"""
+        filtros = {
+            "data_inicio": self.data_inicio_var.get().strip() or None,
+            "data_fim": self.data_fim_var.get().strip() or None,
+            "tipo_cliente": self.tipo_cliente_var.get() or None,
+            "usuario": self.usuario_var.get().strip() or None,
+            "tipo_erro": self.tipo_erro_var.get() or None
+        }
+        for chave in ("data_inicio", "data_fim"):
+            if filtros[chave]:
+                datetime.strptime(filtros[chave], "%Y-%m-%d")
+        return filtros
+    
+    def filtrar(self):
+        self.pagina = 0
+        self.buscar()
+    
+    def mudar_pagina(self, passo):
+        paginas = max(1, -(-self.total // self.por_pagina))
+        nova = min(max(0, self.pagina + passo), paginas - 1)
+        if nova != self.pagina:
+            self.pagina = nova
+            self.buscar()
+    
+    def buscar(self):
+        try:
+            linhas, self.total = self.historico.buscar(self.pagina, self.por_pagina, **self.filtros())
+        except ValueError:
+            messagebox.showwarning("Aviso", "Use datas no formato AAAA-MM-DD", parent=self.janela)
+            return
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao consultar o histórico:\n{e}", parent=self.janela)
+            return
+        
+        self.tabela.delete(*self.tabela.get_children())
+        self.relatorios = {}
+        for inicio, tipo, total, sucessos, erros, vazao, cancelado, relatorio in linhas:
+            item = self.tabela.insert("", tk.END, values=(
+                inicio,
+                tipo or "-",
+                total,
+                sucessos,
+                erros,
+                f"{vazao:.1f}" if vazao else "-",
+                "cancelada" if cancelado else "concluída"
+            ))
+            self.relatorios[item] = relatorio
+        
+        paginas = max(1, -(-self.total // self.por_pagina))
+        self.pagina_label.config(text=f"Página {self.pagina + 1}/{paginas} ({self.total} execuções)")
+    
+    def abrir_relatorio(self):
+        """Abre o relatório selecionado no programa padrão do sistema"""
+        selecao = self.tabela.selection()
+        if not selecao:
+            messagebox.showwarning("Aviso", "Selecione um relatório!", parent=self.janela)
+            return
+        
+        arquivo = self.relatorios[selecao[0]]
+        try:
+            abrir_no_sistema(arquivo)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao abrir relatório:\n{e}", parent=self.janela)
+    
+    def mostrar_agregado(self):
+        """Vazão e taxa de erro por dia/mês das execuções filtradas"""
+        try:
+            filtros = self.filtros()
+        except ValueError:
+            messagebox.showwarning("Aviso", "Use datas no formato AAAA-MM-DD", parent=self.janela)
+            return
+        
+        janela = tk.Toplevel(self.janela)
+        janela.title("📈 Visão Agregada")
+        janela.geometry("600x400")
+        
+        frame = ttk.Frame(janela, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        periodo_var = tk.StringVar(value="dia")
+        opcoes = ttk.Frame(frame)
+        opcoes.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(opcoes, text="Agrupar por:").pack(side=tk.LEFT)
+        
+        colunas = (("periodo", "Período", 100), ("execucoes", "Execuções", 80), ("sucessos", "Sucessos", 80),
+                   ("erros", "Erros", 70), ("vazao", "Usuários/min", 100), ("taxa_erro", "Taxa de erro", 100))
+        tabela = ttk.Treeview(frame, columns=[c[0] for c in colunas], show="headings")
+        for coluna, titulo, largura in colunas:
+            tabela.heading(coluna, text=titulo)
+            tabela.column(coluna, width=largura, anchor=tk.W if coluna == "periodo" else tk.E)
+        tabela.pack(fill=tk.BOTH, expand=True)
+        
+        def preencher():
+            tabela.delete(*tabela.get_children())
+            for periodo, execucoes, sucessos, erros, vazao, taxa_erro in self.historico.agregado(periodo_var.get(), **filtros):
+                tabela.insert("", tk.END, values=(
+                    periodo,
+                    execucoes,
+                    sucessos,
+                    erros,
+                    f"{vazao:.1f}" if vazao else "-",
+                    f"{taxa_erro:.1f}%" if taxa_erro is not None else "-"
+                ))
+        
+        for valor, texto in (("dia", "Dia"), ("mes", "Mês")):
+            ttk.Radiobutton(opcoes, text=texto, variable=periodo_var, value=valor, command=preencher).pack(side=tk.LEFT, padx=(10, 0))
+        
+        preencher()
+
 class LogHandler(logging.Handler):
-    """Handler personalizado para exibir logs na interface"""
+    """Handler personalizado para exibir logs na interface
+    
+    Qualquer thread apenas enfileira a mensagem; a thread do Tk descarrega a
+    fila em lotes a cada intervalo e mantém só as últimas max_linhas linhas.
+    """
     
-    def __init__(self, text_widget):
+    def __init__(self, text_widget, max_linhas=None, intervalo_ms=None):
         super().__init__()
         self.text_widget = text_widget
+        self.max_linhas = max_linhas or CONFIG["interface"]["max_linhas_log"]
+        self.intervalo_ms = intervalo_ms or CONFIG["interface"]["intervalo_log_ms"]
+        self.fila = queue.SimpleQueue()
+        self.text_widget.after(self.intervalo_ms, self.descarregar)
     
     def emit(self, record):
-        """Emite o log na interface gráfica"""
+        """Enfileira o log para a interface gráfica (não bloqueia quem loga)"""
+        try:
+            self.fila.put(self.format(record))
+        except Exception:
+            self.handleError(record)
+    
+    def descarregar(self):
+        """Insere de uma vez as mensagens acumuladas (thread do Tk)"""
         try:
-            msg = self.format(record)
+            pendentes = deque(maxlen=self.max_linhas)
+            while True:
+                try:
+                    pendentes.append(self.fila.get_nowait())
+                except queue.Empty:
+                    break
             
-            def append_log():
+            if pendentes:
+                # Só acompanha o fim se o usuário não rolou para cima
+                no_fim = self.text_widget.yview()[1] >= 0.999
+                
                 self.text_widget.config(state=tk.NORMAL)
-                self.text_widget.insert(tk.END, msg + '\n')
-                self.text_widget.see(tk.END)  # Scroll automático
+                self.text_widget.insert(tk.END, '\n'.join(pendentes) + '\n')
+                
+                linhas = int(self.text_widget.index('end-1c').split('.')[0]) - 1
+                if linhas > self.max_linhas:
+                    self.text_widget.delete('1.0', f'{linhas - self.max_linhas + 1}.0')
+                
                 self.text_widget.config(state=tk.DISABLED)
-            
-            # Executar na thread principal
-            self.text_widget.after(0, append_log)
-            
-        except Exception:
-            self.handleError(record)
+                if no_fim:
+                    self.text_widget.see(tk.END)
+        
+        except tk.TclError:
+            return  # Janela fechada
+        
+        self.text_widget.after(self.intervalo_ms, self.descarregar)
+
+def parse_argumentos(argv=None):
+    """Lê as opções de linha de comando
+    
+    Sem --planilha abre a interface gráfica; com --planilha roda em lote.
+    """
+    parser = argparse.ArgumentParser(description="Automatizador Gestão de Acessos (Clientes)")
+    parser.add_argument(
+        "--planilha",
+        help="Planilha (.xlsx/.csv) a processar em lote, sem interface gráfica"
+    )
+    parser.add_argument(
+        "--env",
+        help="Arquivo .env com APP_USERNAME e APP_PASSWORD"
+    )
+    parser.add_argument(
+        "--tipo-cliente",
+        choices=list(TIPOS_CLIENTE),
+        default="Cliente ADM",
+        help="Tipo de cliente (define o subgrupo)"
+    )
+    parser.add_argument(
+        "--campo-contrato",
+        type=int,
+        choices=[1, 2, 3],
+        default=1,
+        help="Posição do campo contrato"
+    )
+    parser.add_argument(
+        "--saida",
+        default=CONFIG["saida"]["diretorio"],
+        help="Diretório para relatórios, logs, checkpoints e índice de usuários"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=CONFIG["execucao"]["workers"],
+        help="Quantidade de contextos de navegador processando em paralelo"
+    )
+    parser.add_argument(
+        "--headed",
+        action="store_true",
+        help="Abre a janela do Chromium (depuração); o padrão é headless"
+    )
+    parser.add_argument(
+        "--metricas-porta",
+        type=int,
+        default=CONFIG["metricas"]["porta"],
+        help="Expõe métricas Prometheus em http://127.0.0.1:PORTA/metrics"
+    )
+    return parser.parse_args(argv)
+
+# Códigos de saída da execução em lote
+SAIDA_OK = 0
+SAIDA_COM_ERROS = 1
+SAIDA_FALHA = 2
+SAIDA_INTERROMPIDA = 130
+
+def executar_lote(args):
+    """Executa a planilha pela linha de comando e retorna o código de saída"""
+    carregar_env(args.env)
+    
+    if not os.getenv('APP_PASSWORD'):
+        logger.error("❌ APP_PASSWORD não encontrado. Informe o arquivo com --env")
+        return SAIDA_FALHA
+    
+    if not os.path.exists(args.planilha):
+        logger.error(f"❌ Planilha não encontrada: {args.planilha}")
+        return SAIDA_FALHA
+    
+    plano = plano_formulario(args.tipo_cliente, args.campo_contrato)
+    logger.info(f"Configurações - Tipo: {args.tipo_cliente}, Campo: {args.campo_contrato}, Workers: {args.workers}")
+    
+    controle = ControleExecucao()
+    automatizador = AutomatizadorGestao(plano, controle=controle)
+    
+    # Primeiro Ctrl+C cancela no próximo ponto seguro (com relatório); o segundo interrompe
+    def interromper(signum, frame):
+        if controle.cancelado:
+            raise KeyboardInterrupt
+        logger.info("⏹️ Cancelamento solicitado; Ctrl+C novamente para interromper imediatamente")
+        controle.cancelar()
+    
+    handler_anterior = signal.signal(signal.SIGINT, interromper)
+    try:
+        asyncio.run(automatizador.executar(
+            args.planilha,
+            workers=args.workers,
+            headless=not args.headed
+        ))
+    except KeyboardInterrupt:
+        logger.info("⏹️ Execução interrompida pelo usuário")
+        return SAIDA_INTERROMPIDA
+    except Exception as e:
+        logger.error(f"💥 Execução em lote falhou: {e}")
+        return SAIDA_FALHA
+    finally:
+        signal.signal(signal.SIGINT, handler_anterior)
+    
+    if controle.cancelado:
+        return SAIDA_INTERROMPIDA
+    if automatizador.stats["erros"] or automatizador.stats["rejeitados"]:
+        return SAIDA_COM_ERROS
+    return SAIDA_OK
+
+def executar_interface(args):
+    """Abre a interface gráfica"""
+    carregar_tkinter()
+    
+    try:
+        # REMOVER verificação automática do .env - agora será feita via interface
+        logger.info("📝 Configure o arquivo .env através da interface")
+        
+        # Executar interface
+        app = InterfaceAutomatizador(workers=args.workers, headless=not args.headed)
+        app.executar()
+        
+    except KeyboardInterrupt:
+        logger.info("⏹️ Execução interrompida pelo usuário")
+    except Exception as e:
+        logger.error(f"💥 Erro crítico: {e}")
+        messagebox.showerror("Erro Crítico", f"Erro inesperado:\n\n{e}")
 
 def main():
     """Função principal"""
+    args = parse_argumentos()
+    CONFIG["metricas"]["porta"] = args.metricas_porta
+    CONFIG["saida"]["diretorio"] = args.saida
+    os.makedirs(args.saida, exist_ok=True)
+    configurar_log_arquivo(args.saida)
+    
+    codigo = SAIDA_OK
     try:
         logger.info("🚀 Iniciando Automatizador Gestão de Acessos v2.0")
         
@@ -1191,22 +4745,17 @@ def main():
         except ImportError:
             print("❌ Playwright não instalado. Execute: pip install playwright")
             print("   Depois execute: playwright install")
-            return
+            return SAIDA_FALHA
         
-        # REMOVER verificação automática do .env - agora será feita via interface
-        logger.info("📝 Configure o arquivo .env através da interface")
-        
-        # Executar interface
-        app = InterfaceAutomatizador()
-        app.executar()
+        if args.planilha:
+            codigo = executar_lote(args)
+        else:
+            executar_interface(args)
         
-    except KeyboardInterrupt:
-        logger.info("⏹️ Execução interrompida pelo usuário")
-    except Exception as e:
-        logger.error(f"💥 Erro crítico: {e}")
-        messagebox.showerror("Erro Crítico", f"Erro inesperado:\n\n{e}")
     finally:
         logger.info("🏁 Automatizador finalizado")
+    
+    return codigo
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
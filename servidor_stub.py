@@ -0,0 +1,210 @@
+# servidor_stub.py - Portal de gestão simulado para testes offline
+import argparse
+import base64
+import html
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# Imagem GIF 1x1 usada como lupa.gif
+LUPA_GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+CHARSET = "iso-8859-1"
+
+PAGINA_FRAMESET = """<html><head><title>Portal (stub)</title></head>
+<frameset cols="200,*">
+  <frame name="menu" src="menu.do">
+  <frame name="conteudo" src="about:blank">
+</frameset></html>"""
+
+PAGINA_LOGIN = """<html><head><link rel="stylesheet" href="estilo.css"></head><body>
+<form method="post" action="menu.do">
+  <input id="l_username" name="l_username">
+  <input id="l_password" name="l_password" type="password">
+  <input id="entrar" type="submit" value="Entrar">
+</form></body></html>"""
+
+PAGINA_MENU = """<html><head><link rel="stylesheet" href="estilo.css"></head><body>
+<a href="usuarios_incluiAcesso.do" target="conteudo">Incluir acesso</a>
+<a href="usuarios.do" target="conteudo">Usuários</a>
+</body></html>"""
+
+PAGINA_ACESSO = """<html><head><link rel="stylesheet" href="estilo.css"></head><body>
+<form method="post" action="usuarios_incluiAcesso.do">
+  <select id="frq_id" name="frq_id"><option value="30">30</option><option value="90">90</option></select>
+  <input id="enviar" type="submit" value="Enviar">
+</form></body></html>"""
+
+PAGINA_GRUPO = """<html><head><link rel="stylesheet" href="estilo.css">
+<script>
+function abrirEmpresas() { document.getElementById('empresas').style.display = 'block'; }
+function checkAll() {
+  var caixas = document.querySelectorAll('input[name="perfil"]');
+  for (var i = 0; i < caixas.length; i++) { caixas[i].checked = true; }
+}
+</script></head><body>
+<form method="post" action="usuarios_incluiGrupo.do">
+  <select id="subgrupo" name="subgrupo">
+    <option value="32">Cliente ADM</option><option value="113">Rastreio/TMK</option><option value="133">Rastreio/Consulta</option>
+  </select>
+  <input id="loginGestor" name="loginGestor"> <input id="emailGestor" name="emailGestor">
+  <input id="loginGestor2" name="loginGestor2"> <input id="emailGestor2" name="emailGestor2">
+  <input id="nome" name="nome"> <input id="usuario" name="usuario">
+  <input id="email" name="email"> <input id="filtro_cliente" name="filtro_cliente">
+  <textarea id="obs" name="obs"></textarea>
+  <select name="tipo_pes_id"><option value="1">1</option></select>
+  <select name="cargo"><option value="55">55</option></select>
+  <select name="setor"><option value="43">43</option></select>
+  <img src="imagens/icones/lupa.gif" onclick="abrirEmpresas()">
+  <div id="empresas" style="display:none">
+    <input type="checkbox" name="empresa_id" value="1"> Contrato 1
+    <input type="checkbox" name="empresa_id" value="2"> Contrato 2
+    <input type="checkbox" name="empresa_id" value="3"> Contrato 3
+  </div>
+  <input type="checkbox" name="perfil" value="consulta">
+  <input type="checkbox" name="perfil" value="relatorios">
+  <input id="enviar" type="submit" value="Enviar">
+</form></body></html>"""
+
+
+class EstadoPortal:
+    """Sessões e usuários criados no portal simulado"""
+
+    def __init__(self, usuario, senha):
+        self.usuario = usuario
+        self.senha = senha
+        self.sessoes = set()
+        self.usuarios = {}
+        self.lock = threading.Lock()
+
+
+class ManipuladorPortal(BaseHTTPRequestHandler):
+    """Responde às páginas .do usadas pelo automatizador"""
+
+    estado = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def sessao_valida(self):
+        cookies = self.headers.get("Cookie", "")
+        for parte in cookies.split(";"):
+            nome, _, valor = parte.strip().partition("=")
+            if nome == "JSESSIONID" and valor in self.estado.sessoes:
+                return True
+        return False
+
+    def responder(self, corpo, status=200, tipo="text/html", cabecalhos=None):
+        dados = corpo if isinstance(corpo, bytes) else corpo.encode(CHARSET, errors="replace")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{tipo}; charset={CHARSET}" if tipo == "text/html" else tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def redirecionar(self, destino, cabecalhos=None):
+        self.send_response(302)
+        self.send_header("Location", destino)
+        self.send_header("Content-Length", "0")
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+
+    def ler_formulario(self):
+        tamanho = int(self.headers.get("Content-Length", 0))
+        corpo = self.rfile.read(tamanho).decode("latin-1")
+        return parse_qsl(corpo, keep_blank_values=True, encoding=CHARSET)
+
+    def do_GET(self):
+        caminho = urlparse(self.path).path
+
+        if caminho in ("/", "/index.jsp"):
+            return self.responder(PAGINA_FRAMESET)
+        if caminho.endswith("lupa.gif"):
+            return self.responder(LUPA_GIF, tipo="image/gif")
+        if caminho.endswith(".css"):
+            return self.responder("body { font-family: Arial; }", tipo="text/css")
+        if caminho == "/menu.do":
+            return self.responder(PAGINA_MENU if self.sessao_valida() else PAGINA_LOGIN)
+
+        if not self.sessao_valida():
+            return self.responder(PAGINA_LOGIN)
+
+        if caminho == "/usuarios_incluiAcesso.do":
+            return self.responder(PAGINA_ACESSO)
+        if caminho == "/usuarios_incluiGrupo.do":
+            return self.responder(PAGINA_GRUPO)
+        if caminho == "/usuarios.do":
+            with self.estado.lock:
+                linhas = "".join(
+                    f'<tr><td class="login">{html.escape(login)}</td><td>{html.escape(dados.get("nome", ""))}</td></tr>'
+                    for login, dados in self.estado.usuarios.items()
+                )
+            return self.responder(f"<html><body><table id=\"usuarios\">{linhas}</table></body></html>")
+
+        self.responder("<html><body>Página não encontrada</body></html>", status=404)
+
+    def do_POST(self):
+        caminho = urlparse(self.path).path
+        campos = self.ler_formulario()
+        valores = dict(campos)
+
+        if caminho == "/menu.do":
+            if valores.get("l_username") == self.estado.usuario and valores.get("l_password") == self.estado.senha:
+                sessao = secrets.token_hex(16)
+                self.estado.sessoes.add(sessao)
+                return self.redirecionar("menu.do", {"Set-Cookie": f"JSESSIONID={sessao}; Path=/"})
+            return self.responder(PAGINA_LOGIN)
+
+        if not self.sessao_valida():
+            return self.responder(PAGINA_LOGIN)
+
+        if caminho == "/usuarios_incluiAcesso.do":
+            return self.redirecionar("usuarios_incluiGrupo.do")
+
+        if caminho == "/usuarios_incluiGrupo.do":
+            faltando = [c for c in ("nome", "usuario", "email", "filtro_cliente") if not valores.get(c, "").strip()]
+            if faltando:
+                return self.responder(f"<html><body>Erro: campos obrigatórios ausentes: {', '.join(faltando)}</body></html>")
+
+            login = valores["usuario"].strip()
+            with self.estado.lock:
+                if login in self.estado.usuarios:
+                    return self.responder(f"<html><body>Erro: login {html.escape(login)} já existe</body></html>")
+                self.estado.usuarios[login] = valores
+
+            return self.responder(f"<html><body>Usuário {html.escape(login)} cadastrado com sucesso</body></html>")
+
+        self.responder("<html><body>Página não encontrada</body></html>", status=404)
+
+
+def criar_servidor(porta=8765, usuario="rpa.gestaoac", senha="senha"):
+    """Cria o servidor do portal simulado (chame serve_forever para iniciar)"""
+    manipulador = type("ManipuladorPortalConfigurado", (ManipuladorPortal,), {
+        "estado": EstadoPortal(usuario, senha)
+    })
+    return ThreadingHTTPServer(("127.0.0.1", porta), manipulador)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal de gestão simulado para testes offline")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--usuario", default="rpa.gestaoac")
+    parser.add_argument("--senha", default="senha")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.porta, args.usuario, args.senha)
+    print(f"🧪 Portal simulado em http://127.0.0.1:{args.porta} (APP_URL)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
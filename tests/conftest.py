@@ -0,0 +1,19 @@
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auto_gestão_cliente as automatizador  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def config(tmp_path):
+    """CONFIG isolado por teste, com a saída em um diretório temporário"""
+    original = copy.deepcopy(automatizador.CONFIG)
+    automatizador.CONFIG["saida"]["diretorio"] = str(tmp_path)
+    yield automatizador.CONFIG
+    automatizador.CONFIG.clear()
+    automatizador.CONFIG.update(original)
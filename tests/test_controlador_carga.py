@@ -0,0 +1,33 @@
+import asyncio
+
+import auto_gestão_cliente as automatizador
+
+
+def test_apenas_rede_e_timeout_contam_como_erro_do_portal():
+    controlador = automatizador.ControladorCarga(maximo=4)
+
+    controlador.observar_erro_etapa(Exception("Campo de subgrupo não encontrado"))
+    controlador.observar_erro_etapa(Exception("Botão submit não encontrado"))
+    assert controlador.stats["erros"] == 0
+
+    controlador.observar_erro_etapa(TimeoutError("Timeout 30000ms exceeded"))
+    controlador.observar_erro_etapa(Exception("page.goto: net::ERR_CONNECTION_RESET"))
+    assert controlador.stats["erros"] == 2
+
+
+def test_elemento_ausente_repetido_nao_reduz_a_concorrencia(config):
+    config["carga"]["concorrencia_inicial"] = 4
+    config["carga"]["amostras_por_ajuste"] = 2
+    config["retentativas"]["atraso_base_segundos"] = 0
+    robo = automatizador.AutomatizadorGestao()
+    robo.controlador = automatizador.ControladorCarga(maximo=4)
+    falhas = [Exception("Campo de subgrupo não encontrado")] * 2
+
+    async def acao():
+        if falhas:
+            raise falhas.pop()
+        return "ok"
+
+    assert asyncio.run(robo.executar_etapa("configurar_grupo", acao)) == "ok"
+    assert robo.controlador.limite == 4
+    assert robo.controlador.stats["reducoes"] == 0
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import pytest
+
+import auto_gestão_cliente as automatizador
+
+
+def test_cancelar_interrompe_o_backoff_da_retentativa(config):
+    config["retentativas"]["atraso_base_segundos"] = 20
+    config["retentativas"]["atraso_max_segundos"] = 20
+    controle = automatizador.ControleExecucao()
+    robo = automatizador.AutomatizadorGestao(controle=controle)
+    chamadas = []
+
+    async def acao():
+        chamadas.append(1)
+        raise TimeoutError("Timeout 30000ms exceeded")
+
+    async def cenario():
+        asyncio.get_running_loop().call_later(0.2, controle.cancelar)
+        await robo.executar_etapa("navegar_incluir_acesso", acao)
+
+    inicio = time.monotonic()
+    with pytest.raises(automatizador.ExecucaoCancelada):
+        asyncio.run(cenario())
+
+    assert time.monotonic() - inicio < 5
+    assert len(chamadas) == 1
@@ -0,0 +1,54 @@
+import asyncio
+
+import auto_gestão_cliente as automatizador
+
+
+def linhas(*usuarios):
+    return [{"nome": f"Usuário {u}", "usuario": u, "email": f"{u}@empresa.com", "filtro_cliente": "ACME"} for u in usuarios]
+
+
+def chave(linha):
+    """Chave calculada sobre a linha já normalizada, como em alimentar_fila"""
+    [(normalizada, _)] = automatizador.ValidadorPlanilha().validar_lote([linha])
+    return automatizador.DiarioExecucao.chave_linha(normalizada)
+
+
+def test_estados_persistem_ao_reabrir(tmp_path):
+    planilha = str(tmp_path / "usuarios.xlsx")
+    diario = automatizador.DiarioExecucao(planilha, str(tmp_path))
+    diario.registrar("a", "ana", "em_andamento")
+    diario.registrar("a", "ana", "concluido")
+    diario.registrar("b", "bia", "falhou", Exception("timeout"))
+    diario.fechar()
+
+    diario = automatizador.DiarioExecucao(planilha, str(tmp_path))
+
+    assert diario.estado("a") == "concluido"
+    assert diario.estado("b") == "falhou"
+    assert diario.estado("c") is None
+    diario.fechar()
+
+
+def test_retomada_pula_linhas_concluidas_sem_gravar_pendentes(tmp_path):
+    planilha = linhas("ana", "bia", "caio")
+    robo = automatizador.AutomatizadorGestao()
+    robo.diario = automatizador.DiarioExecucao(str(tmp_path / "usuarios.xlsx"), str(tmp_path))
+    robo.diario.registrar(chave(planilha[0]), "ana", "concluido")
+    robo.diario.registrar(chave(planilha[1]), "bia", "em_andamento")
+
+    async def enfileirar():
+        fila = asyncio.Queue()
+        await robo.alimentar_fila(planilha, fila)
+        itens = []
+        while (item := fila.get_nowait()) is not None:
+            itens.append(item)
+        return itens
+
+    itens = asyncio.run(enfileirar())
+
+    assert [(idx, linha["usuario"]) for idx, linha, _ in itens] == [(1, "bia"), (2, "caio")]
+    assert robo.stats["ja_concluidos"] == 1
+    assert robo.stats["total"] == 3
+    assert robo.diario.estado(chave(planilha[1])) == "em_andamento"
+    assert robo.diario.estado(chave(planilha[2])) is None
+    robo.diario.fechar()
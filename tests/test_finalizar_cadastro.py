@@ -0,0 +1,72 @@
+import asyncio
+
+import auto_gestão_cliente as automatizador
+
+
+class CaixaFalsa:
+    def __init__(self, caixas, posicao):
+        self.caixas = caixas
+        self.posicao = posicao
+
+    async def click(self):
+        self.caixas[self.posicao] = not self.caixas[self.posicao]
+
+    async def check(self):
+        self.caixas[self.posicao] = True
+
+
+class LocalizadorFalso:
+    def __init__(self, caixas):
+        self.caixas = caixas
+
+    async def count(self):
+        return len(self.caixas)
+
+    def nth(self, posicao):
+        return CaixaFalsa(self.caixas, posicao)
+
+
+class FrameGrupoFalso:
+    """Frame do grupo com três contratos; o botão de envio só aparece na segunda tentativa"""
+
+    def __init__(self, plano):
+        self.plano = plano
+        self.contratos = [False, False, False]
+        self.enviados = []
+        self.submit_ausente = 1
+
+    async def wait_for_selector(self, seletor, timeout=None, state=None):
+        if seletor == self.plano.seletor_enviar and self.submit_ausente:
+            self.submit_ausente -= 1
+            raise TimeoutError("elemento não visível")
+
+    async def wait_for_function(self, expressao):
+        pass
+
+    def locator(self, seletor):
+        return LocalizadorFalso(self.contratos)
+
+    async def click(self, seletor):
+        if seletor == self.plano.seletor_enviar:
+            self.enviados.append(list(self.contratos))
+
+    async def evaluate(self, script):
+        pass
+
+
+class PaginaFalsa:
+    async def wait_for_event(self, evento, predicate=None):
+        pass
+
+
+def test_repeticao_da_finalizacao_mantem_o_contrato_marcado(config):
+    config["retentativas"]["atraso_base_segundos"] = 0
+    robo = automatizador.AutomatizadorGestao()
+    frame = FrameGrupoFalso(robo.plano)
+
+    asyncio.run(robo.executar_etapa("finalizar_cadastro", lambda: robo.finalizar_cadastro(PaginaFalsa(), frame)))
+
+    posicao = robo.plano.posicao_empresa
+    assert robo.retentativas.stats["recuperadas"] == 1
+    assert len(frame.enviados) == 1
+    assert frame.enviados[0][posicao] is True
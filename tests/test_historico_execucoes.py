@@ -0,0 +1,97 @@
+import json
+
+import auto_gestão_cliente as automatizador
+
+
+def gravar_relatorio(pasta, nome, inicio, tipo_cliente, resultados, **extras):
+    """Relatório no formato atual: resumo em JSON e resultados em JSONL"""
+    arquivo_resultados = pasta / f"resultados_{nome}.jsonl"
+    arquivo_resultados.write_text("".join(json.dumps(r) + "\n" for r in resultados), encoding="utf-8")
+    relatorio = {
+        "inicio_execucao": inicio,
+        "tipo_cliente": tipo_cliente,
+        "total": len(resultados),
+        "sucessos": sum(r["status"] == "sucesso" for r in resultados),
+        "erros": sum(r["status"] == "erro" for r in resultados),
+        "tempo_execucao_segundos": 60,
+        "resultados": {"arquivo": str(arquivo_resultados)},
+        **extras
+    }
+    arquivo = pasta / f"relatorio_{nome}.json"
+    arquivo.write_text(json.dumps(relatorio), encoding="utf-8")
+    return str(arquivo), relatorio
+
+
+def test_registro_e_filtros(tmp_path):
+    historico = automatizador.HistoricoExecucoes(str(tmp_path / "historico.sqlite3"), str(tmp_path))
+    historico.registrar(*gravar_relatorio(tmp_path, "1", "2026-01-10 08:00:00", "Cliente ADM", [
+        {"usuario": "Ana", "status": "sucesso"},
+        {"usuario": "bia", "status": "erro", "tipo_erro": "TimeoutError", "erro": "Timeout"}
+    ]))
+    historico.registrar(*gravar_relatorio(tmp_path, "2", "2026-02-03 09:00:00", "Rastreio/TMK", [
+        {"usuario": "caio", "status": "sucesso"}
+    ]))
+
+    linhas, total = historico.buscar()
+    assert total == 2
+    assert [linha[0] for linha in linhas] == ["2026-02-03 09:00:00", "2026-01-10 08:00:00"]
+
+    assert historico.buscar(usuario="ANA")[1] == 1
+    assert historico.buscar(tipo_erro="TimeoutError")[0][0][1] == "Cliente ADM"
+    assert historico.buscar(tipo_cliente="Rastreio/TMK")[1] == 1
+    assert historico.buscar(data_inicio="2026-01-01", data_fim="2026-01-10")[1] == 1
+    assert historico.tipos_erro() == ["TimeoutError"]
+
+
+def test_relatorio_repetido_nao_e_indexado_duas_vezes(tmp_path):
+    historico = automatizador.HistoricoExecucoes(str(tmp_path / "historico.sqlite3"), str(tmp_path))
+    arquivo, relatorio = gravar_relatorio(tmp_path, "1", "2026-01-10 08:00:00", "Cliente ADM", [
+        {"usuario": "ana", "status": "sucesso"}
+    ])
+
+    assert historico.registrar(arquivo, relatorio) == 1
+    assert historico.registrar(arquivo, relatorio) == 0
+    assert historico.buscar()[1] == 1
+
+
+def test_paginacao(tmp_path):
+    historico = automatizador.HistoricoExecucoes(str(tmp_path / "historico.sqlite3"), str(tmp_path))
+    for dia in range(1, 6):
+        historico.registrar(*gravar_relatorio(tmp_path, str(dia), f"2026-03-0{dia} 10:00:00", "Cliente ADM", []))
+
+    pagina, total = historico.buscar(pagina=1, por_pagina=2)
+
+    assert total == 5
+    assert [linha[0][:10] for linha in pagina] == ["2026-03-03", "2026-03-02"]
+
+
+def test_agregado_por_mes(tmp_path):
+    historico = automatizador.HistoricoExecucoes(str(tmp_path / "historico.sqlite3"), str(tmp_path))
+    historico.registrar(*gravar_relatorio(tmp_path, "1", "2026-01-10 08:00:00", "Cliente ADM", [
+        {"usuario": "ana", "status": "sucesso"},
+        {"usuario": "bia", "status": "erro"}
+    ]))
+    historico.registrar(*gravar_relatorio(tmp_path, "2", "2026-01-20 08:00:00", "Cliente ADM", [
+        {"usuario": "caio", "status": "sucesso"},
+        {"usuario": "davi", "status": "sucesso"}
+    ]))
+
+    [(periodo, execucoes, sucessos, erros, vazao, taxa_erro)] = historico.agregado(periodo="mes")
+
+    assert (periodo, execucoes, sucessos, erros) == ("2026-01", 2, 3, 1)
+    assert vazao == 2.0  # 4 usuários em 2 minutos
+    assert taxa_erro == 25.0
+
+
+def test_relatorios_existentes_sao_importados_na_criacao(tmp_path):
+    gravar_relatorio(tmp_path, "novo", "2026-01-10 08:00:00", "Cliente ADM", [{"usuario": "ana", "status": "sucesso"}])
+    (tmp_path / "relatorio_antigo.json").write_text(json.dumps({
+        "inicio_execucao": "2025-12-01 08:00:00",
+        "usuarios_erro": [{"usuario": "caio", "erro": "Timeout"}]
+    }), encoding="utf-8")
+    (tmp_path / "relatorio_corrompido.json").write_text("{", encoding="utf-8")
+
+    historico = automatizador.HistoricoExecucoes(str(tmp_path / "historico.sqlite3"), str(tmp_path))
+
+    assert historico.buscar()[1] == 2
+    assert historico.buscar(usuario="caio")[0][0][0] == "2025-12-01 08:00:00"
@@ -0,0 +1,185 @@
+import asyncio
+from urllib.parse import parse_qsl
+
+import pytest
+
+import auto_gestão_cliente as automatizador
+
+URL_ACESSO = "http://portal/usuarios_incluiAcesso.do"
+URL_GRUPO = "http://portal/usuarios_incluiGrupo.do"
+FORMULARIO = "application/x-www-form-urlencoded; charset=iso-8859-1"
+
+DADOS = {"nome": "Maria Souza", "usuario": "maria.souza", "email": "maria@empresa.com", "filtro_cliente": "ACME"}
+
+
+def posts_gravados(content_type=FORMULARIO):
+    return [
+        {"url": URL_ACESSO, "corpo": b"frq_id=30", "content_type": content_type},
+        {
+            "url": URL_GRUPO,
+            "corpo": b"subgrupo=32&nome=Modelo&usuario=modelo&email=modelo%40x.com&filtro_cliente=X&empresa_id=1",
+            "content_type": content_type
+        }
+    ]
+
+
+class RespostaFalsa:
+    def __init__(self, status=200, html="<html><body>ok</body></html>"):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.corpo = html.encode("iso-8859-1")
+
+    async def body(self):
+        return self.corpo
+
+
+class ContextoFalso:
+    """BrowserContext com request.post respondendo a partir de uma lista"""
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.enviados = []
+        self.request = self
+
+    async def post(self, url, data, headers, timeout):
+        self.enviados.append((url, dict(parse_qsl(data, encoding="iso-8859-1"))))
+        return self.respostas.pop(0)
+
+
+def motor_treinado():
+    motor = automatizador.MotorHTTPDireto()
+    assert motor.aprender(posts_gravados())
+    return motor
+
+
+def test_envio_confirmado_substitui_os_dados_do_usuario():
+    motor = motor_treinado()
+    contexto = ContextoFalso(RespostaFalsa(), RespostaFalsa(html="<p>Usuário maria.souza cadastrado com sucesso</p>"))
+
+    assert asyncio.run(motor.enviar(contexto, DADOS)) is True
+
+    url, campos = contexto.enviados[-1]
+    assert url == URL_GRUPO
+    assert campos["usuario"] == "maria.souza"
+    assert campos["email"] == "maria@empresa.com"
+    assert campos["empresa_id"] == "1"
+    assert motor.stats["confirmados"] == 1
+
+
+def test_status_http_inesperado_volta_ao_navegador():
+    motor = motor_treinado()
+    contexto = ContextoFalso(RespostaFalsa(status=503))
+
+    assert asyncio.run(motor.enviar(contexto, DADOS)) is None
+    assert motor.stats["fallbacks"] == 1
+    assert len(contexto.enviados) == 1
+
+
+def test_sessao_expirada_volta_ao_navegador():
+    motor = motor_treinado()
+    contexto = ContextoFalso(RespostaFalsa(html='<form><input id="l_username"></form>'))
+
+    assert asyncio.run(motor.enviar(contexto, DADOS)) is None
+    assert motor.stats["fallbacks"] == 1
+
+
+def test_rejeicao_do_portal_levanta_erro_sem_fallback():
+    motor = motor_treinado()
+    contexto = ContextoFalso(RespostaFalsa(), RespostaFalsa(html="<p>Erro: login maria.souza já existe</p>"))
+
+    with pytest.raises(Exception, match="rejeitou"):
+        asyncio.run(motor.enviar(contexto, DADOS))
+
+    assert motor.stats["rejeitados"] == 1
+    assert motor.stats["fallbacks"] == 0
+    assert not motor.desativado
+
+
+def test_rejeicoes_seguidas_desativam_o_envio_direto(config):
+    config["http_direto"]["max_rejeicoes"] = 2
+    motor = motor_treinado()
+
+    for _ in range(2):
+        contexto = ContextoFalso(RespostaFalsa(), RespostaFalsa(html="<p>Erro: campos obrigatórios ausentes</p>"))
+        with pytest.raises(Exception):
+            asyncio.run(motor.enviar(contexto, DADOS))
+
+    assert motor.desativado
+    assert not motor.pronto
+
+
+def test_resposta_sem_confirmacao_nao_e_reenviada():
+    motor = motor_treinado()
+    contexto = ContextoFalso(RespostaFalsa(), RespostaFalsa(html="<p>Página inesperada</p>"))
+
+    with pytest.raises(Exception, match="sem confirmação"):
+        asyncio.run(motor.enviar(contexto, DADOS))
+
+    assert motor.desativado
+    assert motor.stats["fallbacks"] == 0
+
+
+def test_formato_inesperado_desativa_o_aprendizado():
+    motor = automatizador.MotorHTTPDireto()
+
+    assert not motor.aprender(posts_gravados(content_type="multipart/form-data; boundary=x"))
+    assert motor.desativado
+
+
+def test_modelo_sem_campos_obrigatorios_e_recusado():
+    motor = automatizador.MotorHTTPDireto()
+    posts = [{"url": URL_GRUPO, "corpo": b"subgrupo=32&nome=Modelo", "content_type": FORMULARIO}]
+
+    assert not motor.aprender(posts)
+    assert motor.modelo is None
+
+
+class PaginaFalsa:
+    def on(self, evento, callback):
+        pass
+
+
+class AutomatizadorFalso(automatizador.AutomatizadorGestao):
+    """Etapas do formulário simuladas; a primeira navegação falha após o POST de acesso"""
+
+    def __init__(self):
+        super().__init__()
+        self.falhas_navegacao = 1
+
+    def gravar(self, url):
+        automatizador.GRAVADOR_ATUAL.get().posts.append({"url": url, "corpo": b"", "content_type": FORMULARIO})
+
+    async def voltar_ao_menu(self, page):
+        return "menu"
+
+    async def navegar_para_incluir_acesso(self, page, frame_menu):
+        self.gravar(URL_ACESSO)
+        if self.falhas_navegacao:
+            self.falhas_navegacao -= 1
+            raise TimeoutError("Timeout 30000ms exceeded")
+
+    async def configurar_grupo(self, page):
+        return "grupo"
+
+    async def preencher_em_lote(self, frame, dados):
+        pass
+
+    async def finalizar_cadastro(self, page, frame_grupo):
+        self.gravar(URL_GRUPO)
+
+
+def test_gravador_guarda_apenas_a_tentativa_que_concluiu(config):
+    config["retentativas"]["atraso_base_segundos"] = 0
+    config["preenchimento"]["em_lote"] = True
+    robo = AutomatizadorFalso()
+    gravador = automatizador.GravadorFormularios(PaginaFalsa())
+
+    async def cadastrar():
+        automatizador.GRAVADOR_ATUAL.set(gravador)
+        gravador.posts.append({"url": URL_GRUPO, "corpo": b"", "content_type": FORMULARIO})  # usuário anterior
+        await robo.cadastrar_pelo_formulario(PaginaFalsa(), DADOS, "menu")
+
+    asyncio.run(cadastrar())
+
+    assert robo.retentativas.stats["recuperadas"] == 1
+    assert [post["url"] for post in gravador.posts] == [URL_ACESSO, URL_GRUPO]
@@ -0,0 +1,44 @@
+import asyncio
+import json
+import threading
+
+import auto_gestão_cliente as automatizador
+
+
+def test_sucesso_grava_no_indice_fora_do_event_loop(tmp_path):
+    robo = automatizador.AutomatizadorGestao()
+    robo.indice = automatizador.IndiceUsuarios(str(tmp_path / "usuarios_provisionados.txt"), str(tmp_path))
+    threads = []
+    adicionar = robo.indice.adicionar
+
+    def adicionar_registrando(login):
+        threads.append(threading.current_thread())
+        adicionar(login)
+
+    robo.indice.adicionar = adicionar_registrando
+
+    async def concluir():
+        await asyncio.gather(*(robo.registrar_sucesso_usuario(u) for u in ["Ana", "ana", "bia"]))
+        return threading.current_thread()
+
+    thread_do_loop = asyncio.run(concluir())
+
+    assert thread_do_loop not in threads
+    assert sorted((tmp_path / "usuarios_provisionados.txt").read_text(encoding="utf-8").split()) == ["ana", "bia"]
+    assert "BIA" in automatizador.IndiceUsuarios(str(tmp_path / "usuarios_provisionados.txt"), str(tmp_path))
+
+
+def test_indice_reconstruido_a_partir_dos_resultados_e_checkpoints(tmp_path):
+    (tmp_path / "resultados_1.jsonl").write_text(
+        json.dumps({"usuario": "Ana", "status": "sucesso"}) + "\n" +
+        json.dumps({"usuario": "bia", "status": "erro"}) + "\n",
+        encoding="utf-8"
+    )
+    diario = automatizador.DiarioExecucao(str(tmp_path / "usuarios.xlsx"), str(tmp_path))
+    diario.registrar("x", "caio", "concluido")
+    diario.registrar("y", "davi", "falhou")
+    diario.fechar()
+
+    indice = automatizador.IndiceUsuarios(str(tmp_path / "usuarios_provisionados.txt"), str(tmp_path))
+
+    assert indice.logins == {"ana", "caio"}
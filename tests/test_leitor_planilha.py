@@ -0,0 +1,54 @@
+import asyncio
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+import auto_gestão_cliente as automatizador
+
+
+def test_csv_ignora_linhas_em_branco_e_celulas_com_quebra_de_linha(tmp_path):
+    arquivo = tmp_path / "usuarios.csv"
+    linhas = ["nome,usuario,email,filtro_cliente"]
+    linhas += [f"Usuário {i},user{i},user{i}@empresa.com,ACME" for i in range(6)]
+    linhas += ['"Nome em\nduas linhas",user6,user6@empresa.com,ACME', "", ",,,", ""]
+    arquivo.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+
+    leitor = automatizador.LeitorPlanilha(str(arquivo))
+
+    assert sum(1 for _ in leitor) == 7
+    assert leitor.contar_linhas() >= 7  # Estimativa pelas linhas físicas
+
+
+def test_xlsx_estimativa_pelos_metadados(tmp_path):
+    arquivo = tmp_path / "usuarios.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Nome", "Login", "E-mail", "Cliente"])
+    for i in range(7):
+        ws.append([f"Usuário {i}", f"user{i}", f"user{i}@empresa.com", "ACME"])
+    ws.cell(row=40, column=1).font = Font(bold=True)  # Célula vazia, só formatação
+    wb.save(arquivo)
+
+    leitor = automatizador.LeitorPlanilha(str(arquivo))
+
+    assert leitor.contar_linhas() == 39
+    assert sum(1 for _ in leitor) == 7
+
+
+def test_total_exato_substitui_a_estimativa_ao_fim_da_leitura(tmp_path):
+    arquivo = tmp_path / "usuarios.csv"
+    linhas = ["nome,usuario,email,filtro_cliente"]
+    linhas += [f"Usuário {i},user{i},user{i}@empresa.com,ACME" for i in range(3)]
+    arquivo.write_text("\n".join(linhas + ["", ",,,", ""]) + "\n", encoding="utf-8")
+    leitor = automatizador.LeitorPlanilha(str(arquivo))
+    robo = automatizador.AutomatizadorGestao()
+    robo.stats["total"] = leitor.contar_linhas()
+
+    async def enfileirar():
+        fila = asyncio.Queue()
+        await robo.alimentar_fila(leitor, fila)
+        return fila.qsize()
+
+    assert robo.stats["total"] > 3
+    assert asyncio.run(enfileirar()) == 4  # 3 linhas e o marcador de fim
+    assert robo.stats["total"] == 3
@@ -0,0 +1,34 @@
+import asyncio
+
+import auto_gestão_cliente as automatizador
+
+
+def test_evento_mais_lento_que_a_pausa_nao_gera_economia_negativa(config):
+    config["esperas"]["eventos"] = True
+    config["esperas"]["teto_segundos"] = 1
+    motor = automatizador.MotorEsperas()
+
+    async def condicao():
+        await asyncio.sleep(0.05)
+
+    asyncio.run(motor.aguardar("lenta", None, condicao, 0))
+
+    assert motor.stats["eventos"] == 1
+    assert motor.stats["tempo_economizado_segundos"] == 0.0
+    assert motor.stats["por_etapa"]["lenta"]["economizado_segundos"] == 0.0
+
+
+def test_fallback_contabilizado_separado_da_economia(config):
+    config["esperas"]["eventos"] = True
+    config["esperas"]["teto_segundos"] = 0.05
+    motor = automatizador.MotorEsperas()
+
+    async def condicao():
+        await asyncio.sleep(10)
+
+    asyncio.run(motor.aguardar("sem_evento", None, condicao, 0.1))
+
+    assert motor.stats["fallbacks"] == 1
+    assert motor.stats["tempo_economizado_segundos"] == 0.0
+    assert motor.stats["tempo_em_fallback_segundos"] >= 0.1
+    assert motor.stats["por_etapa"]["sem_evento"]["fallback_segundos"] >= 0.1
@@ -0,0 +1,97 @@
+import asyncio
+
+import auto_gestão_cliente as automatizador
+
+
+class LocalizadorFalso:
+    async def count(self):
+        return 1
+
+
+class FrameFalso:
+    def is_detached(self):
+        return False
+
+    def locator(self, seletor):
+        return LocalizadorFalso()
+
+
+class PaginaFalsa:
+    def is_closed(self):
+        return False
+
+
+class DonoFalso:
+    """Automatizador com a verificação no portal controlada pelo teste"""
+
+    def __init__(self):
+        self.verificando = asyncio.Event()
+        self.liberar = asyncio.Event()
+        self.criadas = 0
+        self.fechadas = []
+
+    async def sessao_ativa_no_portal(self, context):
+        self.verificando.set()
+        await self.liberar.wait()
+        return True
+
+    async def abrir_sessao(self, browser):
+        self.criadas += 1
+        return f"fria{self.criadas}", PaginaFalsa()
+
+    async def entrar(self, page):
+        return FrameFalso()
+
+    async def fechar_sessao(self, context):
+        self.fechadas.append(context)
+
+
+def test_emprestimo_durante_a_manutencao_recebe_a_sessao_aquecida(config):
+    config["pool"]["verificacao_segundos"] = 0
+
+    async def cenario():
+        dono = DonoFalso()
+        pool = automatizador.PoolSessoes()
+        pool.automatizador = dono
+        aquecida = automatizador.SessaoAquecida("aquecida", PaginaFalsa(), FrameFalso(), dono)
+        pool.livres.append(aquecida)
+
+        manutencao = asyncio.ensure_future(pool.manter())
+        await dono.verificando.wait()
+        emprestimo = asyncio.ensure_future(pool.emprestar(dono))
+        await asyncio.sleep(0)
+        dono.liberar.set()
+        sessao = await emprestimo
+        manutencao.cancel()
+        return dono, pool, sessao
+
+    dono, pool, sessao = asyncio.run(cenario())
+
+    assert sessao.context == "aquecida"
+    assert dono.criadas == 0
+    assert pool.stats["prontas"] == 1
+    assert pool.stats["frias"] == 0
+    assert dono.fechadas == []
+
+
+def test_manutencao_descarta_sessao_vencida(config):
+    config["pool"]["rotacao_segundos"] = -1
+    config["pool"]["verificacao_segundos"] = 0
+    config["pool"]["tamanho"] = 1
+
+    async def cenario():
+        dono = DonoFalso()
+        pool = automatizador.PoolSessoes()
+        pool.automatizador = dono
+        pool.livres.append(automatizador.SessaoAquecida("vencida", PaginaFalsa(), FrameFalso(), dono))
+
+        manutencao = asyncio.ensure_future(pool.manter())
+        while not dono.fechadas:
+            await asyncio.sleep(0)
+        manutencao.cancel()
+        return dono, pool
+
+    dono, pool = asyncio.run(cenario())
+
+    assert dono.fechadas == ["vencida"]
+    assert pool.stats["rotacionadas"] == 1
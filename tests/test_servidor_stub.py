@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import pytest
+
+import auto_gestão_cliente as automatizador
+from servidor_stub import criar_servidor
+
+FORMULARIO = "application/x-www-form-urlencoded; charset=iso-8859-1"
+
+
+@pytest.fixture
+def portal():
+    """Portal simulado em uma porta livre; devolve a URL base"""
+    servidor = criar_servidor(porta=0, usuario="rpa", senha="segredo")
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class RespostaUrllib:
+    def __init__(self, status, corpo):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.corpo = corpo
+
+    async def body(self):
+        return self.corpo
+
+
+class ContextoUrllib:
+    """APIRequestContext mínimo (post) sobre urllib, guardando os cookies da sessão"""
+
+    def __init__(self):
+        self.abridor = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.request = self
+
+    def enviar(self, url, corpo=None, headers=None):
+        dados = corpo.encode("ascii") if corpo is not None else None
+        with self.abridor.open(Request(url, data=dados, headers=headers or {})) as resposta:
+            return resposta.status, resposta.read()
+
+    async def post(self, url, data, headers, timeout):
+        return RespostaUrllib(*await asyncio.to_thread(self.enviar, url, data, headers))
+
+
+def entrar(contexto, url):
+    corpo = urlencode({"l_username": "rpa", "l_password": "segredo"})
+    _, html = contexto.enviar(f"{url}/menu.do", corpo, {"Content-Type": FORMULARIO})
+    return html.decode("iso-8859-1")
+
+
+def motor_para(url):
+    """Motor treinado com os POSTs que o navegador faz nos formulários do portal"""
+    motor = automatizador.MotorHTTPDireto()
+    campos_grupo = urlencode([
+        ("subgrupo", "32"), ("loginGestor", "gestor"), ("emailGestor", "gestor@empresa.com"),
+        ("nome", "Modelo"), ("usuario", "modelo"), ("email", "modelo@empresa.com"),
+        ("filtro_cliente", "X"), ("obs", ""), ("tipo_pes_id", "1"), ("cargo", "55"),
+        ("setor", "43"), ("empresa_id", "1"), ("perfil", "consulta"), ("perfil", "relatorios")
+    ])
+    assert motor.aprender([
+        {"url": f"{url}/usuarios_incluiAcesso.do", "corpo": b"frq_id=30", "content_type": FORMULARIO},
+        {"url": f"{url}/usuarios_incluiGrupo.do", "corpo": campos_grupo.encode("ascii"), "content_type": FORMULARIO}
+    ])
+    return motor
+
+
+def test_login_inclusao_e_finalizacao_no_portal_simulado(portal):
+    contexto = ContextoUrllib()
+    assert "Incluir acesso" in entrar(contexto, portal)
+
+    motor = motor_para(portal)
+    dados = {"nome": "Maria Souza", "usuario": "maria.souza", "email": "maria@empresa.com", "filtro_cliente": "ACME"}
+
+    assert asyncio.run(motor.enviar(contexto, dados)) is True
+
+    _, listagem = contexto.enviar(f"{portal}/usuarios.do")
+    assert "maria.souza" in listagem.decode("iso-8859-1")
+
+    # Segundo envio do mesmo login é recusado pelo portal e não vira fallback
+    with pytest.raises(Exception, match="rejeitou"):
+        asyncio.run(motor.enviar(contexto, dados))
+    assert motor.stats["fallbacks"] == 0
+
+
+def test_sessao_sem_login_volta_ao_navegador(portal):
+    motor = motor_para(portal)
+    dados = {"nome": "Ana", "usuario": "ana", "email": "ana@empresa.com", "filtro_cliente": "ACME"}
+
+    assert asyncio.run(motor.enviar(ContextoUrllib(), dados)) is None
+    assert motor.stats["fallbacks"] == 1
+
+
+def test_app_url_aplicada_sem_arquivo_env_explicito(monkeypatch, config):
+    monkeypatch.setenv("APP_URL", "http://127.0.0.1:8765")
+
+    automatizador.carregar_env(None)
+
+    assert config["url"] == "http://127.0.0.1:8765"
+
+
+def test_app_url_do_arquivo_env(tmp_path, monkeypatch, config):
+    monkeypatch.setenv("APP_URL", "")
+    monkeypatch.delenv("APP_URL")
+    arquivo = tmp_path / ".env"
+    arquivo.write_text("APP_URL=http://127.0.0.1:9999\n", encoding="utf-8")
+
+    assert automatizador.carregar_env(str(arquivo))
+    assert config["url"] == "http://127.0.0.1:9999"
@@ -0,0 +1,42 @@
+import auto_gestão_cliente as automatizador
+
+
+def registro(usuario, email="maria@empresa.com"):
+    return {"Nome": "Maria Souza", "Login": usuario, "E-mail": email, "Cliente": "ACME"}
+
+
+def test_login_numerico_lido_como_float_vira_inteiro():
+    validador = automatizador.ValidadorPlanilha()
+
+    [(dados, erros)] = validador.validar_lote([registro(12345.0)])
+
+    assert dados["usuario"] == "12345"
+    assert erros == []
+
+
+def test_login_float_e_texto_iguais_sao_duplicados():
+    validador = automatizador.ValidadorPlanilha()
+
+    resultado = validador.validar_lote([registro("12345"), registro(12345.0)])
+
+    assert resultado[0][1] == []
+    assert resultado[1][1] == ["Login duplicado na planilha"]
+
+
+def test_duplicado_entre_lotes_ignorando_maiusculas():
+    validador = automatizador.ValidadorPlanilha()
+    validador.validar_lote([registro("Maria.Souza")])
+
+    [(_, erros)] = validador.validar_lote([registro("maria.souza")])
+
+    assert erros == ["Login duplicado na planilha"]
+
+
+def test_campos_obrigatorios_e_email_invalido():
+    validador = automatizador.ValidadorPlanilha()
+
+    [(dados, erros)] = validador.validar_lote([registro("  ", email="sem-arroba")])
+
+    assert dados["usuario"] is None
+    assert "Campo obrigatório 'usuario' vazio" in erros
+    assert "E-mail inválido em 'email'" in erros